@@ -1,5 +1,8 @@
 """Health check endpoints."""
 
+import asyncio
+from typing import Optional, Tuple
+
 import httpx
 from fastapi import APIRouter, Depends, Response
 from sqlalchemy import text
@@ -32,43 +35,55 @@ async def database_health(db: AsyncSession = Depends(get_db), response: Response
         return {"status": "unhealthy", "database": "disconnected", "error": str(e)}
 
 
-@router.get("/ready")
-async def readiness_check(db: AsyncSession = Depends(get_db), response: Response = None):
-    """Readiness check for all critical services.
-
-    Returns HTTP 503 if any critical service is unavailable.
-    """
-    checks = {
-        "database": False,
-        "valhalla": False,
-        "redis": False,
-    }
-    errors = {}
-
-    # Check database
+async def _check_database(db: AsyncSession) -> Tuple[bool, Optional[str]]:
     try:
         await db.execute(text("SELECT 1"))
-        checks["database"] = True
+        return True, None
     except Exception as e:
-        errors["database"] = str(e)
+        return False, str(e)
+
 
-    # Check Valhalla routing engine
+async def _check_valhalla() -> Tuple[bool, Optional[str]]:
     try:
         async with httpx.AsyncClient(timeout=5.0) as client:
             valhalla_response = await client.get(f"{settings.valhalla_url}/status")
-            checks["valhalla"] = valhalla_response.status_code == 200
+            return valhalla_response.status_code == 200, None
     except Exception as e:
-        errors["valhalla"] = str(e)
+        return False, str(e)
+
 
-    # Check Redis
+async def _check_redis() -> Tuple[bool, Optional[str]]:
     try:
         import redis.asyncio as redis
         r = redis.from_url(settings.redis_url)
         await r.ping()
         await r.close()
-        checks["redis"] = True
+        return True, None
     except Exception as e:
-        errors["redis"] = str(e)
+        return False, str(e)
+
+
+@router.get("/ready")
+async def readiness_check(db: AsyncSession = Depends(get_db), response: Response = None):
+    """Readiness check for all critical services.
+
+    The probes are independent, so they run concurrently and the check
+    takes as long as the slowest one rather than the sum of all three.
+
+    Returns HTTP 503 if any critical service is unavailable.
+    """
+    results = await asyncio.gather(
+        _check_database(db),
+        _check_valhalla(),
+        _check_redis(),
+    )
+
+    checks = {}
+    errors = {}
+    for name, (ok, error) in zip(("database", "valhalla", "redis"), results):
+        checks[name] = ok
+        if error is not None:
+            errors[name] = error
 
     all_healthy = all(checks.values())
 
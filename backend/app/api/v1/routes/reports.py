@@ -167,7 +167,7 @@ async def verify_report(
                 alert_message=f"Caution: {report.hazard_type.value.replace('_', ' ')} reported by users",
                 source=DataSource.USER_REPORT,
                 source_id=str(report.id),
-                confidence_score=0.7 + (0.1 * min(report.verification_count - 3, 3)),  # 0.7-1.0 based on verifications
+                confidence_score=float(risk_zone_service.verification_confidence_np(report.verification_count)),
                 reported_count=report.verification_count,
                 last_confirmed_at=datetime.utcnow(),
                 is_active=True,
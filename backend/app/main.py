@@ -1,11 +1,13 @@
 """FastAPI application entry point with security hardening."""
 
+import asyncio
 import logging
 import sys
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 
 from app.config import settings, generate_api_key
 from app.api.v1.router import api_router
@@ -21,6 +23,7 @@ from app.middleware import (
 from app.core.security import verify_api_key, optional_api_key
 from app.core.exceptions import register_exception_handlers
 from app.core.audit import audit_log, AuditAction
+from app.services.routing.engine import warm_up_polyline_decoder
 
 
 # Setup logging early
@@ -87,6 +90,9 @@ async def lifespan(app: FastAPI):
         if settings.is_production():
             sys.exit(1)
 
+    # Compile the polyline decoder off the event loop before serving routes
+    await asyncio.to_thread(warm_up_polyline_decoder)
+
     logger.info(f"{settings.app_name} started successfully")
 
     yield
@@ -179,6 +185,10 @@ app.add_middleware(
     max_age=600,  # Cache preflight for 10 minutes
 )
 
+# 6. Response compression for large payloads (risk zone and report listings).
+# Level 1 is several times faster than the default 9 for a modestly larger body.
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=1)
+
 
 # ============================================================================
 # API Routes
@@ -24,6 +24,9 @@ CACHE_DURATION = 3600
 # Exclude CLASS III which are just "Bike Routes" (sharrows on regular roads)
 REAL_BIKE_LANE_TYPES = {"CLASS I", "CLASS II", "CLASS IV"}
 
+# Valhalla maneuver travel types that are already known to be bike infrastructure
+VALHALLA_BIKE_TRAVEL_TYPES = {"cycleway", "path"}
+
 
 class BikeLaneService:
     """Service for calculating accurate bike lane percentage using SF Open Data."""
@@ -116,16 +119,20 @@ class BikeLaneService:
         self,
         route_coordinates: List[List[float]],
         max_distance_meters: float = 25.0,
+        valhalla_segments: Optional[List[Tuple[int, int, str, float]]] = None,
     ) -> Tuple[float, Dict[str, float]]:
         """Calculate accurate bike lane percentage by measuring distance to bike lanes.
 
         For each segment of the route, checks multiple points along the segment
-        to determine if it follows a bike lane.
+        to determine if it follows a bike lane. Segments Valhalla already tagged
+        as cycleway/path are counted as bike lane without the geometric check.
 
         Args:
             route_coordinates: List of [lon, lat] coordinates from route geometry
             max_distance_meters: Maximum distance to bike lane to count as "on bike lane"
                                  25m accounts for street width and coordinate discrepancies
+            valhalla_segments: Optional (start_index, end_index, travel_type, distance_m)
+                               spans of route_coordinates from Valhalla maneuvers
 
         Returns:
             Tuple of (bike_lane_percentage, stats_dict)
@@ -153,8 +160,16 @@ class BikeLaneService:
             segments_on_bike_lane = 0
             distance_samples = []
 
+            # Route segments Valhalla already placed on bike infrastructure
+            num_segments = len(route_coordinates) - 1
+            pre_tagged = [False] * num_segments
+            for start, end, travel_type, _ in valhalla_segments or ():
+                if travel_type in VALHALLA_BIKE_TRAVEL_TYPES:
+                    for j in range(max(start, 0), min(end, num_segments)):
+                        pre_tagged[j] = True
+
             # Check each segment of the route individually
-            for i in range(len(route_coordinates) - 1):
+            for i in range(num_segments):
                 coord1 = route_coordinates[i]
                 coord2 = route_coordinates[i + 1]
 
@@ -165,6 +180,11 @@ class BikeLaneService:
                 total_distance += segment_length
                 segments_checked += 1
 
+                if pre_tagged[i]:
+                    bike_lane_distance += segment_length
+                    segments_on_bike_lane += 1
+                    continue
+
                 # Check multiple points along the segment for better accuracy
                 # Check start, 1/3, 2/3, and end points
                 check_points = [
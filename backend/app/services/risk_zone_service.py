@@ -2,11 +2,13 @@
 
 import math
 import logging
+from collections import OrderedDict
 from typing import List, Tuple, Dict, Any, Optional
 
-from sqlalchemy import select
+import numpy as np
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
-from shapely import wkb
+from shapely import STRtree, points
 
 logger = logging.getLogger(__name__)
 
@@ -16,12 +18,100 @@ class RiskZoneServiceError(Exception):
     pass
 
 
+class ZoneGrid:
+    """Lat/lon bucket grid over a list of zones for bounding box lookups."""
+
+    def __init__(self, zones: List[Dict[str, Any]], cell_deg: float = 0.01):
+        # The list the grid was built for, and a snapshot its indices refer to
+        self.source = zones
+        self.zones = tuple(zones)
+        self.cell_deg = cell_deg
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        for i, zone in enumerate(zones):
+            key = (math.floor(zone["lat"] / cell_deg), math.floor(zone["lon"] / cell_deg))
+            self._cells.setdefault(key, []).append(i)
+
+    def query(
+        self, min_lat: float, min_lon: float, max_lat: float, max_lon: float
+    ) -> List[Dict[str, Any]]:
+        """Return zones whose centers fall inside the box, in original list order."""
+        row_lo, row_hi = math.floor(min_lat / self.cell_deg), math.floor(max_lat / self.cell_deg)
+        col_lo, col_hi = math.floor(min_lon / self.cell_deg), math.floor(max_lon / self.cell_deg)
+
+        if (row_hi - row_lo + 1) * (col_hi - col_lo + 1) >= len(self._cells):
+            # Box covers most of the grid, walking occupied cells is cheaper
+            indices = [
+                i for (row, col), bucket in self._cells.items()
+                if row_lo <= row <= row_hi and col_lo <= col <= col_hi
+                for i in bucket
+            ]
+        else:
+            indices = [
+                i
+                for row in range(row_lo, row_hi + 1)
+                for col in range(col_lo, col_hi + 1)
+                for i in self._cells.get((row, col), ())
+            ]
+
+        result = []
+        for i in sorted(indices):
+            zone = self.zones[i]
+            if min_lat <= zone["lat"] <= max_lat and min_lon <= zone["lon"] <= max_lon:
+                result.append(zone)
+        return result
+
+
+class ZoneTree:
+    """STRtree over zone centers, plus the zone columns used by route checks."""
+
+    def __init__(self, zones: List[Dict[str, Any]]):
+        # The list the tree was built for, and a snapshot its columns and
+        # indices refer to, so both stay aligned if the list is reordered
+        self.source = zones
+        self.zones = tuple(zones)
+        n = len(zones)
+        self.lons = np.fromiter((z["lon"] for z in zones), dtype=np.float64, count=n)
+        self.lats = np.fromiter((z["lat"] for z in zones), dtype=np.float64, count=n)
+        self.radius_meters = np.fromiter(
+            (z["radius_meters"] for z in zones), dtype=np.float64, count=n
+        )
+        self._max_radius = float(self.radius_meters.max()) if n else 0.0
+        self._max_abs_lat = float(np.abs(self.lats).max()) if n else 0.0
+        self._tree = STRtree(points(self.lons, self.lats))
+
+    def query_route(self, coords: np.ndarray, radius_factor: float) -> np.ndarray:
+        """Indices of zones whose center may be within its avoidance radius of the route.
+
+        A superset of the true hits, in original zone order: the tree returns
+        every center within the largest avoidance radius (in degrees, with 10%
+        slack and the longitude shrink at the highest latitude involved) of
+        any route point. Points rather than the whole line are queried so each
+        lookup only touches the tree nodes around that point.
+        """
+        if len(coords) == 0 or not self.zones:
+            return np.empty(0, dtype=np.intp)
+
+        lat_margin = self._max_radius * radius_factor * 1.1 / 111000
+        max_abs_lat = max(self._max_abs_lat, float(np.abs(coords[:, 1]).max())) + lat_margin
+        reach = lat_margin / math.cos(math.radians(min(max_abs_lat, 89.0)))
+
+        _, hits = self._tree.query(points(coords), predicate="dwithin", distance=reach)
+        return np.unique(hits)
+
+
 class RiskZoneService:
     """Service for fetching and processing risk zones for route avoidance."""
 
+    _MAX_GRIDS = 8
+    _MAX_TREES = 8
+
     def __init__(self):
         self._cached_zones: List[Dict[str, Any]] = []
         self._cache_loaded = False
+        # Derived from _cached_zones, reset whenever the zones are reloaded
+        self._severity_views: Dict[str, List[Dict[str, Any]]] = {}
+        self._grids: "OrderedDict[int, ZoneGrid]" = OrderedDict()
+        self._trees: "OrderedDict[int, ZoneTree]" = OrderedDict()
 
     async def get_risk_zones(self, db: Optional[AsyncSession] = None) -> List[Dict[str, Any]]:
         """Fetch all active risk zones from the database.
@@ -50,38 +140,44 @@ class RiskZoneService:
         return await self._fetch_zones_from_db(db)
 
     async def _fetch_zones_from_db(self, db: AsyncSession) -> List[Dict[str, Any]]:
-        """Fetch risk zones directly from the database."""
+        """Fetch risk zones directly from the database.
+
+        Only the columns the routing cache needs are selected, with each
+        zone's center (the point itself, or the centroid of other
+        geometries) computed by PostGIS rather than parsed from WKB here.
+        """
         try:
             from app.models.risk_zone import RiskZone
 
-            query = select(RiskZone).where(RiskZone.is_active == True)
+            center = func.ST_Centroid(RiskZone.geometry)
+            query = select(
+                RiskZone.id,
+                func.ST_X(center).label("lon"),
+                func.ST_Y(center).label("lat"),
+                RiskZone.alert_radius_meters,
+                RiskZone.severity,
+                RiskZone.reported_count,
+            ).where(RiskZone.is_active == True)
             result = await db.execute(query)
-            zones = result.scalars().all()
+            zones = result.all()
 
             self._cached_zones = []
+            self._reset_derived()
             for zone in zones:
-                try:
-                    # Parse WKB geometry to get coordinates
-                    geom = wkb.loads(bytes(zone.geometry.data))
-                    if geom.geom_type == "Point":
-                        lon, lat = geom.x, geom.y
-                    else:
-                        # For non-point geometries, use centroid
-                        centroid = geom.centroid
-                        lon, lat = centroid.x, centroid.y
-
-                    self._cached_zones.append({
-                        "id": str(zone.id),
-                        "lon": lon,
-                        "lat": lat,
-                        "radius_meters": zone.alert_radius_meters or 100,
-                        "severity": zone.severity.value.upper() if zone.severity else "MEDIUM",
-                        "reported_count": zone.reported_count or 0,
-                    })
-                except Exception as e:
-                    logger.warning(f"Failed to parse zone {zone.id}: {e}")
+                if zone.lon is None or zone.lat is None:
+                    # Empty geometry, no center to route around
+                    logger.warning(f"Failed to parse zone {zone.id}: no center")
                     continue
 
+                self._cached_zones.append({
+                    "id": str(zone.id),
+                    "lon": zone.lon,
+                    "lat": zone.lat,
+                    "radius_meters": zone.alert_radius_meters or 100,
+                    "severity": zone.severity.value.upper() if zone.severity else "MEDIUM",
+                    "reported_count": zone.reported_count or 0,
+                })
+
             self._cache_loaded = True
             logger.info(f"Loaded {len(self._cached_zones)} risk zones from database")
             return self._cached_zones
@@ -150,8 +246,12 @@ class RiskZoneService:
         if not zones:
             return []
 
-        filtered_zones = self.filter_zones_by_severity(zones, min_severity)
-        filtered_zones.sort(key=lambda z: z.get("reported_count", 0), reverse=True)
+        # Sorted copy: the filtered list is a shared view that grids and
+        # trees index by position, so it must not be reordered in place
+        filtered_zones = sorted(
+            self.filter_zones_by_severity(zones, min_severity),
+            key=lambda z: z.get("reported_count", 0), reverse=True,
+        )
 
         exclude_polygons = []
         total_circumference = 0.0
@@ -197,8 +297,12 @@ class RiskZoneService:
         if not zones:
             return []
 
-        filtered_zones = self.filter_zones_by_severity(zones, min_severity)
-        filtered_zones.sort(key=lambda z: z.get("reported_count", 0), reverse=True)
+        # Sorted copy: the filtered list is a shared view that grids and
+        # trees index by position, so it must not be reordered in place
+        filtered_zones = sorted(
+            self.filter_zones_by_severity(zones, min_severity),
+            key=lambda z: z.get("reported_count", 0), reverse=True,
+        )
 
         batches = []
         current_batch = []
@@ -255,29 +359,89 @@ class RiskZoneService:
             Tuple of (is_valid, violation_count, violations_detail)
         """
         filtered_zones = self.filter_zones_by_severity(zones, min_severity)
+        coords = np.asarray(route_coords, dtype=np.float64).reshape(-1, 2)
+        candidates, dist, inside = self._zone_hits(coords, filtered_zones, radius_factor)
         violations = []
 
-        for zone in filtered_zones:
-            zone_lon, zone_lat = zone["lon"], zone["lat"]
-            # Use reduced radius for routing avoidance
-            avoidance_radius = zone["radius_meters"] * radius_factor
-
-            for coord in route_coords:
-                lon, lat = coord[0], coord[1]
-                dist = self._haversine_distance(lat, lon, zone_lat, zone_lon)
-                if dist < avoidance_radius:
-                    violations.append({
-                        "zone_id": zone.get("id"),
-                        "reported_count": zone.get("reported_count", 0),
-                        "distance_m": round(dist, 1),
-                        "zone_radius_m": zone["radius_meters"],
-                        "avoidance_radius_m": round(avoidance_radius, 1),
-                    })
-                    break
+        for j in np.flatnonzero(inside.any(axis=0)):
+            zone = candidates[j]
+            # Distance at the first route point inside the zone
+            first = int(inside[:, j].argmax())
+            violations.append({
+                "zone_id": zone.get("id"),
+                "reported_count": zone.get("reported_count", 0),
+                "distance_m": round(float(dist[first, j]), 1),
+                "zone_radius_m": zone["radius_meters"],
+                "avoidance_radius_m": round(zone["radius_meters"] * radius_factor, 1),
+            })
 
         is_valid = len(violations) == 0
         return is_valid, len(violations), violations
 
+    def validate_route_against_zones_np(
+        self,
+        route_coords: np.ndarray,
+        zones: List[Dict[str, Any]],
+        min_severity: str = "LOW",
+        radius_factor: float = 0.25,
+    ) -> Tuple[bool, int]:
+        """Count zone violations for an already-decoded (N, 2) [lon, lat] array.
+
+        Same check as validate_route_against_zones without building the
+        per-violation details, for callers that only need the verdict.
+
+        Returns:
+            Tuple of (is_valid, violation_count)
+        """
+        filtered_zones = self.filter_zones_by_severity(zones, min_severity)
+        _, _, inside = self._zone_hits(route_coords, filtered_zones, radius_factor)
+        violation_count = int(inside.any(axis=0).sum())
+        return violation_count == 0, violation_count
+
+    def verification_confidence_np(self, verification_counts: np.ndarray) -> np.ndarray:
+        """Confidence scores for risk zones created from user verifications.
+
+        0.7 at the 3-verification threshold, plus 0.1 per further verification,
+        capped at 1.0; counts below 3 clamp to 0.7. Vectorized over an array
+        of verification counts, and also accepts a single count.
+        """
+        return 0.7 + 0.1 * np.clip(np.asarray(verification_counts) - 3, 0, 3)
+
+    def _zone_hits(
+        self,
+        coords: np.ndarray,
+        zones: List[Dict[str, Any]],
+        radius_factor: float,
+    ) -> Tuple[List[Dict[str, Any]], np.ndarray, np.ndarray]:
+        """Haversine distances from every route point to every nearby zone.
+
+        Only zones the cached STRtree finds near the route line are measured,
+        so the distance matrix stays narrow however many zones there are.
+
+        Returns:
+            (candidate zones, (N, M) distances in meters, (N, M) inside-radius mask)
+        """
+        if len(coords) == 0 or not zones:
+            empty = np.zeros((len(coords), 0))
+            return [], empty, empty.astype(bool)
+
+        tree = self.zone_tree(zones)
+        idx = tree.query_route(coords, radius_factor)
+        # Zones and their columns both come from the tree's own snapshot
+        candidates = [tree.zones[i] for i in idx]
+        radii = tree.radius_meters[idx] * radius_factor
+
+        R = 6371000  # Earth radius in meters
+        lons, lats = coords[:, 0], coords[:, 1]
+        lat1 = np.radians(lats)[:, None]
+        lat2 = np.radians(tree.lats[idx])[None, :]
+        dlat = lat2 - lat1
+        dlon = np.radians(tree.lons[idx][None, :] - lons[:, None])
+        a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+        dist = R * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+        return candidates, dist, dist < radii[None, :]
+
     def calculate_route_risk_score(
         self,
         route_coords: List[List[float]],
@@ -310,22 +474,20 @@ class RiskZoneService:
             "CRITICAL": 1.5,
         }
 
-        for zone in zones:
-            zone_lon, zone_lat = zone["lon"], zone["lat"]
-            zone_radius = zone["radius_meters"] * radius_factor
-            zone_severity = zone.get("severity", "MEDIUM")
+        coords = np.asarray(route_coords, dtype=np.float64).reshape(-1, 2)
+        candidates, dist, inside = self._zone_hits(coords, zones, radius_factor)
 
-            for coord in route_coords:
-                lon, lat = coord[0], coord[1]
-                dist = self._haversine_distance(lat, lon, zone_lat, zone_lon)
+        for j in np.flatnonzero(inside.any(axis=0)):
+            zone = candidates[j]
+            zone_radius = zone["radius_meters"] * radius_factor
+            # Closeness at the first route point inside the zone
+            first_dist = float(dist[int(inside[:, j].argmax()), j])
 
-                if dist < zone_radius:
-                    zone_passes += 1
-                    zones_passed.append(zone.get("id", "unknown"))
-                    closeness = 1 - (dist / zone_radius) if zone_radius > 0 else 1.0
-                    weight = severity_weights.get(zone_severity, 0.5)
-                    total_risk_points += closeness * weight
-                    break
+            zone_passes += 1
+            zones_passed.append(zone.get("id", "unknown"))
+            closeness = 1 - (first_dist / zone_radius) if zone_radius > 0 else 1.0
+            weight = severity_weights.get(zone.get("severity", "MEDIUM"), 0.5)
+            total_risk_points += closeness * weight
 
         if zones:
             risk_score = min(1.0, total_risk_points / (len(zones) * 0.3))
@@ -353,6 +515,48 @@ class RiskZoneService:
         """Clear the cached risk zones."""
         self._cached_zones = []
         self._cache_loaded = False
+        self._reset_derived()
+
+    def _reset_derived(self):
+        """Drop severity views, grids and trees built from the cached zones."""
+        self._severity_views = {}
+        self._grids.clear()
+        self._trees.clear()
+
+    def zone_grid(self, zones: List[Dict[str, Any]]) -> ZoneGrid:
+        """Get a bucket grid over a zone list, reusing one built for the same list.
+
+        Grids are keyed by list identity, so callers should pass the lists
+        returned by get_risk_zones/filter_zones_by_severity rather than copies.
+        """
+        key = id(zones)
+        grid = self._grids.get(key)
+        if grid is not None and grid.source is zones:
+            self._grids.move_to_end(key)
+            return grid
+
+        grid = ZoneGrid(zones)
+        self._grids[key] = grid
+        if len(self._grids) > self._MAX_GRIDS:
+            self._grids.popitem(last=False)
+        return grid
+
+    def zone_tree(self, zones: List[Dict[str, Any]]) -> ZoneTree:
+        """Get an STRtree over a zone list, reusing one built for the same list.
+
+        Keyed by list identity like zone_grid.
+        """
+        key = id(zones)
+        tree = self._trees.get(key)
+        if tree is not None and tree.source is zones:
+            self._trees.move_to_end(key)
+            return tree
+
+        tree = ZoneTree(zones)
+        self._trees[key] = tree
+        if len(self._trees) > self._MAX_TREES:
+            self._trees.popitem(last=False)
+        return tree
 
     def filter_zones_by_severity(
         self,
@@ -372,7 +576,8 @@ class RiskZoneService:
             min_severity: Minimum severity to include
 
         Returns:
-            Filtered list of zones
+            Filtered list of zones. For the loaded zone set this is a shared
+            list reused across calls, so callers must not mutate it.
         """
         # Map severity to minimum reported_count threshold
         # This matches the frontend color coding:
@@ -388,10 +593,17 @@ class RiskZoneService:
 
         min_count = severity_thresholds.get(min_severity.upper(), 160)
 
+        # The loaded zone set is filtered the same way on every request
+        is_cached = zones is self._cached_zones and self._cache_loaded
+        if is_cached and min_severity.upper() in self._severity_views:
+            return self._severity_views[min_severity.upper()]
+
         filtered = [
             z for z in zones
             if z.get("reported_count", 0) >= min_count
         ]
+        if is_cached:
+            self._severity_views[min_severity.upper()] = filtered
 
         logger.debug(f"Filtered zones: {len(filtered)} of {len(zones)} with min_severity={min_severity} (min_count={min_count})")
         return filtered
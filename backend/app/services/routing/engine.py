@@ -1,12 +1,25 @@
 """Routing engine service - interfaces with Valhalla."""
 
+import asyncio
+import heapq
+import time
 import uuid
 import logging
-from typing import List, Optional, Tuple, Dict, Any
+from collections import OrderedDict
+from functools import lru_cache
+from types import MappingProxyType
+from typing import List, Optional, Tuple, Dict, Any, Union
 
 import math
 
 import httpx
+import numpy as np
+import orjson
+
+try:
+    from numba import njit
+except ImportError:  # numba is an optional speedup for polyline decoding
+    njit = None
 
 from app.config import settings
 from app.schemas.routing import (
@@ -62,14 +75,286 @@ VALHALLA_MANEUVER_MAP = {
     27: ManeuverType.ARRIVE,
 }
 
+# Zone severities counted as high severity in route risk analysis
+_HIGH_SEVERITIES = frozenset(("HIGH", "CRITICAL"))
+
+
+def _decode_polyline_kernel(buf: np.ndarray, precision_factor: float) -> np.ndarray:
+    """Decode an encoded polyline into an (N, 2) array of [lon, lat].
+
+    Raises ValueError if the polyline ends partway through a coordinate.
+
+    Args:
+        buf: The encoded polyline as a uint8 array of ASCII codes
+        precision_factor: 10**precision (Valhalla uses precision 6)
+    """
+    n = len(buf)
+    # Every coordinate takes at least two characters
+    out = np.empty((n // 2, 2), dtype=np.float64)
+    count = 0
+    index = 0
+    lat = 0
+    lng = 0
+
+    while index < n:
+        # Decode latitude
+        shift = 0
+        result = 0
+        while True:
+            if index >= n:
+                raise ValueError("truncated polyline")
+            b = int(buf[index]) - 63
+            index += 1
+            result |= (b & 0x1F) << shift
+            shift += 5
+            if b < 0x20:
+                break
+        # Zig-zag decode: (result >> 1) when even, ~(result >> 1) when odd
+        lat += (result >> 1) ^ -(result & 1)
+
+        # Decode longitude
+        shift = 0
+        result = 0
+        while True:
+            if index >= n:
+                raise ValueError("truncated polyline")
+            b = int(buf[index]) - 63
+            index += 1
+            result |= (b & 0x1F) << shift
+            shift += 5
+            if b < 0x20:
+                break
+        lng += (result >> 1) ^ -(result & 1)
+
+        out[count, 0] = lng / precision_factor
+        out[count, 1] = lat / precision_factor
+        count += 1
+
+    return out[:count]
+
+
+def _decode_polyline_np(buf: np.ndarray, precision_factor: float) -> np.ndarray:
+    """Vectorized polyline decoder for when numba is not installed.
+
+    Decodes every varint at once instead of looping per character: a byte
+    below 0x20 (after subtracting 63) ends a value, each 5-bit chunk is
+    shifted by its position within its value, and np.add.reduceat sums the
+    chunks. Values alternate lat/lng deltas, so a cumsum over each column
+    recovers the coordinates. Raises ValueError on a truncated polyline,
+    like the compiled decoder.
+    """
+    if len(buf) == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    chunks = buf.astype(np.int64) - 63
+    ends = np.flatnonzero(chunks < 0x20)
+    # A complete polyline ends on a terminator after a whole (lat, lng) pair
+    if len(ends) % 2 or len(ends) == 0 or ends[-1] != len(chunks) - 1:
+        raise ValueError("truncated polyline")
+
+    starts = np.empty_like(ends)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    # Position of every character within its value
+    positions = np.arange(len(chunks)) - np.repeat(starts, ends - starts + 1)
+    values = np.add.reduceat((chunks & 0x1F) << (5 * positions), starts)
+    # Zig-zag decode: (result >> 1) when even, ~(result >> 1) when odd
+    deltas = (values >> 1) ^ -(values & 1)
+
+    out = np.empty((len(deltas) // 2, 2), dtype=np.float64)
+    out[:, 0] = np.cumsum(deltas[1::2]) / precision_factor
+    out[:, 1] = np.cumsum(deltas[0::2]) / precision_factor
+    return out
+
+
+# JIT-compiled decoder (compiled on first use, cached on disk); None without numba.
+# The kernel checks index < len(buf) before every read and raises on a
+# truncated value, and each coordinate consumes at least two characters so
+# count stays under the n // 2 output bound. Numba's own bounds checks stay
+# off even if NUMBA_BOUNDSCHECK is set globally.
+_decode_polyline_nb = (
+    njit(cache=True, boundscheck=False)(_decode_polyline_kernel) if njit is not None else None
+)
+
+
+def warm_up_polyline_decoder() -> None:
+    """Compile (or load from the disk cache) the numba polyline decoder.
+
+    numba compiles on the first call, which can take seconds without a
+    cache; the app calls this at startup so no route request pays for it.
+    """
+    if _decode_polyline_nb is not None:
+        _decode_polyline_nb(np.frombuffer(b"??", dtype=np.uint8), 1e6)
+
+
+@lru_cache(maxsize=4096)
+def _polygon_cached(
+    lon: float, lat: float, radius_meters: float
+) -> Tuple[Tuple[float, float], ...]:
+    """8-point exclude polygon around a zone center, cached across requests.
+
+    Zones recur across requests, so callers round the radius to 0.1m to keep
+    the cache keys stable. Returned as tuples so cached entries can't be mutated.
+    """
+    polygon = risk_zone_service.create_circular_polygon(lon, lat, radius_meters, num_points=8)
+    return tuple((point[0], point[1]) for point in polygon)
+
+
+@lru_cache(maxsize=4096)
+def _zone_uuid_cached(zone_id: str) -> uuid.UUID:
+    """Parse a risk zone id into a UUID, cached since zone ids recur across requests."""
+    return uuid.UUID(zone_id)
+
+
+@lru_cache(maxsize=2048)
+def _mock_route_core(
+    lat1: float, lon1: float, lat2: float, lon2: float
+) -> Tuple[float, int, np.ndarray]:
+    """Straight-line mock route geometry for one origin/destination pair.
+
+    Returns (distance_m, duration_s, coordinates) where coordinates is a
+    read-only (N, 2) [lon, lat] array. Cached since development clients
+    tend to request the same pairs over and over.
+    """
+    # Calculate straight-line distance (Haversine formula)
+    R = 6371000  # Earth radius in meters
+    lat1_rad, lon1_rad = math.radians(lat1), math.radians(lon1)
+    lat2_rad, lon2_rad = math.radians(lat2), math.radians(lon2)
+
+    dlat = lat2_rad - lat1_rad
+    dlon = lon2_rad - lon1_rad
+
+    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
+    distance = R * c
+
+    # Estimate duration (assuming ~15 km/h average for micromobility)
+    duration = int(distance / (15 * 1000 / 3600))  # seconds
+
+    # Generate intermediate points for a more realistic route line
+    num_points = max(10, int(distance / 100))  # One point every ~100m
+    t = np.linspace(0.0, 1.0, num_points + 1)
+    lats = lat1 + t * (lat2 - lat1)
+    lons = lon1 + t * (lon2 - lon1)
+    coordinates = np.column_stack([lons, lats])
+    coordinates.flags.writeable = False
+
+    return distance, duration, coordinates
+
+
+@lru_cache(maxsize=64)
+def _costing_options_cached(
+    profile: RouteProfile, vehicle_type: VehicleType,
+    avoid_hills: bool, prefer_bike_lanes: bool,
+) -> MappingProxyType:
+    """Valhalla bicycle costing options for one combination of preferences.
+
+    The options depend only on these four values, so they are computed once
+    per combination. See RoutingEngine._build_costing_options for the
+    profile behaviors.
+    """
+    options = {
+        "bicycle_type": "Road" if vehicle_type == VehicleType.BIKE else "Hybrid",
+        "use_roads": 0.5,  # Balance between roads and bike paths
+        "use_hills": 0.5 if not avoid_hills else 0.1,
+        "avoid_bad_surfaces": 0.5,
+    }
+
+    # Adjust based on profile
+    if profile == RouteProfile.SAFEST:
+        # Safest: Normal routing - risk zone avoidance is handled separately
+        # Does NOT force bike lanes (user must toggle "Bike Lane Only" for that)
+        options["use_roads"] = 0.5  # Allow normal roads
+        options["use_hills"] = 0.3  # Prefer gentler hills
+        options["avoid_bad_surfaces"] = 0.6  # Prefer good surfaces
+        options["shortest"] = False
+    elif profile == RouteProfile.FASTEST:
+        # Fastest: Pure time optimization, use roads freely
+        # NOTE: Valhalla's "shortest" means shortest DISTANCE, not time
+        # To get fastest time, we remove shortest and let Valhalla optimize for time
+        options["use_roads"] = 1.0  # Use roads freely for fastest route
+        options["use_hills"] = 1.0  # Accept any hills (going downhill is faster)
+        options["avoid_bad_surfaces"] = 0.0  # Don't avoid surfaces
+        # Don't set "shortest" - Valhalla optimizes for time by default
+    elif profile == RouteProfile.BALANCED:
+        # Balanced: Mix roads and bike lanes intelligently
+        options["use_roads"] = 0.5  # Balance road and bike lane usage
+        options["use_hills"] = 0.5 if not avoid_hills else 0.2
+        options["avoid_bad_surfaces"] = 0.5
+        options["shortest"] = False
+    elif profile == RouteProfile.SCENIC:
+        options["use_roads"] = 0.3
+        options["use_hills"] = 0.4
+        options["avoid_bad_surfaces"] = 0.6
+
+    # Handle "Bike Lane Only" toggle - when enabled, ONLY use bike lanes
+    # This is the ONLY way to force bike-lane-only routing
+    if prefer_bike_lanes:
+        # Force bike lanes only - set use_roads to minimum
+        options["use_roads"] = 0.0  # Force bike lanes/cycleways only
+        options["avoid_bad_surfaces"] = 0.8
+
+    # Override with avoid_hills if explicitly set
+    if avoid_hills:
+        options["use_hills"] = 0.1
+
+    return MappingProxyType(options)
+
 
 class RoutingEngine:
     """Service for calculating routes using Valhalla."""
 
+    # Request fields shared by every Valhalla /route call. Builders copy these
+    # (and the costing presets below) instead of rebuilding the literals per call.
+    _DIRECTIONS_OPTIONS = MappingProxyType({"units": "meters", "language": "en-US"})
+    _REQUEST_TEMPLATE = MappingProxyType({
+        "costing": "bicycle",
+        "elevation_interval": 30,  # Request elevation data every 30 meters
+        "format": "json",
+    })
+
+    _JSON_HEADERS = {"content-type": "application/json"}
+
+    # How long, and for how many shapes, trace_attributes bike lane results are reused
+    _BIKE_LANE_FALLBACK_TTL = 300.0
+    _BIKE_LANE_FALLBACK_CACHE_SIZE = 256
+
+    # Costing for single-waypoint avoidance routes
+    _WAYPOINT_COSTING = MappingProxyType({
+        "bicycle_type": "Hybrid",
+        "use_roads": 0.2,
+        "use_hills": 0.3,
+        "avoid_bad_surfaces": 0.7,
+    })
+    # Costing for multi-waypoint chains around individual zones
+    _CHAIN_COSTING = MappingProxyType({
+        "bicycle_type": "Hybrid",
+        "use_roads": 0.3,
+        "use_hills": 0.3,
+        "avoid_bad_surfaces": 0.6,
+    })
+
     def __init__(self):
         self.valhalla_url = settings.valhalla_url
-        self.client = httpx.AsyncClient(timeout=30.0)
+        # Enough pooled connections for a full burst of concurrent avoidance
+        # probes; HTTP/2 multiplexes them when Valhalla is served over TLS
+        self.client = httpx.AsyncClient(
+            timeout=30.0,
+            http2=True,
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=32),
+            headers={"user-agent": "sfmm-router/1"},
+        )
         self._fallback_routes = []
+        # trace_attributes bike lane results keyed by the sampled shape bytes,
+        # as (timestamp, percentage, stats); oldest first
+        self._bike_lane_fallback_cache: "OrderedDict[bytes, Tuple[float, float, Dict[str, float]]]" = OrderedDict()
+
+    async def _post_json(self, url: str, body: dict) -> httpx.Response:
+        """POST a JSON body to Valhalla, serialized with orjson."""
+        return await self.client.post(
+            url,
+            content=orjson.dumps(body, option=orjson.OPT_SERIALIZE_NUMPY),
+            headers=self._JSON_HEADERS,
+        )
 
     async def calculate_route(
         self,
@@ -141,15 +426,12 @@ class RoutingEngine:
                 if exclude_polygons:
                     valhalla_request["exclude_polygons"] = exclude_polygons
 
-                response = await self.client.post(
-                    f"{self.valhalla_url}/route",
-                    json=valhalla_request,
-                )
+                response = await self._post_json(f"{self.valhalla_url}/route", valhalla_request)
                 if not response.is_success:
                     logger.debug(f"Bike lane option {idx} failed: HTTP {response.status_code}")
                     continue
 
-                valhalla_response = response.json()
+                valhalla_response = orjson.loads(response.content)
                 route = await self._parse_valhalla_response(valhalla_response, request)
 
                 if not route.geometry.coordinates:
@@ -190,12 +472,9 @@ class RoutingEngine:
             if exclude_polygons:
                 alt_request["exclude_polygons"] = exclude_polygons
 
-            response = await self.client.post(
-                f"{self.valhalla_url}/route",
-                json=alt_request,
-            )
+            response = await self._post_json(f"{self.valhalla_url}/route", alt_request)
             if response.is_success:
-                valhalla_response = response.json()
+                valhalla_response = orjson.loads(response.content)
                 for trip_data in [valhalla_response] + valhalla_response.get("alternates", []):
                     try:
                         route = await self._parse_valhalla_response(trip_data, request)
@@ -323,15 +602,12 @@ class RoutingEngine:
 
         for name, valhalla_request in all_candidates:
             try:
-                response = await self.client.post(
-                    f"{self.valhalla_url}/route",
-                    json=valhalla_request,
-                )
+                response = await self._post_json(f"{self.valhalla_url}/route", valhalla_request)
                 if not response.is_success:
                     logger.debug(f"Candidate '{name}' failed: HTTP {response.status_code}")
                     continue
 
-                valhalla_response = response.json()
+                valhalla_response = orjson.loads(response.content)
                 trips = [("main", valhalla_response)]
                 for i, alt in enumerate(valhalla_response.get("alternates", [])):
                     trips.append((f"alt{i}", alt))
@@ -400,9 +676,7 @@ class RoutingEngine:
                     circ = 2 * math.pi * radius
                     if total_circ + circ > 9500:
                         break
-                    polygon = risk_zone_service.create_circular_polygon(
-                        zone["lon"], zone["lat"], radius, num_points=8
-                    )
+                    polygon = _polygon_cached(zone["lon"], zone["lat"], round(radius, 1))
                     focused_polygons.append(polygon)
                     total_circ += circ
 
@@ -415,12 +689,10 @@ class RoutingEngine:
                         req = self._build_base_valhalla_request(request, options)
                         req["exclude_polygons"] = focused_polygons
                         try:
-                            response = await self.client.post(
-                                f"{self.valhalla_url}/route", json=req,
-                            )
+                            response = await self._post_json(f"{self.valhalla_url}/route", req)
                             if not response.is_success:
                                 continue
-                            valhalla_response = response.json()
+                            valhalla_response = orjson.loads(response.content)
                             for trip_data in [valhalla_response] + valhalla_response.get("alternates", []):
                                 try:
                                     route = await self._parse_valhalla_response(trip_data, request)
@@ -444,11 +716,9 @@ class RoutingEngine:
                     alt_req["alternates"] = 2
                     alt_req["exclude_polygons"] = focused_polygons
                     try:
-                        response = await self.client.post(
-                            f"{self.valhalla_url}/route", json=alt_req,
-                        )
+                        response = await self._post_json(f"{self.valhalla_url}/route", alt_req)
                         if response.is_success:
-                            valhalla_response = response.json()
+                            valhalla_response = orjson.loads(response.content)
                             for trip_data in [valhalla_response] + valhalla_response.get("alternates", []):
                                 try:
                                     route = await self._parse_valhalla_response(trip_data, request)
@@ -515,6 +785,7 @@ class RoutingEngine:
         best_violations = float('inf')
 
         avoidance_factor = 0.25 if min_severity == "LOW" else 0.2
+        zone_lats, zone_lons = self._zone_arrays(risk_zones_data)
 
         for iteration in range(max_iterations):
             # Check which zones are violated
@@ -546,9 +817,7 @@ class RoutingEngine:
                 circ = 2 * math.pi * radius
                 if total_circ + circ > 9500:
                     break
-                polygon = risk_zone_service.create_circular_polygon(
-                    zone["lon"], zone["lat"], radius, num_points=8
-                )
+                polygon = _polygon_cached(zone["lon"], zone["lat"], round(radius, 1))
                 focused_polygons.append(polygon)
                 total_circ += circ
 
@@ -563,7 +832,7 @@ class RoutingEngine:
                 min_dist = float('inf')
                 nearest_idx = 0
                 for idx, coord in enumerate(coords):
-                    dist = self._simple_distance(z_lat, z_lon, coord[1], coord[0])
+                    dist = self._simple_distance_sq(z_lat, z_lon, coord[1], coord[0])
                     if dist < min_dist:
                         min_dist = dist
                         nearest_idx = idx
@@ -579,7 +848,7 @@ class RoutingEngine:
                     route_dir_lat = coords[min(1, len(coords) - 1)][1] - coords[0][1]
                     route_dir_lon = coords[min(1, len(coords) - 1)][0] - coords[0][0]
 
-                rmag = math.sqrt(route_dir_lat**2 + route_dir_lon**2)
+                rmag = math.hypot(route_dir_lat, route_dir_lon)
                 if rmag > 0:
                     perp_lat = -route_dir_lon / rmag
                     perp_lon = route_dir_lat / rmag
@@ -589,23 +858,23 @@ class RoutingEngine:
                 offset_deg = (z_radius * (2.5 + iteration * 1.0)) / 111000
                 wp1 = (z_lat + perp_lat * offset_deg, z_lon + perp_lon * offset_deg)
                 wp2 = (z_lat - perp_lat * offset_deg, z_lon - perp_lon * offset_deg)
-                wp1_score = self._score_waypoint(wp1, risk_zones_data)
-                wp2_score = self._score_waypoint(wp2, risk_zones_data)
+                wp1_score = self._score_waypoint(wp1, zone_lats, zone_lons)
+                wp2_score = self._score_waypoint(wp2, zone_lats, zone_lons)
                 avoidance_waypoints.append(wp1 if wp1_score > wp2_score else wp2)
 
             # Try routing with waypoints + focused exclude polygons
             try:
+                # Every iteration's route is fully parsed, so keep elevation inline
                 wp_request = self._build_multi_waypoint_request(
                     request, avoidance_waypoints,
                     exclude_polygons=focused_polygons if focused_polygons else None,
+                    include_elevation=True,
                 )
-                response = await self.client.post(
-                    f"{self.valhalla_url}/route", json=wp_request
-                )
+                response = await self._post_json(f"{self.valhalla_url}/route", wp_request)
                 if not response.is_success:
                     continue
 
-                route = await self._parse_valhalla_response(response.json(), request)
+                route = await self._parse_valhalla_response(orjson.loads(response.content), request)
                 if route.geometry.coordinates:
                     is_valid_new, new_violations, _ = risk_zone_service.validate_route_against_zones(
                         route.geometry.coordinates, all_zones, min_severity,
@@ -641,6 +910,14 @@ class RoutingEngine:
         if not zones_on_path:
             return None
 
+        # Zone centers as arrays, shared by every waypoint score below. With a
+        # single zone on the path, sides are ranked against that zone alone so
+        # _offset_waypoints can pick them with a dot product
+        if len(zones_on_path) == 1:
+            zone_lats, zone_lons = self._zone_arrays(zones_on_path)
+        else:
+            zone_lats, zone_lons = self._zone_arrays(risk_zones_data)
+
         avg_lat = sum(z["lat"] for z in zones_on_path) / len(zones_on_path)
         avg_lon = sum(z["lon"] for z in zones_on_path) / len(zones_on_path)
 
@@ -653,9 +930,7 @@ class RoutingEngine:
             circ = 2 * math.pi * radius
             if total_circ + circ > 9500:
                 break
-            polygon = risk_zone_service.create_circular_polygon(
-                zone["lon"], zone["lat"], radius, num_points=8
-            )
+            polygon = _polygon_cached(zone["lon"], zone["lat"], round(radius, 1))
             path_exclude_polygons.append(polygon)
             total_circ += circ
 
@@ -664,123 +939,214 @@ class RoutingEngine:
         # Convert to degrees for offset calculation
         base_offset = (max_zone_radius * 2) / 111000
 
-        # Stage 1: Single waypoint with increasing offsets
-        waypoints = self._generate_avoidance_waypoints(
-            origin, dest, avg_lat, avg_lon, risk_zones_data
-        )
-
-        # Add extra-wide offsets proportional to zone sizes
+        # Unit vector perpendicular to the origin->destination direction
         dir_lat = dest[0] - origin[0]
         dir_lon = dest[1] - origin[1]
-        mag = math.sqrt(dir_lat ** 2 + dir_lon ** 2)
+        mag = math.hypot(dir_lat, dir_lon)
         if mag > 0:
             perp_lat, perp_lon = -dir_lon / mag, dir_lat / mag
         else:
             perp_lat, perp_lon = 0.0, 1.0
 
-        for mult in [2.0, 3.0, 4.0, 5.0]:
-            offset = base_offset * mult
-            wp1 = (avg_lat + perp_lat * offset, avg_lon + perp_lon * offset)
-            wp2 = (avg_lat - perp_lat * offset, avg_lon - perp_lon * offset)
-            wp1_score = self._score_waypoint(wp1, risk_zones_data)
-            wp2_score = self._score_waypoint(wp2, risk_zones_data)
-            waypoints.append(wp1 if wp1_score > wp2_score else wp2)
+        # Stage 1: Single waypoint with increasing offsets
+        waypoints = self._generate_avoidance_waypoints(
+            origin, dest, avg_lat, avg_lon, perp_lat, perp_lon, zone_lats, zone_lons
+        )
 
-        best_route = None
+        # Add extra-wide offsets proportional to zone sizes
+        offsets = base_offset * np.array([2.0, 3.0, 4.0, 5.0])
+        wide, _ = self._offset_waypoints(
+            np.full(len(offsets), avg_lat), np.full(len(offsets), avg_lon), offsets,
+            perp_lat, perp_lon, zone_lats, zone_lons,
+        )
+        waypoints.extend(tuple(wp) for wp in wide.tolist())
+
+        # Least-bad candidate response, only parsed if it ends up being returned
+        best_response = None
         best_passes = float('inf')
 
-        for wp in waypoints[:16]:
-            try:
-                wp_request = self._build_waypoint_request(
-                    request, wp,
-                    exclude_polygons=path_exclude_polygons if path_exclude_polygons else None,
-                )
-                response = await self.client.post(
-                    f"{self.valhalla_url}/route", json=wp_request
+        # Fewer zones on the path -> the first few candidates are usually enough
+        if len(zones_on_path) <= 1:
+            n_probes = 4
+        elif len(zones_on_path) <= 3:
+            n_probes = 8
+        else:
+            n_probes = 16
+
+        # Probe candidates concurrently but take results in candidate order, so
+        # the lowest-offset clean route wins regardless of Valhalla latency;
+        # later probes still in flight are cancelled once it is found
+        probes = [
+            asyncio.create_task(
+                self._probe_waypoint_route(
+                    request, wp, path_exclude_polygons, all_zones, min_severity
                 )
-                if not response.is_success:
-                    continue
-
-                route = await self._parse_valhalla_response(response.json(), request)
-                if not route.geometry.coordinates:
+            )
+            for wp in waypoints[:n_probes]
+        ]
+        try:
+            for probe in probes:
+                result = await probe
+                if result is None:
                     continue
 
-                avoidance_factor = 0.25 if min_severity == "LOW" else 0.2
-                is_valid, violation_count, _ = risk_zone_service.validate_route_against_zones(
-                    route.geometry.coordinates, all_zones, min_severity,
-                    radius_factor=avoidance_factor,
-                )
-
+                wp, valhalla_response, is_valid, violation_count = result
                 if is_valid:
+                    try:
+                        route = await self._parse_valhalla_response(valhalla_response, request, fetch_elevation=True)
+                    except Exception:
+                        continue
                     logger.info(f"Found clean waypoint route via ({wp[0]:.5f}, {wp[1]:.5f})")
                     return route
 
                 if violation_count < best_passes:
                     best_passes = violation_count
-                    best_route = route
-
-            except Exception:
-                continue
+                    best_response = valhalla_response
+        finally:
+            for probe in probes:
+                probe.cancel()
 
         # Stage 2: Multi-waypoint chains - go around each individual zone
         if best_passes > 0 and len(zones_on_path) <= 5:
-            for attempt in range(4):
-                chain_waypoints = []
-                multiplier = 2.0 + attempt * 1.5
-                for zone in zones_on_path:
-                    z_lat, z_lon = zone["lat"], zone["lon"]
-                    z_radius = zone.get("radius_meters", 150)
-                    offset_deg = (z_radius * multiplier) / 111000
-
-                    wp1 = (z_lat + perp_lat * offset_deg, z_lon + perp_lon * offset_deg)
-                    wp2 = (z_lat - perp_lat * offset_deg, z_lon - perp_lon * offset_deg)
-                    wp1_score = self._score_waypoint(wp1, risk_zones_data)
-                    wp2_score = self._score_waypoint(wp2, risk_zones_data)
-                    chain_waypoints.append(wp1 if wp1_score > wp2_score else wp2)
-
-                try:
-                    chain_request = self._build_multi_waypoint_request(
-                        request, chain_waypoints,
-                        exclude_polygons=path_exclude_polygons if path_exclude_polygons else None,
-                    )
-                    response = await self.client.post(
-                        f"{self.valhalla_url}/route", json=chain_request
+            path_lats, path_lons = self._zone_arrays(zones_on_path)
+            path_radii = np.array([z.get("radius_meters", 150) for z in zones_on_path], dtype=np.float64)
+            chains = []
+            for multiplier in (2.0, 3.5, 5.0, 6.5):
+                chain, _ = self._offset_waypoints(
+                    path_lats, path_lons, (path_radii * multiplier) / 111000,
+                    perp_lat, perp_lon, zone_lats, zone_lons,
+                )
+                chains.append([tuple(wp) for wp in chain.tolist()])
+
+            # All attempts run concurrently, but results are taken in attempt
+            # order so the tightest clean chain wins regardless of latency; once
+            # one is clean the later attempts are cancelled, and the task group
+            # never leaves an attempt running
+            results = {}
+            async with asyncio.TaskGroup() as tg:
+                attempts = [
+                    tg.create_task(
+                        self._probe_chain_route(
+                            request, chain, path_exclude_polygons, all_zones, min_severity
+                        )
                     )
-                    if not response.is_success:
+                    for chain in chains
+                ]
+                for attempt, task in enumerate(attempts):
+                    result = await task
+                    if result is None:
                         continue
+                    results[attempt] = result
+                    if result[1]:
+                        for later in attempts[attempt + 1:]:
+                            later.cancel()
+                        break
 
-                    route = await self._parse_valhalla_response(response.json(), request)
-                    if not route.geometry.coordinates:
+            for attempt in sorted(results):
+                valhalla_response, is_valid, violation_count = results[attempt]
+                if is_valid:
+                    try:
+                        route = await self._parse_valhalla_response(valhalla_response, request, fetch_elevation=True)
+                    except Exception:
                         continue
+                    logger.info(f"Found clean multi-waypoint route (attempt {attempt})")
+                    return route
 
-                    avoidance_factor = 0.25 if min_severity == "LOW" else 0.2
-                    is_valid, violation_count, _ = risk_zone_service.validate_route_against_zones(
-                        route.geometry.coordinates, all_zones, min_severity,
-                        radius_factor=avoidance_factor,
-                    )
-
-                    if is_valid:
-                        logger.info(f"Found clean multi-waypoint route (attempt {attempt})")
-                        return route
-
-                    if violation_count < best_passes:
-                        best_passes = violation_count
-                        best_route = route
-
-                except Exception:
-                    continue
+                if violation_count < best_passes:
+                    best_passes = violation_count
+                    best_response = valhalla_response
 
         # Only return fallback if BALANCED (where 1 low-severity pass may be acceptable)
         # For SAFEST, return None to force the engine to use the least-bad candidate
-        if min_severity == "HIGH" and best_route and best_passes <= 1:
-            return best_route
+        if min_severity == "HIGH" and best_passes <= 1 and best_response is not None:
+            try:
+                return await self._parse_valhalla_response(best_response, request, fetch_elevation=True)
+            except Exception:
+                return None
         return None
 
+    async def _probe_chain_route(
+        self, request: RouteRequest, chain_waypoints: List[Tuple[float, float]],
+        exclude_polygons: Optional[List], all_zones: list, min_severity: str,
+    ) -> Optional[Tuple[Dict[str, Any], bool, int]]:
+        """Route through a chain of waypoints and validate the result against risk zones.
+
+        Like _probe_waypoint_route, only the shape is decoded for validation.
+
+        Returns (valhalla_response, is_valid, violation_count), or None if the
+        request failed or produced no geometry.
+        """
+        try:
+            chain_request = self._build_multi_waypoint_request(
+                request, chain_waypoints,
+                exclude_polygons=exclude_polygons if exclude_polygons else None,
+            )
+            response = await self._post_json(f"{self.valhalla_url}/route", chain_request)
+            if not response.is_success:
+                return None
+
+            valhalla_response = orjson.loads(response.content)
+            coordinates = self._decode_shape_array(valhalla_response)
+            if not len(coordinates):
+                return None
+
+            avoidance_factor = 0.25 if min_severity == "LOW" else 0.2
+            is_valid, violation_count = risk_zone_service.validate_route_against_zones_np(
+                coordinates, all_zones, min_severity,
+                radius_factor=avoidance_factor,
+            )
+            return valhalla_response, is_valid, violation_count
+
+        except Exception:
+            return None
+
+    async def _probe_waypoint_route(
+        self, request: RouteRequest, wp: Tuple[float, float],
+        exclude_polygons: Optional[List], all_zones: list, min_severity: str,
+    ) -> Optional[Tuple[Tuple[float, float], Dict[str, Any], bool, int]]:
+        """Route via a single waypoint and validate the result against risk zones.
+
+        Only the route shape is decoded for validation; the full (and much more
+        expensive) _parse_valhalla_response is left to the caller, which only
+        runs it for the route it actually returns.
+
+        Returns (waypoint, valhalla_response, is_valid, violation_count), or None
+        if the request failed or produced no geometry.
+        """
+        try:
+            wp_request = self._build_waypoint_request(
+                request, wp,
+                exclude_polygons=exclude_polygons if exclude_polygons else None,
+            )
+            response = await self._post_json(f"{self.valhalla_url}/route", wp_request)
+            if not response.is_success:
+                return None
+
+            valhalla_response = orjson.loads(response.content)
+            coordinates = self._decode_shape_array(valhalla_response)
+            if not len(coordinates):
+                return None
+
+            avoidance_factor = 0.25 if min_severity == "LOW" else 0.2
+            is_valid, violation_count = risk_zone_service.validate_route_against_zones_np(
+                coordinates, all_zones, min_severity,
+                radius_factor=avoidance_factor,
+            )
+            return wp, valhalla_response, is_valid, violation_count
+
+        except Exception:
+            return None
+
     def _build_multi_waypoint_request(
         self, request: RouteRequest, waypoints: List[Tuple[float, float]],
         exclude_polygons: Optional[List] = None,
+        include_elevation: bool = False,
     ) -> dict:
-        """Build Valhalla request with multiple intermediate waypoints."""
+        """Build Valhalla request with multiple intermediate waypoints.
+
+        Elevation is left out by default since most waypoint candidates are
+        rejected; _parse_valhalla_response fetches it for the route it keeps.
+        """
         locations = [
             {"lat": request.origin.latitude, "lon": request.origin.longitude, "type": "break"},
         ]
@@ -789,21 +1155,7 @@ class RoutingEngine:
         locations.append(
             {"lat": request.destination.latitude, "lon": request.destination.longitude, "type": "break"}
         )
-        result = {
-            "locations": locations,
-            "costing": "bicycle",
-            "costing_options": {
-                "bicycle": {
-                    "bicycle_type": "Hybrid",
-                    "use_roads": 0.3,
-                    "use_hills": 0.3,
-                    "avoid_bad_surfaces": 0.6,
-                }
-            },
-            "directions_options": {"units": "meters", "language": "en-US"},
-            "elevation_interval": 30,
-            "format": "json",
-        }
+        result = self._new_request(locations, dict(self._CHAIN_COSTING), include_elevation=include_elevation)
         if exclude_polygons:
             result["exclude_polygons"] = exclude_polygons
         return result
@@ -834,12 +1186,9 @@ class RoutingEngine:
             try:
                 valhalla_request = self._build_base_valhalla_request(request, options)
 
-                response = await self.client.post(
-                    f"{self.valhalla_url}/route",
-                    json=valhalla_request,
-                )
+                response = await self._post_json(f"{self.valhalla_url}/route", valhalla_request)
                 response.raise_for_status()
-                valhalla_response = response.json()
+                valhalla_response = orjson.loads(response.content)
 
                 route = await self._parse_valhalla_response(valhalla_response, request)
 
@@ -857,12 +1206,9 @@ class RoutingEngine:
             alt_request = self._build_base_valhalla_request(request, route_options[0])
             alt_request["alternates"] = 2
 
-            response = await self.client.post(
-                f"{self.valhalla_url}/route",
-                json=alt_request,
-            )
+            response = await self._post_json(f"{self.valhalla_url}/route", alt_request)
             response.raise_for_status()
-            valhalla_response = response.json()
+            valhalla_response = orjson.loads(response.content)
 
             # Check main route
             route = await self._parse_valhalla_response(valhalla_response, request)
@@ -905,12 +1251,11 @@ class RoutingEngine:
         min_lon = min(o_lon, d_lon) - 0.01
         max_lon = max(o_lon, d_lon) + 0.01
 
-        for zone in zones:
-            z_lat, z_lon = zone["lat"], zone["lon"]
+        # Only zones inside the bounding box are candidates
+        candidates = risk_zone_service.zone_grid(zones).query(min_lat, min_lon, max_lat, max_lon)
 
-            # Check if zone is within bounding box
-            if not (min_lat <= z_lat <= max_lat and min_lon <= z_lon <= max_lon):
-                continue
+        for zone in candidates:
+            z_lat, z_lon = zone["lat"], zone["lon"]
 
             # Check if zone is roughly on the path
             # Using simplified perpendicular distance
@@ -927,122 +1272,137 @@ class RoutingEngine:
 
     def _simple_distance(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
         """Simple Euclidean distance for comparison (not actual meters)."""
-        return math.sqrt((lat2 - lat1)**2 + (lon2 - lon1)**2)
+        return math.hypot(lat2 - lat1, lon2 - lon1)
+
+    def _simple_distance_sq(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+        """Squared Euclidean distance, for comparisons where only ordering matters."""
+        dlat = lat2 - lat1
+        dlon = lon2 - lon1
+        return dlat * dlat + dlon * dlon
 
     def _generate_avoidance_waypoints(
         self, origin: Tuple[float, float], dest: Tuple[float, float],
-        cluster_lat: float, cluster_lon: float, all_zones: List[Dict]
+        cluster_lat: float, cluster_lon: float,
+        perp_lat: float, perp_lon: float,
+        zone_lats: np.ndarray, zone_lons: np.ndarray,
     ) -> List[Tuple[float, float]]:
-        """Generate waypoints that route around the risk zone cluster."""
+        """Generate waypoints that route around the risk zone cluster.
+
+        perp_lat/perp_lon is the unit vector perpendicular to the
+        origin->destination direction, already normalized by the caller.
+        """
 
         o_lat, o_lon = origin
         d_lat, d_lon = dest
+        mid_lat = (o_lat + d_lat) / 2
+        mid_lon = (o_lon + d_lon) / 2
 
-        # Direction from origin to destination
-        dir_lat = d_lat - o_lat
-        dir_lon = d_lon - o_lon
+        # Candidate centers/offsets, in output order:
+        # - 4 offsets around the cluster center (both sides, best first)
+        # - 2 offsets around the origin/destination midpoint (best side only)
+        # - 2 extreme offsets around the cluster for routes deep in risk zones
+        center_lats = np.array([cluster_lat] * 4 + [mid_lat] * 2 + [cluster_lat] * 2)
+        center_lons = np.array([cluster_lon] * 4 + [mid_lon] * 2 + [cluster_lon] * 2)
+        offsets = np.array([0.01, 0.02, 0.03, 0.04, 0.015, 0.03, 0.05, 0.06])
 
-        # Perpendicular directions (to go around the cluster)
-        perp1_lat, perp1_lon = -dir_lon, dir_lat  # Rotate 90 degrees
-        perp2_lat, perp2_lon = dir_lon, -dir_lat  # Rotate -90 degrees
+        best, other = self._offset_waypoints(
+            center_lats, center_lons, offsets, perp_lat, perp_lon, zone_lats, zone_lons
+        )
+        # Interleave best/other for the cluster offsets, then best-only
+        paired = np.column_stack([best[:4], other[:4]]).reshape(-1, 2)
+        waypoints = [tuple(wp) for wp in np.concatenate([paired, best[4:]]).tolist()]
 
-        # Normalize
-        mag = math.sqrt(perp1_lat**2 + perp1_lon**2)
-        if mag > 0:
-            perp1_lat /= mag
-            perp1_lon /= mag
-            perp2_lat /= mag
-            perp2_lon /= mag
-
-        waypoints = []
-
-        # Generate waypoints at different distances from the cluster center
-        for offset in [0.01, 0.02, 0.03, 0.04]:
-            wp1 = (cluster_lat + perp1_lat * offset, cluster_lon + perp1_lon * offset)
-            wp2 = (cluster_lat + perp2_lat * offset, cluster_lon + perp2_lon * offset)
-
-            # Score each waypoint by minimum distance to any risk zone
-            wp1_score = self._score_waypoint(wp1, all_zones)
-            wp2_score = self._score_waypoint(wp2, all_zones)
-
-            # Add both waypoints, best one first
-            if wp1_score > wp2_score:
-                waypoints.append(wp1)
-                waypoints.append(wp2)
-            else:
-                waypoints.append(wp2)
-                waypoints.append(wp1)
+        return waypoints[:12]  # More waypoint options
 
-        # Also add waypoints at the midpoint offset perpendicular
-        mid_lat = (o_lat + d_lat) / 2
-        mid_lon = (o_lon + d_lon) / 2
-        for offset in [0.015, 0.03]:
-            wp1 = (mid_lat + perp1_lat * offset, mid_lon + perp1_lon * offset)
-            wp2 = (mid_lat + perp2_lat * offset, mid_lon + perp2_lon * offset)
-            wp1_score = self._score_waypoint(wp1, all_zones)
-            wp2_score = self._score_waypoint(wp2, all_zones)
-            if wp1_score > wp2_score:
-                waypoints.append(wp1)
-            else:
-                waypoints.append(wp2)
+    def _offset_waypoints(
+        self, center_lats: np.ndarray, center_lons: np.ndarray, offsets: np.ndarray,
+        perp_lat: float, perp_lon: float,
+        zone_lats: np.ndarray, zone_lons: np.ndarray,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Offset each center to both sides along the perpendicular and rank the sides.
 
-        # Add extreme avoidance waypoints for routes deep in risk zones
-        for offset in [0.05, 0.06]:
-            wp1 = (cluster_lat + perp1_lat * offset, cluster_lon + perp1_lon * offset)
-            wp2 = (cluster_lat + perp2_lat * offset, cluster_lon + perp2_lon * offset)
-            wp1_score = self._score_waypoint(wp1, all_zones)
-            wp2_score = self._score_waypoint(wp2, all_zones)
-            waypoints.append(wp1 if wp1_score > wp2_score else wp2)
+        Both sides of every candidate are built and scored in one vectorized
+        pass.
 
-        return waypoints[:12]  # More waypoint options
+        Returns:
+            (best, other): (N, 2) arrays of [lat, lon], where best[i] is the side
+            of center i farther from risk zones
+        """
+        wp1 = np.column_stack([center_lats + perp_lat * offsets, center_lons + perp_lon * offsets])
+        wp2 = np.column_stack([center_lats - perp_lat * offsets, center_lons - perp_lon * offsets])
+        if zone_lats.size == 1:
+            wp1_better = self._pick_side(
+                perp_lat, perp_lon, zone_lats[0], zone_lons[0], center_lats, center_lons
+            )
+        else:
+            scores = self._score_waypoints(
+                np.concatenate([wp1[:, 0], wp2[:, 0]]), np.concatenate([wp1[:, 1], wp2[:, 1]]),
+                zone_lats, zone_lons,
+            )
+            n = len(offsets)
+            wp1_better = scores[:n] > scores[n:]
+        wp1_better = wp1_better[:, None]
+        return np.where(wp1_better, wp1, wp2), np.where(wp1_better, wp2, wp1)
+
+    def _pick_side(
+        self, perp_lat: float, perp_lon: float, z_lat: float, z_lon: float,
+        center_lats: np.ndarray, center_lons: np.ndarray,
+    ) -> np.ndarray:
+        """Whether the +perp side of each center is farther from a single zone.
+
+        The two sides are mirror images around the center, so the +perp side
+        is farther exactly when the perpendicular points away from the zone.
+        """
+        return (center_lats - z_lat) * perp_lat + (center_lons - z_lon) * perp_lon > 0
 
-    def _score_waypoint(self, waypoint: Tuple[float, float], zones: List[Dict]) -> float:
+    def _zone_arrays(self, zones: List[Dict]) -> Tuple[np.ndarray, np.ndarray]:
+        """Split zone centers into (lats, lons) arrays for vectorized distance checks."""
+        zone_lats = np.fromiter((z["lat"] for z in zones), dtype=np.float64, count=len(zones))
+        zone_lons = np.fromiter((z["lon"] for z in zones), dtype=np.float64, count=len(zones))
+        return zone_lats, zone_lons
+
+    def _score_waypoint(
+        self, waypoint: Tuple[float, float], zone_lats: np.ndarray, zone_lons: np.ndarray
+    ) -> float:
         """Score a waypoint - higher is better (farther from risk zones)."""
-        if not zones:
+        if zone_lats.size == 0:
             return 1.0
 
-        min_dist = min(
-            self._simple_distance(waypoint[0], waypoint[1], z["lat"], z["lon"])
-            for z in zones
-        )
-        return min_dist
+        # Squared distance: only used for ordering waypoints, so skip the sqrt
+        d_lat = zone_lats - waypoint[0]
+        d_lon = zone_lons - waypoint[1]
+        return float(np.min(d_lat * d_lat + d_lon * d_lon))
+
+    def _score_waypoints(
+        self, wp_lats: np.ndarray, wp_lons: np.ndarray,
+        zone_lats: np.ndarray, zone_lons: np.ndarray,
+    ) -> np.ndarray:
+        """Score many waypoints at once; same metric as _score_waypoint."""
+        if zone_lats.size == 0:
+            return np.ones(len(wp_lats))
+
+        # (N waypoints, M zones) squared distances, reduced to the nearest zone
+        d_lat = wp_lats[:, None] - zone_lats[None, :]
+        d_lon = wp_lons[:, None] - zone_lons[None, :]
+        return (d_lat * d_lat + d_lon * d_lon).min(axis=1)
 
     def _build_waypoint_request(
         self, request: RouteRequest, waypoint: Tuple[float, float],
         exclude_polygons: Optional[List] = None,
+        include_elevation: bool = False,
     ) -> dict:
-        """Build Valhalla request with an intermediate waypoint."""
-        result = {
-            "locations": [
-                {
-                    "lat": request.origin.latitude,
-                    "lon": request.origin.longitude,
-                    "type": "break",
-                },
-                {
-                    "lat": waypoint[0],
-                    "lon": waypoint[1],
-                    "type": "through",  # Pass through, don't stop
-                },
-                {
-                    "lat": request.destination.latitude,
-                    "lon": request.destination.longitude,
-                    "type": "break",
-                },
-            ],
-            "costing": "bicycle",
-            "costing_options": {
-                "bicycle": {
-                    "bicycle_type": "Hybrid",
-                    "use_roads": 0.2,
-                    "use_hills": 0.3,
-                    "avoid_bad_surfaces": 0.7,
-                }
-            },
-            "directions_options": {"units": "meters", "language": "en-US"},
-            "elevation_interval": 30,
-            "format": "json",
-        }
+        """Build Valhalla request with an intermediate waypoint.
+
+        Elevation is left out by default since most waypoint probes are
+        rejected; _parse_valhalla_response fetches it for the route it keeps.
+        """
+        locations = [
+            {"lat": request.origin.latitude, "lon": request.origin.longitude, "type": "break"},
+            # Pass through, don't stop
+            {"lat": waypoint[0], "lon": waypoint[1], "type": "through"},
+            {"lat": request.destination.latitude, "lon": request.destination.longitude, "type": "break"},
+        ]
+        result = self._new_request(locations, dict(self._WAYPOINT_COSTING), include_elevation=include_elevation)
         if exclude_polygons:
             result["exclude_polygons"] = exclude_polygons
         return result
@@ -1060,39 +1420,39 @@ class RoutingEngine:
             "shortest": False,
         }
         valhalla_request = self._build_base_valhalla_request(request, options)
-        response = await self.client.post(
-            f"{self.valhalla_url}/route",
-            json=valhalla_request,
-        )
+        response = await self._post_json(f"{self.valhalla_url}/route", valhalla_request)
         response.raise_for_status()
-        return await self._parse_valhalla_response(response.json(), request)
+        return await self._parse_valhalla_response(orjson.loads(response.content), request)
 
     def _build_base_valhalla_request(
-        self, request: RouteRequest, costing_options: dict
+        self, request: RouteRequest, costing_options: dict,
+        include_elevation: bool = True,
     ) -> dict:
         """Build a basic Valhalla request with custom costing options."""
-        return {
-            "locations": [
-                {
-                    "lat": request.origin.latitude,
-                    "lon": request.origin.longitude,
-                    "type": "break",
-                },
-                {
-                    "lat": request.destination.latitude,
-                    "lon": request.destination.longitude,
-                    "type": "break",
-                },
-            ],
-            "costing": "bicycle",
-            "costing_options": {"bicycle": costing_options},
-            "directions_options": {
-                "units": "meters",
-                "language": "en-US",
-            },
-            "elevation_interval": 30,
-            "format": "json",
-        }
+        return self._new_request(
+            self._od_locations(request), costing_options, include_elevation=include_elevation
+        )
+
+    def _od_locations(self, request: RouteRequest) -> List[dict]:
+        """Origin and destination as Valhalla break locations."""
+        return [
+            {"lat": request.origin.latitude, "lon": request.origin.longitude, "type": "break"},
+            {"lat": request.destination.latitude, "lon": request.destination.longitude, "type": "break"},
+        ]
+
+    def _new_request(
+        self, locations: List[dict], costing_options: dict, costing: str = "bicycle",
+        include_elevation: bool = True,
+    ) -> dict:
+        """Clone the shared request template for a new set of locations."""
+        result = dict(self._REQUEST_TEMPLATE)
+        result["locations"] = locations
+        result["costing"] = costing
+        result["costing_options"] = {costing: costing_options}
+        result["directions_options"] = dict(self._DIRECTIONS_OPTIONS)
+        if not include_elevation:
+            del result["elevation_interval"]
+        return result
 
     async def calculate_alternatives(
         self,
@@ -1152,16 +1512,23 @@ class RoutingEngine:
         if not coordinates or len(coordinates) < 2:
             return 0.0, {}
 
-        # Sample coordinates to avoid overwhelming the API (max ~100 points)
+        # Simplify to at most 100 shape points to keep map matching cheap,
+        # keeping the corners that define the route rather than an even stride
         if len(coordinates) > 100:
-            step = len(coordinates) // 100
-            sampled_coords = coordinates[::step]
-            # Always include the last point
-            if sampled_coords[-1] != coordinates[-1]:
-                sampled_coords.append(coordinates[-1])
+            sampled_coords = self._rdp_simplify(
+                np.asarray(coordinates, dtype=np.float64), 100
+            ).tolist()
         else:
             sampled_coords = coordinates
 
+        # Identical routes (popular origin/destination pairs) sample to the
+        # same shape, so reuse a recent trace_attributes result
+        cache_key = np.asarray(sampled_coords, dtype=np.float64).tobytes()
+        cached = self._bike_lane_fallback_cache.get(cache_key)
+        if cached is not None and time.monotonic() - cached[0] < self._BIKE_LANE_FALLBACK_TTL:
+            self._bike_lane_fallback_cache.move_to_end(cache_key)
+            return cached[1], dict(cached[2])
+
         # Build shape for trace_attributes (lat, lon format for Valhalla)
         shape = [{"lat": coord[1], "lon": coord[0]} for coord in sampled_coords]
 
@@ -1182,12 +1549,9 @@ class RoutingEngine:
         }
 
         try:
-            response = await self.client.post(
-                f"{self.valhalla_url}/trace_attributes",
-                json=trace_request,
-            )
+            response = await self._post_json(f"{self.valhalla_url}/trace_attributes", trace_request)
             response.raise_for_status()
-            trace_data = response.json()
+            trace_data = orjson.loads(response.content)
         except (httpx.HTTPStatusError, httpx.RequestError) as e:
             logger.warning(f"Failed to get trace_attributes: {e}")
             return 0.0, {}
@@ -1197,42 +1561,33 @@ class RoutingEngine:
         if not edges:
             return 0.0, {}
 
-        total_distance = 0.0
-        bike_lane_distance = 0.0
-        protected_distance = 0.0
-        dedicated_distance = 0.0
-        shared_distance = 0.0
-        road_distance = 0.0
-
-        for edge in edges:
-            length_km = edge.get("length", 0)
-            length_m = length_km * 1000  # Convert to meters
-            total_distance += length_m
-
-            cycle_lane = edge.get("cycle_lane", "none")
-            use = edge.get("use", "road")
-
-            # Categorize by cycle lane type
-            # Valhalla cycle_lane values: "none", "shared", "dedicated", "separated"
-            if cycle_lane == "separated":
-                # Protected/separated bike lane - best infrastructure
-                bike_lane_distance += length_m
-                protected_distance += length_m
-            elif cycle_lane == "dedicated":
-                # Dedicated bike lane (painted, not physically separated)
-                bike_lane_distance += length_m
-                dedicated_distance += length_m
-            elif cycle_lane == "shared":
-                # Shared lane markings (sharrows)
-                bike_lane_distance += length_m
-                shared_distance += length_m
-            elif use in ["cycleway", "path", "footway", "pedestrian"]:
-                # Off-street paths, cycleways, etc. (count as bike infrastructure)
-                bike_lane_distance += length_m
-                protected_distance += length_m
-            else:
-                # Regular road without bike infrastructure
-                road_distance += length_m
+        lengths_m = np.fromiter(
+            (edge.get("length", 0) for edge in edges), dtype=np.float64, count=len(edges)
+        ) * 1000  # Convert km to meters
+        cycle_lanes = np.array([edge.get("cycle_lane", "none") for edge in edges])
+        uses = np.array([edge.get("use", "road") for edge in edges])
+
+        # Categorize by cycle lane type
+        # Valhalla cycle_lane values: "none", "shared", "dedicated", "separated"
+        # Separated bike lanes are protected (best infrastructure); dedicated
+        # lanes are painted but not separated; shared lanes are sharrows
+        separated_mask = cycle_lanes == "separated"
+        dedicated_mask = cycle_lanes == "dedicated"
+        shared_mask = cycle_lanes == "shared"
+        # Off-street paths, cycleways, etc. without a cycle_lane tag also count
+        # as protected bike infrastructure
+        off_street_mask = (
+            ~(separated_mask | dedicated_mask | shared_mask)
+            & np.isin(uses, ("cycleway", "path", "footway", "pedestrian"))
+        )
+
+        total_distance = float(lengths_m.sum())
+        protected_distance = float(lengths_m[separated_mask | off_street_mask].sum())
+        dedicated_distance = float(lengths_m[dedicated_mask].sum())
+        shared_distance = float(lengths_m[shared_mask].sum())
+        bike_lane_distance = protected_distance + dedicated_distance + shared_distance
+        # Regular road without bike infrastructure
+        road_distance = total_distance - bike_lane_distance
 
         if total_distance == 0:
             return 0.0, {}
@@ -1254,9 +1609,64 @@ class RoutingEngine:
             f"{shared_distance:.0f}m shared, {road_distance:.0f}m road)"
         )
 
-        return bike_lane_percentage, edge_stats
+        self._bike_lane_fallback_cache[cache_key] = (time.monotonic(), bike_lane_percentage, edge_stats)
+        self._bike_lane_fallback_cache.move_to_end(cache_key)
+        while len(self._bike_lane_fallback_cache) > self._BIKE_LANE_FALLBACK_CACHE_SIZE:
+            self._bike_lane_fallback_cache.popitem(last=False)
+
+        return bike_lane_percentage, dict(edge_stats)
+
+    def _rdp_simplify(self, coords: np.ndarray, max_points: int) -> np.ndarray:
+        """Simplify a linestring to at most max_points using Ramer-Douglas-Peucker.
+
+        Instead of a distance tolerance, segments are split greedily at the
+        vertex farthest from their chord until max_points vertices are kept,
+        so the most significant turns are always preserved. Endpoints are kept.
+
+        Args:
+            coords: (N, 2) array of [lon, lat] coordinates
+            max_points: Maximum number of vertices to keep
 
-    async def _build_valhalla_request(self, request: RouteRequest) -> dict:
+        Returns:
+            (M, 2) array with M <= max_points, in original order
+        """
+        n = len(coords)
+        if n <= max_points:
+            return coords
+
+        keep = np.zeros(n, dtype=bool)
+        keep[0] = keep[-1] = True
+        # Max-heap (via negated distance) of (dist, start, split_idx, end)
+        heap: List[Tuple[float, int, int, int]] = []
+
+        def push_segment(start: int, end: int) -> None:
+            if end - start < 2:
+                return
+            chord = coords[end] - coords[start]
+            offsets = coords[start + 1:end] - coords[start]
+            chord_len = math.hypot(chord[0], chord[1])
+            if chord_len > 0:
+                # Perpendicular distance via the 2D cross product
+                dists = np.abs(chord[0] * offsets[:, 1] - chord[1] * offsets[:, 0]) / chord_len
+            else:
+                dists = np.hypot(offsets[:, 0], offsets[:, 1])
+            i = int(np.argmax(dists))
+            heapq.heappush(heap, (-float(dists[i]), start, start + 1 + i, end))
+
+        push_segment(0, n - 1)
+        kept = 2
+        while heap and kept < max_points:
+            _, start, split, end = heapq.heappop(heap)
+            keep[split] = True
+            kept += 1
+            push_segment(start, split)
+            push_segment(split, end)
+
+        return coords[keep]
+
+    async def _build_valhalla_request(
+        self, request: RouteRequest, include_elevation: bool = True
+    ) -> dict:
         """Build Valhalla API request from our request model."""
 
         # Map vehicle type to Valhalla costing
@@ -1272,30 +1682,10 @@ class RoutingEngine:
             request.preferences, request.vehicle_type
         )
 
-        valhalla_request = {
-            "locations": [
-                {
-                    "lat": request.origin.latitude,
-                    "lon": request.origin.longitude,
-                    "type": "break",
-                },
-                {
-                    "lat": request.destination.latitude,
-                    "lon": request.destination.longitude,
-                    "type": "break",
-                },
-            ],
-            "costing": costing,
-            "costing_options": {costing: costing_options},
-            "directions_options": {
-                "units": "meters",
-                "language": "en-US",
-            },
-            "elevation_interval": 30,  # Request elevation data every 30 meters
-            "format": "json",
-        }
-
-        return valhalla_request
+        return self._new_request(
+            self._od_locations(request), costing_options, costing,
+            include_elevation=include_elevation,
+        )
 
     def _build_costing_options(
         self, preferences: RoutePreferences, vehicle_type: VehicleType
@@ -1310,57 +1700,20 @@ class RoutingEngine:
         The "Bike Lane Only" toggle (prefer_bike_lanes) is the ONLY way to force bike lanes.
         """
 
-        options = {
-            "bicycle_type": "Road" if vehicle_type == VehicleType.BIKE else "Hybrid",
-            "use_roads": 0.5,  # Balance between roads and bike paths
-            "use_hills": 0.5 if not preferences.avoid_hills else 0.1,
-            "avoid_bad_surfaces": 0.5,
-        }
-
-        # Adjust based on profile
-        if preferences.profile == RouteProfile.SAFEST:
-            # Safest: Normal routing - risk zone avoidance is handled separately
-            # Does NOT force bike lanes (user must toggle "Bike Lane Only" for that)
-            options["use_roads"] = 0.5  # Allow normal roads
-            options["use_hills"] = 0.3  # Prefer gentler hills
-            options["avoid_bad_surfaces"] = 0.6  # Prefer good surfaces
-            options["shortest"] = False
-        elif preferences.profile == RouteProfile.FASTEST:
-            # Fastest: Pure time optimization, use roads freely
-            # NOTE: Valhalla's "shortest" means shortest DISTANCE, not time
-            # To get fastest time, we remove shortest and let Valhalla optimize for time
-            options["use_roads"] = 1.0  # Use roads freely for fastest route
-            options["use_hills"] = 1.0  # Accept any hills (going downhill is faster)
-            options["avoid_bad_surfaces"] = 0.0  # Don't avoid surfaces
-            # Don't set "shortest" - Valhalla optimizes for time by default
-        elif preferences.profile == RouteProfile.BALANCED:
-            # Balanced: Mix roads and bike lanes intelligently
-            options["use_roads"] = 0.5  # Balance road and bike lane usage
-            options["use_hills"] = 0.5 if not preferences.avoid_hills else 0.2
-            options["avoid_bad_surfaces"] = 0.5
-            options["shortest"] = False
-        elif preferences.profile == RouteProfile.SCENIC:
-            options["use_roads"] = 0.3
-            options["use_hills"] = 0.4
-            options["avoid_bad_surfaces"] = 0.6
-
-        # Handle "Bike Lane Only" toggle - when enabled, ONLY use bike lanes
-        # This is the ONLY way to force bike-lane-only routing
-        if preferences.prefer_bike_lanes:
-            # Force bike lanes only - set use_roads to minimum
-            options["use_roads"] = 0.0  # Force bike lanes/cycleways only
-            options["avoid_bad_surfaces"] = 0.8
-
-        # Override with avoid_hills if explicitly set
-        if preferences.avoid_hills:
-            options["use_hills"] = 0.1
-
-        return options
+        return dict(_costing_options_cached(
+            preferences.profile, vehicle_type,
+            preferences.avoid_hills, preferences.prefer_bike_lanes,
+        ))
 
     async def _parse_valhalla_response(
-        self, response: dict, request: RouteRequest
+        self, response: dict, request: RouteRequest, fetch_elevation: bool = False
     ) -> RouteResponse:
-        """Parse Valhalla response into our format."""
+        """Parse Valhalla response into our format.
+
+        Set fetch_elevation for responses to requests built without
+        elevation_interval (waypoint probes), so leg elevation is fetched from
+        /height instead.
+        """
 
         trip = response.get("trip", {})
         legs = trip.get("legs", [])
@@ -1373,32 +1726,62 @@ class RoutingEngine:
 
         # Build geometry from legs and collect elevation data
         all_coordinates = []
-        all_elevations = []
+        # One float64 array per leg, joined into a single buffer after the loop
+        leg_elevations = []
         parsed_legs = []
         total_bike_lane_distance = 0
         total_distance = 0
+        # (start, end, travel_type, distance_m) spans of all_coordinates
+        valhalla_segments = []
+
+        # Looked up once per route instead of once per maneuver
+        maneuver_type_for = VALHALLA_MANEUVER_MAP.get
+        straight = ManeuverType.STRAIGHT
+        no_bike_lane = BikeLaneStatus.NONE
 
         for leg in legs:
             shape = leg.get("shape", "")
             leg_coords = self._decode_polyline(shape)
+            leg_offset = len(all_coordinates)
             all_coordinates.extend(leg_coords)
 
-            # Collect elevation data
-            elevations = leg.get("elevation", [])
-            all_elevations.extend(elevations)
+            # Collect elevation data (requested separately if the route
+            # request left it out)
             elevation_interval = leg.get("elevation_interval", 30)
+            elevations = leg.get("elevation")
+            if elevations is None and fetch_elevation and shape:
+                elevations = await self._fetch_elevations(shape, elevation_interval)
+            if elevations:
+                leg_elevations.append(np.asarray(elevations, dtype=np.float64))
 
             # Parse maneuvers and estimate bike lane usage
             maneuvers = []
             for m in leg.get("maneuvers", []):
-                maneuver = self._parse_maneuver(m)
-                maneuvers.append(maneuver)
+                segment_distance = m.get("length", 0) * 1000  # km to m
+                instruction = m.get("instruction", "")
+                # Note: We'd need the decoded shape to get exact coordinates
+                # (from begin_shape_index); for now, use a placeholder
+                maneuvers.append(Maneuver(
+                    type=maneuver_type_for(m.get("type", 0), straight),
+                    instruction=instruction,
+                    verbal_instruction=m.get("verbal_pre_transition_instruction", instruction),
+                    location=Coordinate(latitude=0, longitude=0),
+                    distance_meters=int(segment_distance),
+                    street_name=next(iter(m.get("street_names") or ()), None),
+                    bike_lane_status=no_bike_lane,
+                    alerts=[],
+                ))
 
                 # Estimate bike lane usage from travel_type
                 # Valhalla travel_type for bicycle: "road", "cycleway", "path", etc.
                 travel_type = m.get("travel_type", "")
-                segment_distance = m.get("length", 0) * 1000  # km to m
                 total_distance += segment_distance
+                valhalla_segments.append((
+                    leg_offset + m.get("begin_shape_index", 0),
+                    leg_offset + m.get("end_shape_index", 0),
+                    travel_type,
+                    segment_distance,
+                ))
 
                 # Count as bike lane if it's a cycleway, path, or bike-friendly
                 if travel_type in ["cycleway", "path", "footway", "pedestrian"]:
@@ -1418,6 +1801,7 @@ class RoutingEngine:
             )
 
         # Calculate elevation statistics
+        all_elevations = np.concatenate(leg_elevations) if leg_elevations else np.empty(0)
         elevation_gain, elevation_loss, max_grade = self._calculate_elevation_stats(
             all_elevations, elevation_interval if legs else 30
         )
@@ -1428,7 +1812,7 @@ class RoutingEngine:
 
         # Get accurate bike lane percentage by intersecting with SF bike lane data
         bike_lane_percentage, bike_stats = await bike_lane_service.calculate_bike_lane_percentage(
-            all_coordinates
+            all_coordinates, valhalla_segments=valhalla_segments
         )
 
         # If SF data unavailable, fall back to Valhalla trace_attributes
@@ -1489,16 +1873,18 @@ class RoutingEngine:
         )
 
         # Build risk analysis
-        high_severity_count = sum(
-            1 for zid in zones_passed
-            for z in risk_zones_data if z.get("id") == zid and z.get("severity") in ("HIGH", "CRITICAL")
-        ) if zones_passed else 0
+        high_severity_count = 0
+        if zones_passed:
+            severity_by_id = {z.get("id"): z.get("severity") for z in risk_zones_data}
+            high_severity_count = sum(
+                1 for zid in zones_passed if severity_by_id.get(zid) in _HIGH_SEVERITIES
+            )
 
         # Convert zone IDs to UUIDs (filter out any invalid ones)
         valid_zone_uuids = []
         for zid in zones_passed[:10]:
             try:
-                valid_zone_uuids.append(uuid.UUID(str(zid)))
+                valid_zone_uuids.append(_zone_uuid_cached(str(zid)))
             except (ValueError, TypeError):
                 continue
 
@@ -1515,91 +1901,60 @@ class RoutingEngine:
             warnings=[],
         )
 
+    async def _fetch_elevations(self, shape: str, interval: float = 30) -> List[float]:
+        """Fetch elevations along an encoded leg shape from Valhalla's /height.
+
+        Used for routes whose request skipped elevation_interval. A failed
+        request or malformed body yields no elevation rather than an error.
+        """
+        height_request = {
+            "encoded_polyline": shape,
+            "shape_format": "polyline6",
+            "resample_distance": interval,
+        }
+        try:
+            response = await self._post_json(f"{self.valhalla_url}/height", height_request)
+            response.raise_for_status()
+            return orjson.loads(response.content)["height"]
+        except (httpx.HTTPStatusError, httpx.RequestError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Failed to get route elevation: {e}")
+            return []
+
     def _calculate_elevation_stats(
-        self, elevations: List[float], interval: float
+        self, elevations: Union[np.ndarray, List[float]], interval: float
     ) -> Tuple[float, float, float]:
         """Calculate elevation gain, loss, and max grade from elevation data.
 
         Args:
-            elevations: List of elevation values in meters
+            elevations: Array or list of elevation values in meters
             interval: Distance between elevation points in meters
 
         Returns:
             Tuple of (elevation_gain, elevation_loss, max_grade_percent)
         """
-        if not elevations or len(elevations) < 2:
+        if len(elevations) < 2:
             return 0, 0, 0
 
-        elevation_gain = 0
-        elevation_loss = 0
-        max_grade = 0
+        diffs = np.diff(np.asarray(elevations, dtype=np.float64))
 
-        for i in range(1, len(elevations)):
-            diff = elevations[i] - elevations[i - 1]
+        elevation_gain = float(diffs[diffs > 0].sum())
+        elevation_loss = float(-diffs[diffs < 0].sum())
 
-            if diff > 0:
-                elevation_gain += diff
-            else:
-                elevation_loss += abs(diff)
-
-            # Calculate grade as percentage (rise/run * 100)
-            if interval > 0:
-                grade = abs(diff) / interval * 100
-                max_grade = max(max_grade, grade)
+        # Calculate grade as percentage (rise/run * 100)
+        max_grade = float(np.abs(diffs).max()) / interval * 100 if interval > 0 else 0
 
         return elevation_gain, elevation_loss, max_grade
 
-    def _parse_maneuver(self, m: dict) -> Maneuver:
-        """Parse a Valhalla maneuver into our format."""
-
-        maneuver_type = VALHALLA_MANEUVER_MAP.get(
-            m.get("type", 0), ManeuverType.STRAIGHT
-        )
-
-        begin_shape_index = m.get("begin_shape_index", 0)
-        # Note: We'd need the decoded shape to get exact coordinates
-        # For now, use a placeholder
-
-        return Maneuver(
-            type=maneuver_type,
-            instruction=m.get("instruction", ""),
-            verbal_instruction=m.get("verbal_pre_transition_instruction", m.get("instruction", "")),
-            location=Coordinate(latitude=0, longitude=0),  # Would extract from shape
-            distance_meters=int(m.get("length", 0) * 1000),
-            street_name=m.get("street_names", [None])[0] if m.get("street_names") else None,
-            bike_lane_status=BikeLaneStatus.NONE,
-            alerts=[],
-        )
-
     def _generate_mock_route(self, request: RouteRequest) -> RouteResponse:
         """Generate a mock route for development testing when Valhalla is unavailable."""
 
         origin = request.origin
         dest = request.destination
 
-        # Calculate straight-line distance (Haversine formula)
-        R = 6371000  # Earth radius in meters
-        lat1, lon1 = math.radians(origin.latitude), math.radians(origin.longitude)
-        lat2, lon2 = math.radians(dest.latitude), math.radians(dest.longitude)
-
-        dlat = lat2 - lat1
-        dlon = lon2 - lon1
-
-        a = math.sin(dlat/2)**2 + math.cos(lat1) * math.cos(lat2) * math.sin(dlon/2)**2
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        distance = R * c
-
-        # Estimate duration (assuming ~15 km/h average for micromobility)
-        duration = int(distance / (15 * 1000 / 3600))  # seconds
-
-        # Generate intermediate points for a more realistic route line
-        num_points = max(10, int(distance / 100))  # One point every ~100m
-        coordinates = []
-        for i in range(num_points + 1):
-            t = i / num_points
-            lat = origin.latitude + t * (dest.latitude - origin.latitude)
-            lon = origin.longitude + t * (dest.longitude - origin.longitude)
-            coordinates.append([lon, lat])
+        distance, duration, coordinates = _mock_route_core(
+            origin.latitude, origin.longitude, dest.latitude, dest.longitude
+        )
+        coordinates = coordinates.tolist()
 
         # Create mock maneuvers
         maneuvers = [
@@ -1655,47 +2010,34 @@ class RoutingEngine:
             warnings=[],
         )
 
+    def _decode_shape_array(self, response: dict) -> np.ndarray:
+        """Decode just the route geometry (all legs) into an (N, 2) [lon, lat] array.
+
+        A cheap alternative to _parse_valhalla_response for validating candidate
+        routes that will likely be discarded.
+        """
+        legs = response.get("trip", {}).get("legs", [])
+        if not legs:
+            return np.empty((0, 2))
+        return np.concatenate([self._decode_polyline_array(leg.get("shape", "")) for leg in legs])
+
     def _decode_polyline(self, encoded: str, precision: int = 6) -> List[List[float]]:
         """Decode a polyline string into a list of coordinates.
 
         Valhalla uses precision 6 by default.
         """
-        coordinates = []
-        index = 0
-        lat = 0
-        lng = 0
-
-        while index < len(encoded):
-            # Decode latitude
-            shift = 0
-            result = 0
-            while True:
-                b = ord(encoded[index]) - 63
-                index += 1
-                result |= (b & 0x1F) << shift
-                shift += 5
-                if b < 0x20:
-                    break
-            dlat = ~(result >> 1) if result & 1 else result >> 1
-            lat += dlat
-
-            # Decode longitude
-            shift = 0
-            result = 0
-            while True:
-                b = ord(encoded[index]) - 63
-                index += 1
-                result |= (b & 0x1F) << shift
-                shift += 5
-                if b < 0x20:
-                    break
-            dlng = ~(result >> 1) if result & 1 else result >> 1
-            lng += dlng
+        return self._decode_polyline_array(encoded, precision).tolist()
 
-            # Add coordinate [lon, lat] for GeoJSON
-            coordinates.append([lng / (10**precision), lat / (10**precision)])
+    def _decode_polyline_array(self, encoded: str, precision: int = 6) -> np.ndarray:
+        """Decode a polyline string into an (N, 2) float64 array of [lon, lat].
 
-        return coordinates
+        Uses the numba-compiled decoder when available, otherwise falls back
+        to the vectorized numpy decoder.
+        """
+        buf = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8)
+        if _decode_polyline_nb is None:
+            return _decode_polyline_np(buf, float(10**precision))
+        return _decode_polyline_nb(buf, float(10**precision))
 
     async def close(self):
         """Close the HTTP client."""
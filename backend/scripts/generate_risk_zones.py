@@ -1,17 +1,27 @@
 """Generate risk zones from SF collision data - Neighborhood bubbles."""
 
 import asyncio
-import json
 import math
 from collections import defaultdict
+from heapq import nlargest
+from operator import itemgetter
 from typing import Dict, List, Tuple
 from uuid import uuid4
 
 import httpx
+import numpy as np
+import orjson
 
 # SF Collision Data API
 SF_COLLISIONS_API = "https://data.sfgov.org/resource/ubvf-ztfx.json"
 
+# Collision fields used for risk zones
+COLLISION_FIELDS = "tb_latitude,tb_longitude,collision_severity,analysis_neighborhood"
+
+# Page size and number of pages fetched concurrently
+PAGE_LIMIT = 10000
+MAX_CONCURRENT_PAGES = 8
+
 # Grid size for finding hotspots within neighborhoods (approximately 200m x 200m)
 GRID_SIZE = 0.002
 
@@ -20,15 +30,18 @@ THRESHOLD_MIN = 160
 THRESHOLD_YELLOW_MAX = 199
 # 200+ is red
 
+# Bubble radius grows linearly with crash count between these bounds
+RADIUS_MIN_METERS = 100
+RADIUS_MAX_METERS = 500
+RADIUS_MAX_COUNT = 300
+
 # Max circles per neighborhood
 MAX_CIRCLES_PER_NEIGHBORHOOD = 5
 
-
-def get_grid_cell(lat: float, lon: float) -> Tuple[int, int]:
-    """Get grid cell indices for a coordinate."""
-    lat_idx = int(lat / GRID_SIZE)
-    lon_idx = int(lon / GRID_SIZE)
-    return (lat_idx, lon_idx)
+# Collision severity codes
+SEVERITY_OTHER = 0
+SEVERITY_INJURY = 1
+SEVERITY_FATAL = 2
 
 
 def get_cell_center(lat_idx: int, lon_idx: int) -> Tuple[float, float]:
@@ -38,131 +51,225 @@ def get_cell_center(lat_idx: int, lon_idx: int) -> Tuple[float, float]:
     return (lat, lon)
 
 
-def get_severity(count: int) -> str:
-    """Get severity level based on accident count."""
-    if count <= THRESHOLD_YELLOW_MAX:
-        return "MEDIUM"  # Yellow: 160-199
-    else:
-        return "HIGH"    # Red: 200+
+def get_severities(counts: np.ndarray) -> np.ndarray:
+    """Get severity levels for an array of accident counts."""
+    return np.where(counts <= THRESHOLD_YELLOW_MAX, "MEDIUM", "HIGH")
 
 
-def get_radius_meters(count: int) -> int:
-    """Calculate bubble radius based on crash count.
+def get_radii_meters(counts: np.ndarray) -> np.ndarray:
+    """Calculate bubble radii for an array of crash counts.
 
-    Minimum: 100m for 65 crashes
-    Maximum: 500m for 300+ crashes
+    Interpolates linearly from RADIUS_MIN_METERS at THRESHOLD_MIN crashes
+    to RADIUS_MAX_METERS at RADIUS_MAX_COUNT crashes and above.
     """
-    min_radius = 100
-    max_radius = 500
-    min_count = THRESHOLD_MIN
-    max_count = 300
-
-    # Linear interpolation
-    normalized = min(1.0, max(0.0, (count - min_count) / (max_count - min_count)))
-    radius = min_radius + normalized * (max_radius - min_radius)
-    return int(radius)
-
-
-async def fetch_collisions() -> List[Dict]:
-    """Fetch all collision data from SF Open Data."""
-    all_collisions = []
-    offset = 0
-    limit = 10000
-
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        while True:
-            url = (
-                f"{SF_COLLISIONS_API}?$limit={limit}&$offset={offset}"
-                f"&$select=tb_latitude,tb_longitude,collision_severity,analysis_neighborhood"
-            )
-            print(f"Fetching collisions offset={offset}...")
-
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()
-
-            if not data:
-                break
-
-            all_collisions.extend(data)
-            offset += limit
-
-            if len(data) < limit:
-                break
-
-    print(f"Total collisions fetched: {len(all_collisions)}")
-    return all_collisions
-
-
-def aggregate_by_neighborhood_and_grid(collisions: List[Dict]) -> Dict[str, Dict[Tuple[int, int], Dict]]:
-    """Aggregate collisions by neighborhood and grid cell."""
-    neighborhood_grids = defaultdict(lambda: defaultdict(lambda: {
-        "count": 0, "fatal": 0, "injury": 0, "lats": [], "lons": []
-    }))
-
-    for collision in collisions:
-        try:
-            lat = float(collision.get("tb_latitude", 0))
-            lon = float(collision.get("tb_longitude", 0))
-            neighborhood = collision.get("analysis_neighborhood", "Unknown")
-
-            if not neighborhood or lat == 0 or lon == 0:
-                continue
-
-            cell = get_grid_cell(lat, lon)
-            grid = neighborhood_grids[neighborhood][cell]
-            grid["count"] += 1
-            grid["lats"].append(lat)
-            grid["lons"].append(lon)
-
-            severity = collision.get("collision_severity", "")
-            if severity == "Fatal":
-                grid["fatal"] += 1
-            elif "Injury" in severity:
-                grid["injury"] += 1
-
-        except (ValueError, TypeError):
-            continue
+    normalized = np.clip((counts - THRESHOLD_MIN) / (RADIUS_MAX_COUNT - THRESHOLD_MIN), 0.0, 1.0)
+    return (RADIUS_MIN_METERS + normalized * (RADIUS_MAX_METERS - RADIUS_MIN_METERS)).astype(np.int32)
 
-    return neighborhood_grids
 
+def parse_coordinate(value) -> float:
+    """Parse a coordinate field, treating missing or malformed values as 0."""
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        return 0.0
 
-def generate_risk_zones(neighborhood_grids: Dict[str, Dict[Tuple[int, int], Dict]]) -> List[Dict]:
-    """Generate risk zone records - max 5 bubbles per neighborhood."""
-    risk_zones = []
 
-    for neighborhood, grid_cells in neighborhood_grids.items():
-        # Filter cells with minimum threshold
-        high_risk_cells = [
-            (cell, data) for cell, data in grid_cells.items()
-            if data["count"] >= THRESHOLD_MIN
-        ]
+def get_severity_code(severity: str) -> int:
+    """Map a collision_severity label to a severity code."""
+    if severity == "Fatal":
+        return SEVERITY_FATAL
+    if "Injury" in severity:
+        return SEVERITY_INJURY
+    return SEVERITY_OTHER
 
-        if not high_risk_cells:
-            continue
 
-        # Sort by count descending and take top 5
-        high_risk_cells.sort(key=lambda x: x[1]["count"], reverse=True)
-        top_cells = high_risk_cells[:MAX_CIRCLES_PER_NEIGHBORHOOD]
+def encode_severities(severities: List[str]) -> np.ndarray:
+    """Encode collision_severity labels as int8 severity codes.
+
+    Only the handful of distinct labels are classified; rows pick up their
+    code by index.
+    """
+    labels, inverse = np.unique(np.array(severities, dtype=object), return_inverse=True)
+    codes = np.array([get_severity_code(label) for label in labels], dtype=np.int8)
+    return codes[inverse.ravel()]
+
 
-        for cell, data in top_cells:
-            count = data["count"]
+def project_collisions(rows: List[Dict]) -> Dict[str, np.ndarray]:
+    """Project a page of collision rows into columnar arrays.
 
-            # Calculate center from actual collision coordinates
-            center_lat = sum(data["lats"]) / len(data["lats"])
-            center_lon = sum(data["lons"]) / len(data["lons"])
+    Returns lat/lon as float64, neighborhood as an object array and severity
+    as int8 severity codes, with missing or malformed fields normalized the
+    same way for every row.
+    """
+    n = len(rows)
+    return {
+        "lat": np.fromiter((parse_coordinate(r.get("tb_latitude", 0)) for r in rows), dtype=np.float64, count=n),
+        "lon": np.fromiter((parse_coordinate(r.get("tb_longitude", 0)) for r in rows), dtype=np.float64, count=n),
+        "neighborhood": np.array([r.get("analysis_neighborhood", "Unknown") or "" for r in rows], dtype=object),
+        "severity": encode_severities([r.get("collision_severity", "") or "" for r in rows]),
+    }
 
-            severity = get_severity(count)
-            radius = get_radius_meters(count)
 
-            # Determine hazard type
-            if data["fatal"] > 0:
-                hazard_type = "HIGH_TRAFFIC"
-            elif data["injury"] > 10:
-                hazard_type = "DANGEROUS_INTERSECTION"
-            else:
-                hazard_type = "HIGH_TRAFFIC"
+async def fetch_collision_count(client: httpx.AsyncClient) -> int:
+    """Get the total number of collision records."""
+    response = await client.get(f"{SF_COLLISIONS_API}?$select=count(*)")
+    response.raise_for_status()
+    return int(orjson.loads(response.content)[0]["count"])
+
+
+async def fetch_collision_page(
+    client: httpx.AsyncClient, offset: int, semaphore: asyncio.Semaphore
+) -> Dict[str, np.ndarray]:
+    """Fetch one page of collisions and project it to columnar arrays."""
+    url = (
+        f"{SF_COLLISIONS_API}?$limit={PAGE_LIMIT}&$offset={offset}"
+        f"&$select={COLLISION_FIELDS}&$order=:id"
+    )
+    async with semaphore:
+        print(f"Fetching collisions offset={offset}...")
+        response = await client.get(url)
+        response.raise_for_status()
+        return project_collisions(orjson.loads(response.content))
+
+
+async def fetch_collisions() -> Dict[str, np.ndarray]:
+    """Fetch all collision data from SF Open Data as columnar arrays.
+
+    The record count is fetched first so every page can be requested up
+    front, with at most MAX_CONCURRENT_PAGES in flight. Pages are ordered by
+    :id so offsets stay stable across the concurrent requests. Each page is
+    projected to arrays as soon as it arrives, so the raw JSON rows are never
+    held for the whole dataset. The pages share one HTTP/2 connection pool.
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+
+    async with httpx.AsyncClient(
+        timeout=60.0,
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=MAX_CONCURRENT_PAGES,
+            max_keepalive_connections=MAX_CONCURRENT_PAGES,
+        ),
+    ) as client:
+        total = await fetch_collision_count(client)
+        pages = await asyncio.gather(*(
+            fetch_collision_page(client, offset, semaphore)
+            for offset in range(0, total, PAGE_LIMIT)
+        ))
+
+    print(f"Total collisions fetched: {sum(len(page['lat']) for page in pages)}")
+    if not pages:
+        return project_collisions([])
+    return {key: np.concatenate([page[key] for page in pages]) for key in pages[0]}
+
+
+def aggregate_by_neighborhood_and_grid(collisions: Dict[str, np.ndarray]) -> Dict[str, Dict[str, np.ndarray]]:
+    """Aggregate collisions by neighborhood and grid cell.
+
+    Takes the columnar arrays from fetch_collisions, groups rows by
+    (neighborhood, cell) and sums them with np.bincount. Each neighborhood
+    maps to parallel per-cell arrays: lat_idx/lon_idx, collision count, fatal
+    and injury counts, and the mean collision coordinate as center_lat/lon.
+    Neighborhoods and their cells are in first-seen order.
+    """
+    lats, lons = collisions["lat"], collisions["lon"]
+    neighborhoods = collisions["neighborhood"]
+    severities = collisions["severity"]
+
+    valid = (neighborhoods != "") & (lats != 0) & (lons != 0) & np.isfinite(lats) & np.isfinite(lons)
+    if not valid.any():
+        return {}
+    lats, lons = lats[valid], lons[valid]
+    neighborhoods, severities = neighborhoods[valid], severities[valid]
+
+    # Grid cell indices, truncated toward zero
+    lat_idx = (lats / GRID_SIZE).astype(np.int64)
+    lon_idx = (lons / GRID_SIZE).astype(np.int64)
+    is_fatal = severities == SEVERITY_FATAL
+    is_injury = severities == SEVERITY_INJURY
+
+    # One integer cell id per (neighborhood, lat_idx, lon_idx): cell indices
+    # are offset to start at 0 and packed row-major within each neighborhood
+    names, name_codes = np.unique(neighborhoods, return_inverse=True)
+    lat_min, lon_min = lat_idx.min(), lon_idx.min()
+    height = int(lat_idx.max() - lat_min) + 1
+    width = int(lon_idx.max() - lon_min) + 1
+    cell_ids = (name_codes * height + (lat_idx - lat_min)) * width + (lon_idx - lon_min)
+
+    # Compact the occupied ids to 0..G-1 so bincount stays small
+    cell_ids, first_seen, group = np.unique(cell_ids, return_index=True, return_inverse=True)
+    counts = np.bincount(group)
+    fatal = np.bincount(group, weights=is_fatal)
+    injury = np.bincount(group, weights=is_injury)
+    center_lats = np.bincount(group, weights=lats) / counts
+    center_lons = np.bincount(group, weights=lons) / counts
+
+    # Cells in first-seen order, so ties sort as they did row by row
+    order = np.argsort(first_seen, kind="stable")
+    cell_name_codes, cells = np.divmod(cell_ids[order], height * width)
+    lat_offsets, lon_offsets = np.divmod(cells, width)
+
+    # Split the ordered cells into one run per neighborhood
+    by_name = np.argsort(cell_name_codes, kind="stable")
+    run_codes, run_starts = np.unique(cell_name_codes[by_name], return_index=True)
+    runs = np.split(by_name, run_starts[1:])
+
+    columns = {
+        "lat_idx": lat_min + lat_offsets,
+        "lon_idx": lon_min + lon_offsets,
+        "count": counts[order],
+        "fatal": fatal[order].astype(np.int64),
+        "injury": injury[order].astype(np.int64),
+        "center_lat": center_lats[order],
+        "center_lon": center_lons[order],
+    }
+
+    neighborhood_grids: Dict[str, Dict[str, np.ndarray]] = {}
+    for r in sorted(range(len(runs)), key=lambda r: runs[r][0]):
+        neighborhood_grids[names[run_codes[r]]] = {
+            key: column[runs[r]] for key, column in columns.items()
+        }
+
+    return neighborhood_grids
+
+
+def generate_risk_zones(neighborhood_grids: Dict[str, Dict[str, np.ndarray]]) -> List[Dict]:
+    """Generate risk zone records - max 5 bubbles per neighborhood."""
+    risk_zones = []
+
+    for neighborhood, cells in neighborhood_grids.items():
+        counts = cells["count"]
+
+        # Filter cells with minimum threshold
+        top = np.flatnonzero(counts >= THRESHOLD_MIN)
+        if top.size == 0:
+            continue
 
+        # Take the top 5 by count in O(C): partition for the 5th largest count,
+        # then keep every cell above it and the earliest cells tied with it
+        if top.size > MAX_CIRCLES_PER_NEIGHBORHOOD:
+            kth = np.partition(counts[top], -MAX_CIRCLES_PER_NEIGHBORHOOD)[-MAX_CIRCLES_PER_NEIGHBORHOOD]
+            above = top[counts[top] > kth]
+            tied = top[counts[top] == kth][:MAX_CIRCLES_PER_NEIGHBORHOOD - above.size]
+            top = np.sort(np.concatenate((above, tied)))
+        # Ties keep cell order, like a stable sort
+        top = top[np.argsort(-counts[top], kind="stable")]
+
+        top_counts = counts[top]
+        fatal = cells["fatal"][top]
+        injury = cells["injury"][top]
+        severities = get_severities(top_counts)
+        radii = get_radii_meters(top_counts)
+        # Injury-heavy cells without fatalities are treated as intersections
+        hazard_types = np.where(
+            (fatal == 0) & (injury > 10), "DANGEROUS_INTERSECTION", "HIGH_TRAFFIC"
+        )
+
+        for count, fatal_count, injury_count, center_lat, center_lon, severity, radius, hazard_type in zip(
+            top_counts.tolist(), fatal.tolist(), injury.tolist(),
+            cells["center_lat"][top].tolist(), cells["center_lon"][top].tolist(),
+            severities.tolist(), radii.tolist(), hazard_types.tolist(),
+        ):
             risk_zone = {
                 "id": str(uuid4()),
                 "geometry": {
@@ -173,12 +280,12 @@ def generate_risk_zones(neighborhood_grids: Dict[str, Dict[Tuple[int, int], Dict
                 "severity": severity,
                 "name": f"{neighborhood} ({count} crashes)",
                 "description": f"{count} traffic incidents in {neighborhood}. "
-                              f"Fatal: {data['fatal']}, Injuries: {data['injury']}",
+                              f"Fatal: {fatal_count}, Injuries: {injury_count}",
                 "accident_count": count,
                 "neighborhood": neighborhood,
                 "radius_meters": radius,
-                "fatal_count": data["fatal"],
-                "injury_count": data["injury"],
+                "fatal_count": fatal_count,
+                "injury_count": injury_count,
                 "center_lat": center_lat,
                 "center_lon": center_lon,
             }
@@ -186,7 +293,7 @@ def generate_risk_zones(neighborhood_grids: Dict[str, Dict[Tuple[int, int], Dict
             risk_zones.append(risk_zone)
 
     # Sort by count descending
-    risk_zones.sort(key=lambda x: x["accident_count"], reverse=True)
+    risk_zones.sort(key=itemgetter("accident_count"), reverse=True)
 
     # Print summary
     print(f"\nRisk zone summary:")
@@ -199,7 +306,7 @@ def generate_risk_zones(neighborhood_grids: Dict[str, Dict[Tuple[int, int], Dict
     neighborhood_counts = defaultdict(int)
     for zone in risk_zones:
         neighborhood_counts[zone["neighborhood"]] += 1
-    for n, c in sorted(neighborhood_counts.items(), key=lambda x: -x[1])[:10]:
+    for n, c in nlargest(10, neighborhood_counts.items(), key=itemgetter(1)):
         print(f"  {n}: {c} zones")
 
     return risk_zones
@@ -289,8 +396,8 @@ async def main():
 
     # Save GeoJSON for frontend
     geojson = generate_geojson(risk_zones)
-    with open("risk_zones.geojson", "w") as f:
-        json.dump(geojson, f)
+    with open("risk_zones.geojson", "wb") as f:
+        f.write(orjson.dumps(geojson))
     print(f"GeoJSON file saved: risk_zones.geojson")
 
     # Print top 10 highest risk zones
@@ -0,0 +1,233 @@
+"""Risk zone data and route/zone distance helpers shared by the routing test scripts.
+
+fetch_risk_zones loads the zones into the module-level ZONE_* arrays that
+the other helpers read, so scripts should reference them through the module
+(route_zones.ZONE_RADII) rather than importing the names.
+"""
+
+import hashlib
+import math
+import time
+from pathlib import Path
+from typing import List, Dict, Optional, Tuple
+
+import httpx
+import numpy as np
+import orjson
+from shapely import STRtree, points
+
+try:
+    from numba import njit
+except ImportError:  # numba is an optional speedup for the route/zone kernel
+    njit = None
+
+API_BASE = "http://localhost:8000"
+RISK_ZONES_URL = f"{API_BASE}/api/v1/risk-zones?bbox=-122.52,37.70,-122.35,37.82"
+
+ROUTES_URL = f"{API_BASE}/api/v1/routes/calculate"
+
+# Local copies of API responses, reused for a day: the risk zones, and one
+# file per distinct route request
+RISK_ZONES_CACHE = Path.home() / ".cache" / "sf-risk-zones.json"
+ROUTES_CACHE_DIR = Path.home() / ".cache" / "sf-routes"
+CACHE_TTL = 24 * 3600
+
+# Risk zone data (will be fetched), one array entry per zone:
+# centers in radians and alert radii in meters
+ZONE_LATS = np.empty(0)
+ZONE_LONS = np.empty(0)
+ZONE_RADII = np.empty(0)
+# STRtree over zone centers (degrees) for pruning far-away zones
+ZONE_TREE = None
+# (min_lat, max_lat, min_lon, max_lon) of the zone centers in degrees
+ZONE_BBOX = None
+
+
+def route_zone_distances(route_coords: List[List[float]], zone_idx: np.ndarray = None) -> np.ndarray:
+    """Distances in meters from every route point to the risk zones.
+
+    Uses the equirectangular approximation at each pair's mid latitude,
+    which agrees with haversine to within a micrometer at zone scale (under
+    1km) and within millimeters across the city, with a fraction of the trig.
+
+    Returns an (N_coords, N_zones) array, over only the zones in zone_idx
+    when given.
+    """
+    coords = np.asarray(route_coords, dtype=np.float64).reshape(-1, 2)
+    lats = np.radians(coords[:, 1])[:, None]
+    lons = np.radians(coords[:, 0])[:, None]
+    zone_lats = ZONE_LATS if zone_idx is None else ZONE_LATS[zone_idx]
+    zone_lons = ZONE_LONS if zone_idx is None else ZONE_LONS[zone_idx]
+
+    R = 6371000  # Earth radius in meters
+    dlat = zone_lats[None, :] - lats
+    dlon = (zone_lons[None, :] - lons) * np.cos((zone_lats[None, :] + lats) / 2)
+    return R * np.sqrt(dlat * dlat + dlon * dlon)
+
+
+def _route_zone_flags_kernel(
+    lats: np.ndarray, lons: np.ndarray, zone_lats: np.ndarray, zone_lons: np.ndarray,
+    pass_limits: np.ndarray, near_m: float,
+) -> Tuple[float, np.ndarray, np.ndarray]:
+    """Fused loop over route points x zones, without a distance matrix.
+
+    Same distance as route_zone_distances (all angles in radians). Returns
+    (min distance, per-point within near_m, per-point within pass_limits).
+    """
+    R = 6371000.0  # Earth radius in meters
+    n = len(lats)
+    is_near = np.zeros(n, dtype=np.bool_)
+    is_pass = np.zeros(n, dtype=np.bool_)
+    min_distance = np.inf
+
+    for i in range(n):
+        for j in range(len(zone_lats)):
+            dlat = zone_lats[j] - lats[i]
+            dlon = (zone_lons[j] - lons[i]) * math.cos((zone_lats[j] + lats[i]) / 2)
+            dist = R * math.sqrt(dlat * dlat + dlon * dlon)
+            if dist < min_distance:
+                min_distance = dist
+            if dist < near_m:
+                is_near[i] = True
+            if dist < pass_limits[j]:
+                is_pass[i] = True
+
+    return min_distance, is_near, is_pass
+
+
+# JIT-compiled kernel (compiled on first use, cached on disk); None without numba
+_route_zone_flags_nb = njit(cache=True)(_route_zone_flags_kernel) if njit is not None else None
+
+
+def route_zone_flags(
+    coords: np.ndarray, zone_idx: np.ndarray, pass_limits: np.ndarray, near_m: float
+) -> Tuple[float, np.ndarray, np.ndarray]:
+    """Minimum distance and per-point near/pass flags against the zones in zone_idx.
+
+    Uses the numba kernel when available, otherwise numpy over the distance
+    matrix.
+    """
+    if _route_zone_flags_nb is not None:
+        return _route_zone_flags_nb(
+            np.radians(coords[:, 1]), np.radians(coords[:, 0]),
+            ZONE_LATS[zone_idx], ZONE_LONS[zone_idx], pass_limits, float(near_m),
+        )
+
+    dist = route_zone_distances(coords, zone_idx)
+    min_distance = dist.min() if dist.size else np.inf
+    return min_distance, (dist < near_m).any(axis=1), (dist < pass_limits[None, :]).any(axis=1)
+
+
+def dedupe_route(route_coords: List[List[float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """Distinct route points plus, for each original point, its index among them.
+
+    Routes repeat points (leg joins, stops), so the analyzers measure each
+    distinct point once and map the per-point results back with the index.
+    """
+    coords = np.asarray(route_coords, dtype=np.float64).reshape(-1, 2)
+    unique, inverse = np.unique(coords, axis=0, return_inverse=True)
+    return unique, inverse.reshape(-1)
+
+
+def reach_degrees(coords: np.ndarray, reach_m: float) -> Tuple[float, float]:
+    """(lat, lon) degree margins that cover reach_m around the zones and coords.
+
+    Both have 10% slack; the longitude one allows for the shrink at the
+    highest latitude involved.
+    """
+    lat_margin = reach_m * 1.1 / 111000
+    max_abs_lat = max(np.abs(np.degrees(ZONE_LATS)).max(), np.abs(coords[:, 1]).max()) + lat_margin
+    return lat_margin, lat_margin / math.cos(math.radians(min(max_abs_lat, 89.0)))
+
+
+def within_zone_bbox(coords: np.ndarray, reach_m: float) -> np.ndarray:
+    """Per-point mask of coords inside the zones' bounding box grown by reach_m.
+
+    Points outside it are farther than reach_m from every zone center, so
+    long routes skip the zone checks for most of their length.
+    """
+    if ZONE_BBOX is None or len(coords) == 0:
+        return np.zeros(len(coords), dtype=bool)
+
+    lat_margin, lon_margin = reach_degrees(coords, reach_m)
+    min_lat, max_lat, min_lon, max_lon = ZONE_BBOX
+    lons, lats = coords[:, 0], coords[:, 1]
+    return (
+        (lats >= min_lat - lat_margin) & (lats <= max_lat + lat_margin)
+        & (lons >= min_lon - lon_margin) & (lons <= max_lon + lon_margin)
+    )
+
+
+def nearby_zones(route_coords: List[List[float]], reach_m: float) -> np.ndarray:
+    """Indices of zones whose center may be within reach_m of a route point.
+
+    A superset of the true matches, in zone order (see reach_degrees).
+    """
+    coords = np.asarray(route_coords, dtype=np.float64).reshape(-1, 2)
+    if ZONE_TREE is None or len(coords) == 0:
+        return np.empty(0, dtype=np.intp)
+
+    _, reach_deg = reach_degrees(coords, reach_m)
+    _, zone_idx = ZONE_TREE.query(points(coords), predicate="dwithin", distance=reach_deg)
+    return np.unique(zone_idx)
+
+
+def read_cache(path: Path) -> Optional[Dict]:
+    """Return a cache file's contents if it is younger than CACHE_TTL."""
+    try:
+        if time.time() - path.stat().st_mtime >= CACHE_TTL:
+            return None
+        return orjson.loads(path.read_bytes())
+    except (OSError, ValueError):
+        return None
+
+
+def write_cache(path: Path, data: Dict):
+    """Write data through to a cache file (best effort)."""
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(orjson.dumps(data))
+    except OSError as e:
+        print(f"Could not write cache {path}: {e}")
+
+
+def load_cached_risk_zones() -> Optional[List[Dict]]:
+    """Return the cached risk zone response if it is fresh and for RISK_ZONES_URL."""
+    cached = read_cache(RISK_ZONES_CACHE)
+    if cached is None or cached.get('url') != RISK_ZONES_URL:
+        return None
+    return cached['zones']
+
+
+def save_cached_risk_zones(zones: List[Dict]):
+    """Write the risk zone response through to the local cache."""
+    write_cache(RISK_ZONES_CACHE, {'url': RISK_ZONES_URL, 'zones': zones})
+
+
+def route_cache_path(request: Dict) -> Path:
+    """Cache file for a route request, keyed by a hash of the URL and payload."""
+    payload = orjson.dumps({'url': ROUTES_URL, 'request': request}, option=orjson.OPT_SORT_KEYS)
+    return ROUTES_CACHE_DIR / f"{hashlib.sha1(payload).hexdigest()}.json"
+
+
+async def fetch_risk_zones(client: httpx.AsyncClient, refresh: bool = False):
+    """Fetch risk zones from API, or from the local cache when fresh and refresh is not set."""
+    global ZONE_LATS, ZONE_LONS, ZONE_RADII, ZONE_TREE, ZONE_BBOX
+    zones = None if refresh else load_cached_risk_zones()
+    if zones is None:
+        response = await client.get(RISK_ZONES_URL)
+        zones = orjson.loads(response.content)
+        if response.is_success:
+            save_cached_risk_zones(zones)
+    centers = np.array(
+        [z['geometry']['coordinates'][:2] for z in zones], dtype=np.float64
+    ).reshape(-1, 2)
+    ZONE_LONS = np.radians(centers[:, 0])
+    ZONE_LATS = np.radians(centers[:, 1])
+    ZONE_RADII = np.array([z['alert_radius_meters'] for z in zones], dtype=np.float64)
+    ZONE_TREE = STRtree(points(centers)) if len(centers) else None
+    ZONE_BBOX = (
+        (centers[:, 1].min(), centers[:, 1].max(), centers[:, 0].min(), centers[:, 0].max())
+        if len(centers) else None
+    )
+    print(f"Loaded {len(centers)} risk zones")
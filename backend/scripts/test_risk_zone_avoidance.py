@@ -1,14 +1,30 @@
 """Test routing to verify SAFEST profile avoids risk zones."""
 
+import argparse
 import asyncio
-import json
-import math
-import random
 from typing import List, Dict, Tuple
 
 import httpx
-
-API_BASE = "http://localhost:8000"
+import numpy as np
+import orjson
+
+try:
+    import uvloop
+except ImportError:  # uvloop (from uvicorn[standard]) is an optional faster event loop
+    uvloop = None
+
+import route_zones
+from route_zones import (
+    ROUTES_URL,
+    dedupe_route,
+    fetch_risk_zones,
+    nearby_zones,
+    read_cache,
+    route_cache_path,
+    route_zone_flags,
+    within_zone_bbox,
+    write_cache,
+)
 
 # SF bounding box for random points
 SF_BOUNDS = {
@@ -18,79 +34,62 @@ SF_BOUNDS = {
     "max_lon": -122.38,
 }
 
-# Risk zone data (will be fetched)
-RISK_ZONES = []
+# Number of test cases run at once (each issues two route requests)
+MAX_CONCURRENT_TESTS = 8
 
 
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance in meters between two points."""
+def haversine_distance(lat1: np.ndarray, lon1: np.ndarray, lat2: np.ndarray, lon2: np.ndarray) -> np.ndarray:
+    """Calculate distance in meters between points, element-wise over arrays."""
     R = 6371000  # Earth radius in meters
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
+    lat1_rad = np.radians(lat1)
+    lat2_rad = np.radians(lat2)
+    dlat = lat2_rad - lat1_rad
+    dlon = np.radians(lon2 - lon1)
 
-    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
+    a = np.sin(dlat/2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon/2)**2
+    return 2 * R * np.arcsin(np.sqrt(a))
 
 
-def get_min_distance_to_risk_zones(route_coords: List[List[float]]) -> Tuple[float, int]:
-    """Calculate minimum distance from route to any risk zone.
+def analyze_route(route_coords: List[List[float]], threshold_m: float = 150) -> Tuple[float, int, int]:
+    """Measure a route against the risk zones from one distance matrix.
 
-    Returns: (min_distance_meters, num_zones_within_100m)
+    Returns: (min_distance_meters, num_points_within_100m, num_zone_passes)
+    where a zone pass is a route point within threshold_m of a zone's radius.
+    Each route point is counted at most once.
     """
-    min_distance = float('inf')
-    zones_within_100m = 0
-
-    for coord in route_coords:
-        lon, lat = coord[0], coord[1]
-        for zone in RISK_ZONES:
-            zone_lon, zone_lat = zone['coordinates']
-            dist = haversine_distance(lat, lon, zone_lat, zone_lon)
-            min_distance = min(min_distance, dist)
-            if dist < 100:
-                zones_within_100m += 1
-                break  # Count each route point only once
-
-    return min_distance, zones_within_100m
-
-
-def count_risk_zone_passes(route_coords: List[List[float]], threshold_m: float = 150) -> int:
-    """Count how many times route passes within threshold of a risk zone."""
-    passes = 0
-    for coord in route_coords:
-        lon, lat = coord[0], coord[1]
-        for zone in RISK_ZONES:
-            zone_lon, zone_lat = zone['coordinates']
-            zone_radius = zone['radius']
-            dist = haversine_distance(lat, lon, zone_lat, zone_lon)
-            if dist < zone_radius + threshold_m:
-                passes += 1
-                break
-    return passes
-
-
-async def fetch_risk_zones(client: httpx.AsyncClient):
-    """Fetch risk zones from API."""
-    global RISK_ZONES
-    response = await client.get(f"{API_BASE}/api/v1/risk-zones?bbox=-122.52,37.70,-122.35,37.82")
-    zones = response.json()
-    RISK_ZONES = [
-        {
-            'coordinates': (z['geometry']['coordinates'][0], z['geometry']['coordinates'][1]),
-            'radius': z['alert_radius_meters'],
-            'crashes': z['reported_count'],
-            'severity': z['severity'],
-        }
-        for z in zones
-    ]
-    print(f"Loaded {len(RISK_ZONES)} risk zones")
+    if len(route_coords) == 0 or len(route_zones.ZONE_RADII) == 0:
+        return float('inf'), 0, 0
+
+    coords, point_of = dedupe_route(route_coords)
+
+    # Only zones within reach, and points inside their bounding box, can
+    # count as near or as a pass
+    reach_m = max(100, route_zones.ZONE_RADII.max() + threshold_m)
+    inside = within_zone_bbox(coords, reach_m)
+    is_near = np.zeros(len(coords), dtype=bool)
+    is_pass = np.zeros(len(coords), dtype=bool)
+    zone_idx = nearby_zones(coords[inside], reach_m)
+    min_distance, is_near[inside], is_pass[inside] = route_zone_flags(
+        coords[inside], zone_idx, route_zones.ZONE_RADII[zone_idx] + threshold_m, 100
+    )
+
+    # Per distinct point, then counted over every original route point
+    points_near = int(is_near[point_of].sum())
+    passes = int(is_pass[point_of].sum())
+
+    # The closest zone is among the nearby ones if any is truly within reach
+    if min_distance >= reach_m:
+        all_zones = np.arange(len(route_zones.ZONE_RADII))
+        min_distance = route_zone_flags(coords, all_zones, route_zones.ZONE_RADII + threshold_m, 100)[0]
+    return float(min_distance), points_near, passes
 
 
 async def calculate_route(client: httpx.AsyncClient, origin: Tuple[float, float],
-                          dest: Tuple[float, float], profile: str) -> Dict:
-    """Calculate a route and return results."""
+                          dest: Tuple[float, float], profile: str, refresh: bool = False) -> Dict:
+    """Calculate a route and return results.
+
+    The route comes from the local cache when it is fresh, unless refresh is set.
+    """
     request = {
         "origin": {"latitude": origin[0], "longitude": origin[1]},
         "destination": {"latitude": dest[0], "longitude": dest[1]},
@@ -101,28 +100,51 @@ async def calculate_route(client: httpx.AsyncClient, origin: Tuple[float, float]
         }
     }
 
+    cache_path = route_cache_path(request)
+    cached = None if refresh else read_cache(cache_path)
+    if cached is not None:
+        return cached
+
     try:
-        response = await client.post(f"{API_BASE}/api/v1/routes/calculate", json=request)
+        response = await client.post(ROUTES_URL, json=request)
         if response.status_code != 200:
             return None
-        return response.json()
+        route = orjson.loads(response.content)
+        # Keep only what the analyzers read; legs, warnings and risk analysis are dropped
+        route = {'geometry': route['geometry'], 'summary': route['summary']}
+        write_cache(cache_path, route)
+        return route
     except Exception as e:
         return None
 
 
-def generate_random_point() -> Tuple[float, float]:
-    """Generate a random point in SF."""
-    lat = random.uniform(SF_BOUNDS["min_lat"], SF_BOUNDS["max_lat"])
-    lon = random.uniform(SF_BOUNDS["min_lon"], SF_BOUNDS["max_lon"])
-    return (lat, lon)
+def generate_random_pairs(
+    count: int, min_distance_m: float = 1000, batch_size: int = 128
+) -> List[Tuple[Tuple[float, float], Tuple[float, float]]]:
+    """Generate random (origin, dest) point pairs in SF at least min_distance_m apart.
+
+    Candidates are drawn and filtered in batches rather than one pair at a
+    time.
+    """
+    rng = np.random.default_rng()
+    pairs = []
+    while len(pairs) < count:
+        lats = rng.uniform(SF_BOUNDS["min_lat"], SF_BOUNDS["max_lat"], (batch_size, 2))
+        lons = rng.uniform(SF_BOUNDS["min_lon"], SF_BOUNDS["max_lon"], (batch_size, 2))
+        far = haversine_distance(lats[:, 0], lons[:, 0], lats[:, 1], lons[:, 1]) > min_distance_m
+        for (o_lat, d_lat), (o_lon, d_lon) in zip(lats[far].tolist(), lons[far].tolist()):
+            pairs.append(((o_lat, o_lon), (d_lat, d_lon)))
+    return pairs[:count]
 
 
 async def run_test(client: httpx.AsyncClient, test_num: int, origin: Tuple[float, float],
-                   dest: Tuple[float, float]) -> Dict:
+                   dest: Tuple[float, float], refresh: bool = False) -> Dict:
     """Run a single test comparing SAFEST vs FASTEST."""
 
-    safest_route = await calculate_route(client, origin, dest, "safest")
-    fastest_route = await calculate_route(client, origin, dest, "fastest")
+    safest_route, fastest_route = await asyncio.gather(
+        calculate_route(client, origin, dest, "safest", refresh),
+        calculate_route(client, origin, dest, "fastest", refresh),
+    )
 
     if not safest_route or not fastest_route:
         return None
@@ -130,11 +152,8 @@ async def run_test(client: httpx.AsyncClient, test_num: int, origin: Tuple[float
     safest_coords = safest_route['geometry']['coordinates']
     fastest_coords = fastest_route['geometry']['coordinates']
 
-    safest_min_dist, safest_zones_near = get_min_distance_to_risk_zones(safest_coords)
-    fastest_min_dist, fastest_zones_near = get_min_distance_to_risk_zones(fastest_coords)
-
-    safest_passes = count_risk_zone_passes(safest_coords)
-    fastest_passes = count_risk_zone_passes(fastest_coords)
+    safest_min_dist, safest_zones_near, safest_passes = analyze_route(safest_coords)
+    fastest_min_dist, fastest_zones_near, fastest_passes = analyze_route(fastest_coords)
 
     result = {
         'test_num': test_num,
@@ -160,13 +179,27 @@ async def run_test(client: httpx.AsyncClient, test_num: int, origin: Tuple[float
     return result
 
 
-async def main():
+async def main(refresh: bool = False):
+    """Run every test case.
+
+    Risk zones and routes come from the local cache when it is fresh,
+    unless refresh is set.
+    """
     print("=" * 60)
     print("RISK ZONE AVOIDANCE TEST - SAFEST vs FASTEST")
     print("=" * 60)
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        await fetch_risk_zones(client)
+    # One pooled client for every request; each running test holds two at once.
+    # HTTP/2 applies when API_BASE is https (plain http stays on HTTP/1.1 keep-alive)
+    async with httpx.AsyncClient(
+        timeout=30.0,
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=2 * MAX_CONCURRENT_TESTS,
+            max_keepalive_connections=2 * MAX_CONCURRENT_TESTS,
+        ),
+    ) as client:
+        await fetch_risk_zones(client, refresh)
 
         # Generate 35 test cases
         test_cases = []
@@ -190,13 +223,8 @@ async def main():
         ]
         test_cases.extend(strategic_tests)
 
-        # Add random test cases
-        while len(test_cases) < 35:
-            origin = generate_random_point()
-            dest = generate_random_point()
-            # Ensure minimum distance between origin and dest
-            if haversine_distance(origin[0], origin[1], dest[0], dest[1]) > 1000:
-                test_cases.append((origin, dest))
+        # Add random test cases, with a minimum distance between origin and dest
+        test_cases.extend(generate_random_pairs(35 - len(test_cases)))
 
         results = []
         safest_better_count = 0
@@ -205,8 +233,19 @@ async def main():
 
         print(f"\nRunning {len(test_cases)} test cases...\n")
 
-        for i, (origin, dest) in enumerate(test_cases):
-            result = await run_test(client, i + 1, origin, dest)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_TESTS)
+
+        async def run_bounded(test_num: int, origin: Tuple[float, float],
+                              dest: Tuple[float, float]) -> Dict:
+            async with semaphore:
+                return await run_test(client, test_num, origin, dest, refresh)
+
+        # Run the tests concurrently, then report them in order
+        test_results = await asyncio.gather(*(
+            run_bounded(i + 1, origin, dest) for i, (origin, dest) in enumerate(test_cases)
+        ))
+
+        for i, result in enumerate(test_results):
             if result:
                 results.append(result)
 
@@ -260,4 +299,9 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--refresh", action="store_true", help="re-fetch risk zones and routes instead of using the local cache")
+    args = parser.parse_args()
+    if uvloop is not None:
+        uvloop.install()
+    asyncio.run(main(refresh=args.refresh))
@@ -4,101 +4,35 @@ This script tests 50+ routes that MUST pass through risk zone areas,
 measuring how well SAFEST routing avoids them.
 """
 
+import argparse
 import asyncio
-import json
-import math
 from typing import List, Dict, Tuple
 from collections import defaultdict
 
 import httpx
-
-API_BASE = "http://localhost:8000"
-
-# Risk zone data (will be fetched)
-RISK_ZONES = []
-
-# Risk zone centers for strategic test case generation
-# These are the actual risk zone locations from the database
-RISK_ZONE_CENTERS = [
-    # High-risk Tenderloin area
-    {"name": "Tenderloin-1", "lat": 37.783104, "lon": -122.414898, "crashes": 294},
-    {"name": "Tenderloin-2", "lat": 37.785056, "lon": -122.419477, "crashes": 260},
-    {"name": "Tenderloin-3", "lat": 37.784806, "lon": -122.417002, "crashes": 210},
-    {"name": "Tenderloin-4", "lat": 37.786568, "lon": -122.418926, "crashes": 204},
-    {"name": "Tenderloin-5", "lat": 37.782933, "lon": -122.412552, "crashes": 198},
-    # South of Market (SoMa)
-    {"name": "SoMa-1", "lat": 37.781056, "lon": -122.408877, "crashes": 297},
-    {"name": "SoMa-2", "lat": 37.777229, "lon": -122.412912, "crashes": 189},
-    {"name": "SoMa-3", "lat": 37.774968, "lon": -122.415196, "crashes": 168},
-    # Mission District
-    {"name": "Mission-1", "lat": 37.765380, "lon": -122.407336, "crashes": 241},
-    {"name": "Mission-2", "lat": 37.769294, "lon": -122.417714, "crashes": 220},
-    {"name": "Mission-3", "lat": 37.773001, "lon": -122.418673, "crashes": 208},
-    {"name": "Mission-4", "lat": 37.771718, "lon": -122.423257, "crashes": 208},
-    {"name": "Mission-5", "lat": 37.769222, "lon": -122.422457, "crashes": 203},
-    # Financial District
-    {"name": "FiDi-1", "lat": 37.787227, "lon": -122.403024, "crashes": 229},
-    {"name": "FiDi-2", "lat": 37.789002, "lon": -122.402811, "crashes": 200},
-    # Hayes Valley
-    {"name": "Hayes-1", "lat": 37.773101, "lon": -122.423121, "crashes": 207},
-    {"name": "Hayes-2", "lat": 37.774929, "lon": -122.424589, "crashes": 188},
-    # Western Addition
-    {"name": "Western-1", "lat": 37.781075, "lon": -122.422970, "crashes": 207},
-    {"name": "Western-2", "lat": 37.779279, "lon": -122.430842, "crashes": 193},
-    # Nob Hill
-    {"name": "NobHill", "lat": 37.789016, "lon": -122.420844, "crashes": 188},
-    # Castro
-    {"name": "Castro", "lat": 37.767272, "lon": -122.428954, "crashes": 166},
-]
-
-
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance in meters between two points."""
-    R = 6371000
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat/2)**2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon/2)**2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-    return R * c
-
-
-def point_between(p1: Tuple[float, float], p2: Tuple[float, float],
-                  zone: Dict, threshold_m: float = 500) -> bool:
-    """Check if a risk zone is roughly between two points."""
-    zone_lat, zone_lon = zone["lat"], zone["lon"]
-
-    # Zone should be within bounding box of p1 and p2 (with buffer)
-    min_lat = min(p1[0], p2[0]) - 0.005
-    max_lat = max(p1[0], p2[0]) + 0.005
-    min_lon = min(p1[1], p2[1]) - 0.005
-    max_lon = max(p1[1], p2[1]) + 0.005
-
-    if not (min_lat <= zone_lat <= max_lat and min_lon <= zone_lon <= max_lon):
-        return False
-
-    # Zone should be reasonably close to the line between p1 and p2
-    # Use perpendicular distance approximation
-    d1 = haversine_distance(p1[0], p1[1], zone_lat, zone_lon)
-    d2 = haversine_distance(p2[0], p2[1], zone_lat, zone_lon)
-    d12 = haversine_distance(p1[0], p1[1], p2[0], p2[1])
-
-    # If zone is roughly on the path (d1 + d2 ~ d12)
-    if d12 > 0:
-        detour_ratio = (d1 + d2) / d12
-        return detour_ratio < 1.5  # Allow 50% detour
-
-    return False
-
-
-def count_zones_between(p1: Tuple[float, float], p2: Tuple[float, float]) -> int:
-    """Count how many risk zones are between two points."""
-    count = 0
-    for zone in RISK_ZONE_CENTERS:
-        if point_between(p1, p2, zone):
-            count += 1
-    return count
+import numpy as np
+import orjson
+
+try:
+    import uvloop
+except ImportError:  # uvloop (from uvicorn[standard]) is an optional faster event loop
+    uvloop = None
+
+import route_zones
+from route_zones import (
+    ROUTES_URL,
+    dedupe_route,
+    fetch_risk_zones,
+    nearby_zones,
+    read_cache,
+    route_cache_path,
+    route_zone_flags,
+    within_zone_bbox,
+    write_cache,
+)
+
+# Number of test cases run at once (each issues two route requests)
+MAX_CONCURRENT_TESTS = 8
 
 
 def generate_strategic_test_cases() -> List[Tuple[Tuple[float, float], Tuple[float, float], str]]:
@@ -238,51 +172,42 @@ def generate_strategic_test_cases() -> List[Tuple[Tuple[float, float], Tuple[flo
     return test_cases
 
 
-async def fetch_risk_zones(client: httpx.AsyncClient):
-    """Fetch risk zones from API."""
-    global RISK_ZONES
-    response = await client.get(f"{API_BASE}/api/v1/risk-zones?bbox=-122.52,37.70,-122.35,37.82")
-    zones = response.json()
-    RISK_ZONES = [
-        {
-            'id': z.get('id'),
-            'coordinates': (z['geometry']['coordinates'][0], z['geometry']['coordinates'][1]),
-            'radius': z['alert_radius_meters'],
-            'crashes': z['reported_count'],
-            'severity': z['severity'],
-        }
-        for z in zones
-    ]
-    print(f"Loaded {len(RISK_ZONES)} risk zones")
-
-
 def count_risk_zone_passes(route_coords: List[List[float]], threshold_m: float = 100) -> Tuple[int, float]:
     """Count how many times route passes within threshold of a risk zone.
 
     Returns: (num_passes, min_distance_to_any_zone)
     """
-    passes = 0
-    min_distance = float('inf')
+    if len(route_coords) == 0 or len(route_zones.ZONE_RADII) == 0:
+        return 0, float('inf')
+
+    coords, point_of = dedupe_route(route_coords)
 
-    for coord in route_coords:
-        lon, lat = coord[0], coord[1]
-        for zone in RISK_ZONES:
-            zone_lon, zone_lat = zone['coordinates']
-            zone_radius = zone['radius']
-            dist = haversine_distance(lat, lon, zone_lat, zone_lon)
-            min_distance = min(min_distance, dist)
+    # Only zones within reach, and points inside their bounding box, can
+    # count as a pass
+    reach_m = route_zones.ZONE_RADII.max()
+    inside = within_zone_bbox(coords, reach_m)
+    is_pass = np.zeros(len(coords), dtype=bool)
+    zone_idx = nearby_zones(coords[inside], reach_m)
+    min_distance, _, is_pass[inside] = route_zone_flags(
+        coords[inside], zone_idx, route_zones.ZONE_RADII[zone_idx], 0
+    )
 
-            # Count as "pass" if within zone radius
-            if dist < zone_radius:
-                passes += 1
-                break
+    # Count as "pass" if within zone radius, once per original route point
+    passes = int(is_pass[point_of].sum())
 
-    return passes, min_distance
+    # The closest zone is among the nearby ones if any is truly within reach
+    if min_distance >= reach_m:
+        all_zones = np.arange(len(route_zones.ZONE_RADII))
+        min_distance = route_zone_flags(coords, all_zones, route_zones.ZONE_RADII, 0)[0]
+    return passes, float(min_distance)
 
 
 async def calculate_route(client: httpx.AsyncClient, origin: Tuple[float, float],
-                          dest: Tuple[float, float], profile: str) -> Dict:
-    """Calculate a route and return results."""
+                          dest: Tuple[float, float], profile: str, refresh: bool = False) -> Dict:
+    """Calculate a route and return results.
+
+    The route comes from the local cache when it is fresh, unless refresh is set.
+    """
     request = {
         "origin": {"latitude": origin[0], "longitude": origin[1]},
         "destination": {"latitude": dest[0], "longitude": dest[1]},
@@ -293,11 +218,20 @@ async def calculate_route(client: httpx.AsyncClient, origin: Tuple[float, float]
         }
     }
 
+    cache_path = route_cache_path(request)
+    cached = None if refresh else read_cache(cache_path)
+    if cached is not None:
+        return cached
+
     try:
-        response = await client.post(f"{API_BASE}/api/v1/routes/calculate", json=request)
+        response = await client.post(ROUTES_URL, json=request)
         if response.status_code != 200:
             return None
-        return response.json()
+        route = orjson.loads(response.content)
+        # Keep only what the analyzers read; legs, warnings and risk analysis are dropped
+        route = {'geometry': route['geometry'], 'summary': route['summary']}
+        write_cache(cache_path, route)
+        return route
     except Exception as e:
         print(f"Error: {e}")
         return None
@@ -305,11 +239,13 @@ async def calculate_route(client: httpx.AsyncClient, origin: Tuple[float, float]
 
 async def run_test(client: httpx.AsyncClient, test_num: int,
                    origin: Tuple[float, float], dest: Tuple[float, float],
-                   description: str) -> Dict:
+                   description: str, refresh: bool = False) -> Dict:
     """Run a single test comparing SAFEST vs FASTEST."""
 
-    safest_route = await calculate_route(client, origin, dest, "safest")
-    fastest_route = await calculate_route(client, origin, dest, "fastest")
+    safest_route, fastest_route = await asyncio.gather(
+        calculate_route(client, origin, dest, "safest", refresh),
+        calculate_route(client, origin, dest, "fastest", refresh),
+    )
 
     if not safest_route or not fastest_route:
         return None
@@ -349,14 +285,28 @@ async def run_test(client: httpx.AsyncClient, test_num: int,
     return result
 
 
-async def main():
+async def main(refresh: bool = False):
+    """Run every test case.
+
+    Risk zones and routes come from the local cache when it is fresh,
+    unless refresh is set.
+    """
     print("=" * 70)
     print("COMPREHENSIVE SAFEST ROUTING TEST")
     print("Goal: SAFEST profile should COMPLETELY avoid risk zones")
     print("=" * 70)
 
-    async with httpx.AsyncClient(timeout=60.0) as client:
-        await fetch_risk_zones(client)
+    # One pooled client for every request; each running test holds two at once.
+    # HTTP/2 applies when API_BASE is https (plain http stays on HTTP/1.1 keep-alive)
+    async with httpx.AsyncClient(
+        timeout=60.0,
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=2 * MAX_CONCURRENT_TESTS,
+            max_keepalive_connections=2 * MAX_CONCURRENT_TESTS,
+        ),
+    ) as client:
+        await fetch_risk_zones(client, refresh)
 
         test_cases = generate_strategic_test_cases()
         print(f"\nGenerated {len(test_cases)} strategic test cases\n")
@@ -369,8 +319,19 @@ async def main():
         same_result = 0
         fastest_better = 0
 
-        for i, (origin, dest, desc) in enumerate(test_cases):
-            result = await run_test(client, i + 1, origin, dest, desc)
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_TESTS)
+
+        async def run_bounded(test_num: int, origin: Tuple[float, float],
+                              dest: Tuple[float, float], description: str) -> Dict:
+            async with semaphore:
+                return await run_test(client, test_num, origin, dest, description, refresh)
+
+        # Run the tests concurrently, then report them in order
+        test_results = await asyncio.gather(*(
+            run_bounded(i + 1, origin, dest, desc) for i, (origin, dest, desc) in enumerate(test_cases)
+        ))
+
+        for i, ((origin, dest, desc), result) in enumerate(zip(test_cases, test_results)):
             if result:
                 results.append(result)
 
@@ -461,4 +422,9 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--refresh", action="store_true", help="re-fetch risk zones and routes instead of using the local cache")
+    args = parser.parse_args()
+    if uvloop is not None:
+        uvloop.install()
+    asyncio.run(main(refresh=args.refresh))
@@ -1,16 +1,40 @@
 """Standalone test app without database dependencies."""
 
-from fastapi import FastAPI, HTTPException
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Header, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, ConfigDict, Field
+from typing import TYPE_CHECKING, List, Optional, Tuple
 from enum import Enum
-import uuid
+import hashlib
+import math
+import os
+import random
+import threading
+
+import orjson
+
+if TYPE_CHECKING:
+    import numpy as np
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Compile the distance function before serving requests."""
+    # numba compiles on the first call; doing it here keeps the compile
+    # from blocking the event loop inside the first route request
+    _get_haversine_m()(0.0, 0.0, 0.0, 0.0)
+    yield
+
 
 app = FastAPI(
     title="SF Micromobility Navigation API (Test Mode)",
     description="Testing API structure without database",
     version="1.0.0",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -20,6 +44,7 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=1)
 
 
 # Schemas
@@ -35,6 +60,10 @@ class RouteProfile(str, Enum):
 
 
 class RoutePreferences(BaseModel):
+    # Frozen (hashable), so the default instance in RouteRequest is shared
+    # rather than deep-copied for every request that omits preferences
+    model_config = ConfigDict(frozen=True)
+
     profile: RouteProfile = RouteProfile.BALANCED
     avoid_hills: bool = False
     prefer_bike_lanes: bool = True
@@ -48,6 +77,10 @@ class RouteRequest(BaseModel):
     preferences: RoutePreferences = RoutePreferences()
 
 
+class BatchRouteRequest(BaseModel):
+    routes: List[RouteRequest] = Field(..., max_length=500)
+
+
 class RouteSummary(BaseModel):
     distance_meters: int
     duration_seconds: int
@@ -61,7 +94,7 @@ class RouteSummary(BaseModel):
 class RiskAnalysis(BaseModel):
     total_risk_zones: int = 0
     high_severity_zones: int = 0
-    risk_zone_ids: List[str] = []
+    risk_zone_ids: Tuple[str, ...] = ()
 
 
 class RouteResponse(BaseModel):
@@ -95,9 +128,9 @@ class RiskZone(BaseModel):
     alert_message: Optional[str] = None
 
 
-# Mock data
+# Mock data (already typed as the model expects, so skip validation)
 MOCK_RISK_ZONES = [
-    RiskZone(
+    RiskZone.model_construct(
         id="rz-001",
         geometry={"type": "Point", "coordinates": [-122.4194, 37.7749]},
         hazard_type=HazardType.POTHOLE,
@@ -105,7 +138,7 @@ MOCK_RISK_ZONES = [
         name="Market St Pothole",
         alert_message="Pothole ahead. Use caution.",
     ),
-    RiskZone(
+    RiskZone.model_construct(
         id="rz-002",
         geometry={"type": "Point", "coordinates": [-122.4089, 37.7833]},
         hazard_type=HazardType.TROLLEY_TRACKS,
@@ -113,7 +146,7 @@ MOCK_RISK_ZONES = [
         name="Powell St Trolley Tracks",
         alert_message="Trolley tracks ahead. Cross at an angle.",
     ),
-    RiskZone(
+    RiskZone.model_construct(
         id="rz-003",
         geometry={"type": "Point", "coordinates": [-122.4367, 37.7598]},
         hazard_type=HazardType.STEEP_GRADE,
@@ -123,6 +156,82 @@ MOCK_RISK_ZONES = [
     ),
 ]
 
+# Severity order for minimum-severity filters
+_SEVERITY_RANK = {
+    HazardSeverity.LOW: 0,
+    HazardSeverity.MEDIUM: 1,
+    HazardSeverity.HIGH: 2,
+    HazardSeverity.CRITICAL: 3,
+}
+
+# The risk zone listings never change, so serialize them once: unfiltered,
+# and for each minimum severity
+_MOCK_RISK_ZONES_JSON = orjson.dumps([z.model_dump(mode="json") for z in MOCK_RISK_ZONES])
+_MOCK_RISK_ZONES_ETAG = f'W/"{hashlib.md5(_MOCK_RISK_ZONES_JSON).hexdigest()}"'
+_MOCK_RISK_ZONES_HEADERS = {
+    "Cache-Control": "public, max-age=300",
+    "ETag": _MOCK_RISK_ZONES_ETAG,
+}
+_MOCK_RISK_ZONES_JSON_BY_MIN_SEVERITY = {
+    severity: orjson.dumps([
+        z.model_dump(mode="json")
+        for z in MOCK_RISK_ZONES
+        if _SEVERITY_RANK[z.severity] >= _SEVERITY_RANK[severity]
+    ])
+    for severity in HazardSeverity
+}
+# ... and each zone on its own, by id
+_MOCK_RISK_ZONE_JSON_BY_ID = {
+    z.id: orjson.dumps(z.model_dump(mode="json")) for z in MOCK_RISK_ZONES
+}
+
+
+def _haversine_kernel(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in meters between two points in degrees."""
+    R = 6371000.0  # Earth radius in meters
+    lat1_rad = math.radians(lat1)
+    lat2_rad = math.radians(lat2)
+    dlat = lat2_rad - lat1_rad
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
+    return 2 * R * math.asin(math.sqrt(a))
+
+
+# Resolved by _get_haversine_m on first use
+_haversine_m = None
+
+
+def _get_haversine_m():
+    """Return the distance function, JIT-compiling it when numba is installed.
+
+    numba (and numpy) take a few hundred milliseconds to import, so they are
+    loaded by the lifespan hook rather than at module import.
+    """
+    global _haversine_m
+    if _haversine_m is None:
+        try:
+            from numba import njit
+        except ImportError:  # numba is an optional speedup for the distance estimate
+            _haversine_m = _haversine_kernel
+        else:
+            _haversine_m = njit(cache=True, fastmath=True)(_haversine_kernel)
+    return _haversine_m
+
+
+def _haversine_m_array(
+    lat1: "np.ndarray", lon1: "np.ndarray", lat2: "np.ndarray", lon2: "np.ndarray"
+) -> "np.ndarray":
+    """Element-wise _haversine_kernel over arrays of points."""
+    import numpy as np
+
+    R = 6371000.0  # Earth radius in meters
+    lat1_rad = np.radians(lat1)
+    lat2_rad = np.radians(lat2)
+    dlat = lat2_rad - lat1_rad
+    dlon = np.radians(lon2 - lon1)
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon / 2) ** 2
+    return 2 * R * np.arcsin(np.sqrt(a))
+
 
 # Endpoints
 @app.get("/")
@@ -140,83 +249,206 @@ async def health():
     return {"status": "healthy", "mode": "test"}
 
 
-@app.post("/api/v1/routes/calculate", response_model=RouteResponse)
-async def calculate_route(request: RouteRequest):
-    """Calculate a route (mock response for testing)."""
-
-    # Create a simple straight-line route for testing
-    coordinates = [
-        [request.origin.longitude, request.origin.latitude],
-        [request.destination.longitude, request.destination.latitude],
-    ]
-
-    # Estimate distance (rough approximation)
-    lat_diff = abs(request.destination.latitude - request.origin.latitude)
-    lon_diff = abs(request.destination.longitude - request.origin.longitude)
-    distance_deg = (lat_diff**2 + lon_diff**2) ** 0.5
-    distance_meters = int(distance_deg * 111000)  # ~111km per degree
+# Per-thread PRNG for route ids, reseeded from os.urandom in each thread and
+# after fork; route ids only need to be unique, not unpredictable
+_route_id_rng = threading.local()
+os.register_at_fork(after_in_child=_route_id_rng.__dict__.clear)
+
+
+def _new_route_id() -> str:
+    """Random route id in UUID4 format, without a urandom read per call."""
+    rng = getattr(_route_id_rng, "rng", None)
+    if rng is None:
+        rng = _route_id_rng.rng = random.Random(os.urandom(16))
+    bits = rng.getrandbits(128)
+    # Version 4 and RFC 4122 variant bits, as uuid.uuid4() sets them
+    bits = bits & ~(0xF000 << 64) | (0x4000 << 64)
+    bits = bits & ~(0xC000 << 48) | (0x8000 << 48)
+    h = f"{bits:032x}"
+    return f"{h[:8]}-{h[8:12]}-{h[12:16]}-{h[16:20]}-{h[20:]}"
+
+
+# Mock (bike lane %, risk score, risk zone ids) per profile
+_PROFILE_TABLE = {
+    RouteProfile.SAFEST: (85.0, 0.1, ("rz-001",)),
+    RouteProfile.FASTEST: (40.0, 0.5, ("rz-001", "rz-002")),
+    RouteProfile.BALANCED: (65.0, 0.3, ("rz-001", "rz-002")),
+}
+
+# Mock (elevation gain m, elevation loss m, max grade %) by avoid_hills
+_HILLS_TABLE = {
+    False: (50, 30, 8.0),
+    True: (10, 5, 3.0),
+}
+
+
+def _mock_route_content(
+    origin_lat: float,
+    origin_lon: float,
+    dest_lat: float,
+    dest_lon: float,
+    profile: RouteProfile,
+    avoid_hills: bool,
+    distance_meters: int,
+) -> dict:
+    """Mock route response body, with RouteResponse's field order and types."""
 
     # Estimate duration (assume 15 km/h average for scooter)
     duration_seconds = int(distance_meters / 15000 * 3600)
 
-    # Mock bike lane percentage based on profile
-    bike_lane_pct = {
-        RouteProfile.SAFEST: 85,
-        RouteProfile.FASTEST: 40,
-        RouteProfile.BALANCED: 65,
-    }.get(request.preferences.profile, 65)
+    # Mock summary figures and risk analysis based on preferences
+    bike_lane_pct, risk_score, risk_zone_ids = _PROFILE_TABLE[profile]
+    elevation_gain, elevation_loss, max_grade = _HILLS_TABLE[avoid_hills]
+    risk_zones_count = len(risk_zone_ids)
 
-    # Mock risk analysis
-    risk_zones_count = 1 if request.preferences.profile == RouteProfile.SAFEST else 2
-
-    return RouteResponse(
-        route_id=str(uuid.uuid4()),
-        geometry={
+    return {
+        "route_id": _new_route_id(),
+        # A simple straight-line route for testing
+        "geometry": {
             "type": "LineString",
-            "coordinates": coordinates,
+            "coordinates": [[origin_lon, origin_lat], [dest_lon, dest_lat]],
         },
-        summary=RouteSummary(
-            distance_meters=distance_meters,
-            duration_seconds=duration_seconds,
-            elevation_gain_meters=50 if not request.preferences.avoid_hills else 10,
-            elevation_loss_meters=30 if not request.preferences.avoid_hills else 5,
-            max_grade_percent=8 if not request.preferences.avoid_hills else 3,
-            bike_lane_percentage=bike_lane_pct,
-            risk_score=0.1 if request.preferences.profile == RouteProfile.SAFEST else 0.3 if request.preferences.profile == RouteProfile.BALANCED else 0.5,
-        ),
-        risk_analysis=RiskAnalysis(
-            total_risk_zones=risk_zones_count,
-            high_severity_zones=1 if risk_zones_count > 1 else 0,
-            risk_zone_ids=["rz-001"] if risk_zones_count == 1 else ["rz-001", "rz-002"],
-        ),
+        "summary": {
+            "distance_meters": distance_meters,
+            "duration_seconds": duration_seconds,
+            "elevation_gain_meters": elevation_gain,
+            "elevation_loss_meters": elevation_loss,
+            "max_grade_percent": max_grade,
+            "bike_lane_percentage": bike_lane_pct,
+            "risk_score": risk_score,
+        },
+        "risk_analysis": {
+            "total_risk_zones": risk_zones_count,
+            "high_severity_zones": 1 if risk_zones_count > 1 else 0,
+            "risk_zone_ids": risk_zone_ids,
+        },
+    }
+
+
+def _mock_route(request: RouteRequest, distance_meters: int) -> dict:
+    """Build the mock route response for a request and its estimated distance."""
+    return _mock_route_content(
+        request.origin.latitude, request.origin.longitude,
+        request.destination.latitude, request.destination.longitude,
+        request.preferences.profile, request.preferences.avoid_hills,
+        distance_meters,
+    )
+
+
+@app.post("/api/v1/routes/calculate", response_model=RouteResponse)
+async def calculate_route(request: RouteRequest):
+    """Calculate a route (mock response for testing)."""
+
+    # Estimate distance (straight line over the Earth's surface)
+    distance_meters = int(_get_haversine_m()(
+        request.origin.latitude, request.origin.longitude,
+        request.destination.latitude, request.destination.longitude,
+    ))
+    return _mock_route(request, distance_meters)
+
+
+def _read_coordinate(body: dict, key: str) -> Tuple[float, float]:
+    """(latitude, longitude) of body[key], with Coordinate's range checks."""
+    try:
+        lat = float(body[key]["latitude"])
+        lon = float(body[key]["longitude"])
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=422, detail=f"{key} needs numeric latitude and longitude")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(status_code=422, detail=f"{key} is out of range")
+    return lat, lon
+
+
+@app.post("/api/v1/routes/calculate_fast")
+async def calculate_route_fast(request: Request):
+    """Same as /routes/calculate, but without pydantic on the way in or out.
+
+    The body is parsed with orjson and only the fields the mock uses are
+    checked, so this is meant for trusted internal callers; /routes/calculate
+    remains the documented, fully validated endpoint.
+    """
+    try:
+        body = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=422, detail="Request body must be JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=422, detail="Request body must be an object")
+
+    origin_lat, origin_lon = _read_coordinate(body, "origin")
+    dest_lat, dest_lon = _read_coordinate(body, "destination")
+
+    preferences = body.get("preferences") or {}
+    if not isinstance(preferences, dict):
+        raise HTTPException(status_code=422, detail="preferences must be an object")
+    try:
+        profile = RouteProfile(preferences.get("profile", RouteProfile.BALANCED))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Unknown route profile")
+    avoid_hills = preferences.get("avoid_hills", False)
+    if not isinstance(avoid_hills, bool):
+        raise HTTPException(status_code=422, detail="avoid_hills must be a boolean")
+
+    distance_meters = int(_get_haversine_m()(origin_lat, origin_lon, dest_lat, dest_lon))
+    return ORJSONResponse(_mock_route_content(
+        origin_lat, origin_lon, dest_lat, dest_lon, profile, avoid_hills, distance_meters,
+    ))
+
+
+@app.post("/api/v1/routes/calculate_batch", response_model=List[RouteResponse])
+async def calculate_routes_batch(batch: BatchRouteRequest):
+    """Calculate many routes in one call (mock responses for testing)."""
+    if not batch.routes:
+        return []
+
+    import numpy as np
+
+    # Estimate all distances at once
+    ends = np.array(
+        [
+            (r.origin.latitude, r.origin.longitude, r.destination.latitude, r.destination.longitude)
+            for r in batch.routes
+        ],
+        dtype=np.float64,
     )
+    distances = _haversine_m_array(ends[:, 0], ends[:, 1], ends[:, 2], ends[:, 3])
+    return [
+        _mock_route(r, distance_meters)
+        for r, distance_meters in zip(batch.routes, distances.astype(np.int64).tolist())
+    ]
 
 
 @app.get("/api/v1/risk-zones", response_model=List[RiskZone])
 async def get_risk_zones(
     bbox: Optional[str] = None,
     severity: Optional[HazardSeverity] = None,
+    if_none_match: Optional[str] = Header(None),
 ):
     """Get risk zones (mock data for testing)."""
-    zones = MOCK_RISK_ZONES
-
-    if severity:
-        severity_order = [HazardSeverity.LOW, HazardSeverity.MEDIUM, HazardSeverity.HIGH, HazardSeverity.CRITICAL]
-        min_idx = severity_order.index(severity)
-        zones = [z for z in zones if severity_order.index(z.severity) >= min_idx]
-
-    return zones
+    if severity is None:
+        # Fixed listing: cacheable, and revalidated by ETag without a body
+        if if_none_match == _MOCK_RISK_ZONES_ETAG:
+            return Response(status_code=304, headers=_MOCK_RISK_ZONES_HEADERS)
+        return Response(
+            content=_MOCK_RISK_ZONES_JSON,
+            media_type="application/json",
+            headers=_MOCK_RISK_ZONES_HEADERS,
+        )
+    return Response(
+        content=_MOCK_RISK_ZONES_JSON_BY_MIN_SEVERITY[severity], media_type="application/json"
+    )
 
 
 @app.get("/api/v1/risk-zones/{zone_id}", response_model=RiskZone)
 async def get_risk_zone(zone_id: str):
     """Get a specific risk zone."""
-    for zone in MOCK_RISK_ZONES:
-        if zone.id == zone_id:
-            return zone
-    raise HTTPException(status_code=404, detail="Risk zone not found")
+    zone_json = _MOCK_RISK_ZONE_JSON_BY_ID.get(zone_id)
+    if zone_json is None:
+        raise HTTPException(status_code=404, detail="Risk zone not found")
+    return Response(content=zone_json, media_type="application/json")
 
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # loop/http "auto" already pick uvloop and httptools from uvicorn[standard];
+    # per-request access logging is skipped
+    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="warning", access_log=False)
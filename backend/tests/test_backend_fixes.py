@@ -115,8 +115,13 @@ class TestRouteTiming:
 class TestJWTRevocation:
     """Tests for JWT token revocation with Redis."""
 
-    def test_blacklist_adds_token_to_internal_set(self):
-        """Token blacklist should add token JTI to blacklist set."""
+    @pytest.fixture(scope="class")
+    def jwt_manager(self):
+        """One in-memory JWTManager shared by the whole class.
+
+        Settings are only read while the manager is constructed, so the
+        patch is entered once instead of per test.
+        """
         from app.core.jwt import JWTManager, JWTConfig
 
         # Create manager with explicit config (matching issuer/audience)
@@ -131,85 +136,70 @@ class TestJWTRevocation:
             mock_settings.redis_url = None  # Force in-memory
             mock_settings.secret_key = config.secret_key
 
-            manager = JWTManager(config)
-
-            # Create a token
-            token = manager.create_access_token(
-                subject="test-user",
-                roles=["user"],
-            )
-
-            # Verify token works before blacklisting
-            payload_before = manager.decode_token(token)
-            assert payload_before is not None
-            assert payload_before.sub == "test-user"
+            yield JWTManager(config)
 
-            # Blacklist it
-            result = manager.blacklist_token(token)
-            assert result is True
+    @pytest.fixture(autouse=True)
+    def _reset_blacklist(self, jwt_manager):
+        """Each test starts with an empty in-memory blacklist."""
+        jwt_manager._blacklist.clear()
 
-            # Verify token is now rejected
-            payload_after = manager.decode_token(token)
-            assert payload_after is None  # Should be None because blacklisted
-
-    def test_blacklisted_token_rejected_on_decode(self):
-        """Blacklisted tokens should be rejected when decoded."""
-        from app.core.jwt import JWTManager, JWTConfig
+    def test_blacklist_adds_token_to_internal_set(self, jwt_manager):
+        """Token blacklist should add token JTI to blacklist set."""
+        manager = jwt_manager
 
-        config = JWTConfig(
-            secret_key="test-secret-key-at-least-32-chars-long",
-            issuer="test-issuer",
-            audience="test-audience",
+        # Create a token
+        token = manager.create_access_token(
+            subject="test-user",
+            roles=["user"],
         )
 
-        with patch('app.core.jwt.settings') as mock_settings:
-            mock_settings.redis_url = None
-            mock_settings.secret_key = config.secret_key
+        # Verify token works before blacklisting
+        payload_before = manager.decode_token(token)
+        assert payload_before is not None
+        assert payload_before.sub == "test-user"
 
-            manager = JWTManager(config)
+        # Blacklist it
+        result = manager.blacklist_token(token)
+        assert result is True
 
-            # Create and verify token works
-            token = manager.create_access_token(subject="test-user")
-            payload = manager.decode_token(token)
-            assert payload is not None
-            assert payload.sub == "test-user"
+        # Verify token is now rejected
+        payload_after = manager.decode_token(token)
+        assert payload_after is None  # Should be None because blacklisted
 
-            # Blacklist
-            success = manager.blacklist_token(token)
-            assert success is True
+    def test_blacklisted_token_rejected_on_decode(self, jwt_manager):
+        """Blacklisted tokens should be rejected when decoded."""
+        manager = jwt_manager
 
-            # Should now be rejected
-            payload2 = manager.decode_token(token)
-            assert payload2 is None
+        # Create and verify token works
+        token = manager.create_access_token(subject="test-user")
+        payload = manager.decode_token(token)
+        assert payload is not None
+        assert payload.sub == "test-user"
 
-    def test_blacklist_stores_jti_not_full_token(self):
-        """Blacklist should store JTI (token ID), not the full token."""
-        from app.core.jwt import JWTManager, JWTConfig
+        # Blacklist
+        success = manager.blacklist_token(token)
+        assert success is True
 
-        config = JWTConfig(
-            secret_key="test-secret-key-at-least-32-chars-long",
-            issuer="test-issuer",
-            audience="test-audience",
-        )
+        # Should now be rejected
+        payload2 = manager.decode_token(token)
+        assert payload2 is None
 
-        with patch('app.core.jwt.settings') as mock_settings:
-            mock_settings.redis_url = None
-            mock_settings.secret_key = config.secret_key
-
-            manager = JWTManager(config)
+    def test_blacklist_stores_jti_not_full_token(self, jwt_manager):
+        """Blacklist should store JTI (token ID), not the full token."""
+        manager = jwt_manager
 
-            # Initially empty blacklist
-            assert len(manager._blacklist) == 0
+        # Initially empty blacklist
+        assert len(manager._blacklist) == 0
 
-            # Create and blacklist token
-            token = manager.create_access_token(subject="test-user")
-            manager.blacklist_token(token)
+        # Create and blacklist token
+        token = manager.create_access_token(subject="test-user")
+        manager.blacklist_token(token)
 
-            # Blacklist should contain JTI (a UUID string), not full token
-            assert len(manager._blacklist) == 1
-            jti = list(manager._blacklist)[0]
-            assert len(jti) == 36  # UUID format: 8-4-4-4-12 = 36 chars
-            assert jti != token  # JTI is not the full token
+        # Blacklist should contain JTI (a UUID string), not full token
+        assert len(manager._blacklist) == 1
+        jti = list(manager._blacklist)[0]
+        assert len(jti) == 36  # UUID format: 8-4-4-4-12 = 36 chars
+        assert jti != token  # JTI is not the full token
 
 
 # =============================================================================
@@ -289,6 +279,35 @@ class TestSpatialQueries:
         assert ST_DWithin is not None
         assert ST_Distance is not None
 
+    @pytest.mark.asyncio
+    async def test_zone_cache_load_selects_centers_in_sql(self):
+        """Risk zone cache load should take zone centers from PostGIS, not WKB."""
+        from types import SimpleNamespace
+        from sqlalchemy.dialects import postgresql
+        from app.models.risk_zone import HazardSeverity
+        from app.services.risk_zone_service import RiskZoneService
+
+        rows = [
+            SimpleNamespace(id=1, lon=-122.41, lat=37.78, alert_radius_meters=150,
+                            severity=HazardSeverity.HIGH, reported_count=240),
+            SimpleNamespace(id=2, lon=None, lat=None, alert_radius_meters=None,
+                            severity=None, reported_count=None),
+        ]
+        result = MagicMock()
+        result.all.return_value = rows
+        db = AsyncMock()
+        db.execute.return_value = result
+
+        zones = await RiskZoneService()._fetch_zones_from_db(db)
+
+        sql = str(db.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        assert "ST_Centroid(risk_zones.geometry)" in sql
+        assert "risk_zones.description" not in sql
+        assert zones == [{
+            "id": "1", "lon": -122.41, "lat": 37.78, "radius_meters": 150,
+            "severity": "HIGH", "reported_count": 240,
+        }]
+
     def test_bounding_box_from_string(self):
         """BoundingBox should parse from comma-separated string."""
         from app.schemas.common import BoundingBox
@@ -335,9 +354,9 @@ class TestVerifiedReportsCreateRiskZones:
     def test_confidence_score_calculation(self):
         """Confidence score should be 0.7-1.0 based on verifications."""
         # Formula: 0.7 + (0.1 * min(verification_count - 3, 3))
+        from app.services.risk_zone_service import risk_zone_service
 
-        def calc_confidence(verification_count):
-            return 0.7 + (0.1 * min(verification_count - 3, 3))
+        calc_confidence = risk_zone_service.verification_confidence_np
 
         # Use pytest.approx for floating point comparison
         assert calc_confidence(3) == pytest.approx(0.7)   # Minimum threshold
@@ -345,6 +364,17 @@ class TestVerifiedReportsCreateRiskZones:
         assert calc_confidence(5) == pytest.approx(0.9)
         assert calc_confidence(6) == pytest.approx(1.0)   # Maximum
         assert calc_confidence(10) == pytest.approx(1.0)  # Capped at 1.0
+        assert calc_confidence(1) == pytest.approx(0.7)   # Clamped below the threshold
+
+    def test_confidence_score_calculation_batch(self):
+        """Confidence scores for many verification counts at once."""
+        import numpy as np
+        from app.services.risk_zone_service import risk_zone_service
+
+        np.testing.assert_allclose(
+            risk_zone_service.verification_confidence_np(np.array([3, 4, 5, 6, 10])),
+            [0.7, 0.8, 0.9, 1.0, 1.0],
+        )
 
 
 # =============================================================================
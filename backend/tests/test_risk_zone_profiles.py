@@ -11,18 +11,38 @@ Runs 100 random origin/destination pairs in SF that are guaranteed to have
 risk zones between them, then checks compliance for each profile.
 """
 
+import argparse
 import asyncio
+import hashlib
 import json
-import random
 import math
 import time
 import httpx
-from typing import List, Dict, Tuple, Any
+import numpy as np
+import orjson
+from pathlib import Path
+from shapely import STRtree, box, points
+from typing import List, Dict, Tuple, Any, Optional
+
+try:
+    import uvloop
+except ImportError:  # uvloop (from uvicorn[standard]) is an optional faster event loop
+    uvloop = None
 
 API_BASE = "http://localhost:8000"
 RISK_ZONES_URL = f"{API_BASE}/api/v1/risk-zones?bbox=-122.52,37.70,-122.35,37.82"
 ROUTE_URL = f"{API_BASE}/api/v1/routes/calculate"
 
+# Route requests in flight at once
+MAX_CONCURRENT_ROUTES = 16
+
+# Local copy of the risk zone response, keyed by its URL (bbox)
+RISK_ZONES_CACHE = (
+    Path.home() / ".cache"
+    / f"sf-risk-zones-{hashlib.sha1(RISK_ZONES_URL.encode()).hexdigest()[:10]}.json"
+)
+CACHE_TTL = 24 * 3600
+
 # SF bounding box for random point generation
 SF_BOUNDS = {
     "min_lat": 37.72,
@@ -39,129 +59,175 @@ SEVERITY_THRESHOLDS = {
     "CRITICAL": 250,
 }
 
+# Meters per degree of latitude on a 6371km sphere, and the longitude scale
+# at SF's latitude for the equirectangular approximation
+METERS_PER_DEGREE = math.radians(1) * 6371000
+COS_SF = math.cos(math.radians(37.76))
 
-def haversine_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
-    """Calculate distance in meters between two points."""
-    R = 6371000
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
+# Severity tiers by reported_count: a zone's class id is how many of the
+# thresholds its count reaches, and indexes ZONE_CLASSES
+ZONE_CLASS_THRESHOLDS = (160, 200, 250)
+ZONE_CLASSES = ("BELOW_THRESHOLD", "YELLOW_LIGHT_RED", "HIGH", "CRITICAL")
 
 
-def point_in_zone(lat: float, lon: float, zone: Dict, radius_factor: float = 0.5) -> bool:
-    """Check if a point is within a risk zone's avoidance radius.
+def cheap_dist_sq(lat1, lon1, lat2, lon2, cos_lat0: float = COS_SF):
+    """Squared equirectangular ("cheap ruler") distance in m^2 between points in degrees.
 
-    Uses radius_factor of the alert_radius_meters, matching the backend logic.
+    Within centimeters of haversine at SF distances and latitudes,
+    with no trig per call; works element-wise on arrays too.
     """
-    zone_coords = zone["geometry"]["coordinates"]
-    zone_lon, zone_lat = zone_coords[0], zone_coords[1]
-    zone_radius = zone.get("alert_radius_meters", 150) * radius_factor
-    dist = haversine_distance(lat, lon, zone_lat, zone_lon)
-    return dist < zone_radius
-
-
-def route_passes_through_zone(route_coords: List[List[float]], zone: Dict, radius_factor: float = 0.5) -> bool:
-    """Check if any coordinate on the route passes through a risk zone's avoidance radius."""
-    for coord in route_coords:
-        lon, lat = coord[0], coord[1]
-        if point_in_zone(lat, lon, zone, radius_factor):
-            return True
-    return False
-
-
-def classify_zone(zone: Dict) -> str:
-    """Classify a zone by its reported_count into severity tiers."""
-    count = zone.get("reported_count", 0)
-    if count >= 250:
-        return "CRITICAL"
-    elif count >= 200:
-        return "HIGH"
-    elif count >= 160:
-        return "YELLOW_LIGHT_RED"
-    else:
-        return "BELOW_THRESHOLD"
+    dx = (lon2 - lon1) * (cos_lat0 * METERS_PER_DEGREE)
+    dy = (lat2 - lat1) * METERS_PER_DEGREE
+    return dx * dx + dy * dy
+
 
+def prepare_zones(zones: List[Dict]) -> Dict[str, Any]:
+    """Zone arrays and spatial index, built once per run.
 
-def zone_is_between_points(
-    origin_lat: float, origin_lon: float,
-    dest_lat: float, dest_lon: float,
-    zone: Dict, margin: float = 1.5
-) -> bool:
-    """Check if a zone is roughly between origin and destination."""
-    zone_coords = zone["geometry"]["coordinates"]
-    z_lon, z_lat = zone_coords[0], zone_coords[1]
+    - centers: zone centers in degrees, as [lat, lon] rows
+    - radii: alert radii in meters
+    - class_id: index into ZONE_CLASSES for each zone
+    - info: per-zone report entry, shared by every route that passes the zone
+    - tree: STRtree over each zone's full alert radius as a lon/lat box (with
+      10% slack), or None when there are no zones
+    """
+    centers = np.array(
+        [[z["geometry"]["coordinates"][1], z["geometry"]["coordinates"][0]] for z in zones],
+        dtype=np.float64,
+    ).reshape(-1, 2)
+    radii = np.array([z.get("alert_radius_meters", 150) for z in zones], dtype=np.float64)
+    counts = np.array([z.get("reported_count", 0) for z in zones], dtype=np.int64)
+    class_id = np.searchsorted(ZONE_CLASS_THRESHOLDS, counts, side="right")
+    info = [
+        {
+            "zone_id": z["id"],
+            "zone_name": z.get("name", "Unknown"),
+            "reported_count": z.get("reported_count", 0),
+            "severity_class": ZONE_CLASSES[c],
+            "alert_radius_meters": z.get("alert_radius_meters", 150),
+        }
+        for z, c in zip(zones, class_id.tolist())
+    ]
+
+    tree = None
+    if len(zones):
+        lat_deg_r = radii * 1.1 / 111000
+        lon_deg_r = lat_deg_r / np.cos(np.radians(np.abs(centers[:, 0]) + lat_deg_r))
+        tree = STRtree(box(
+            centers[:, 1] - lon_deg_r, centers[:, 0] - lat_deg_r,
+            centers[:, 1] + lon_deg_r, centers[:, 0] + lat_deg_r,
+        ))
+    return {"centers": centers, "radii": radii, "class_id": class_id, "info": info, "tree": tree}
+
+
+def zones_passed_mask(
+    route_coords: List[List[float]], prepared: Dict[str, Any], radius_factor: float
+) -> np.ndarray:
+    """For every zone, whether any route coordinate is inside radius_factor x its alert radius.
+
+    The zone tree picks the (coord, zone) pairs that can possibly match
+    (radius_factor <= 1), and the distance check only runs on those.
+    """
+    passed = np.zeros(len(prepared["radii"]), dtype=bool)
+    if prepared["tree"] is None or len(route_coords) == 0:
+        return passed
 
-    d_oz = haversine_distance(origin_lat, origin_lon, z_lat, z_lon)
-    d_zd = haversine_distance(z_lat, z_lon, dest_lat, dest_lon)
-    d_od = haversine_distance(origin_lat, origin_lon, dest_lat, dest_lon)
+    coords_deg = np.asarray(route_coords, dtype=np.float64).reshape(len(route_coords), -1)[:, :2]
 
-    if d_od == 0:
-        return False
-    detour_ratio = (d_oz + d_zd) / d_od
-    return detour_ratio < margin
+    coord_idx, zone_idx = prepared["tree"].query(points(coords_deg), predicate="intersects")
+    dist_sq = cheap_dist_sq(
+        coords_deg[coord_idx, 1], coords_deg[coord_idx, 0],
+        prepared["centers"][zone_idx, 0], prepared["centers"][zone_idx, 1],
+    )
+    reach = prepared["radii"][zone_idx] * radius_factor
+    passed[zone_idx[dist_sq < reach * reach]] = True
+    return passed
 
 
-def generate_test_points_near_zones(zones: List[Dict], n: int = 100) -> List[Tuple[Dict, Dict]]:
+def generate_test_points_near_zones(
+    zones: List[Dict], n: int = 100, prepared: Optional[Dict[str, Any]] = None
+) -> List[Tuple[Dict, Dict]]:
     """
     Generate n origin/destination pairs that guarantee risk zones lie between them.
 
     Strategy: For each pair, pick a random zone, then place origin and destination
-    on opposite sides of that zone at 500-2000m away.
+    on opposite sides of that zone at 800-2500m away. All candidates are drawn
+    and checked at once, with the zone-between test (detour through some zone
+    under 1.5x the direct distance) over a (candidates, zones) matrix.
     """
-    random.seed(42)  # Reproducible
-    pairs = []
-
-    for _ in range(n * 3):  # Generate extra to filter
-        if len(pairs) >= n:
-            break
-
-        # Pick a random zone to route "through"
-        zone = random.choice(zones)
-        z_coords = zone["geometry"]["coordinates"]
-        z_lon, z_lat = z_coords[0], z_coords[1]
+    if not zones:
+        return []
+    if prepared is None:
+        prepared = prepare_zones(zones)
+
+    rng = np.random.default_rng(42)  # Reproducible
+    count = n * 3  # Generate extra to filter
+
+    # Pick a random zone to route "through", an angle for the
+    # origin-destination axis, and a distance from the zone center
+    zone_idx = rng.integers(0, len(zones), size=count)
+    angle = rng.uniform(0, 2 * np.pi, size=count)
+    dist_m = rng.uniform(800, 2500, size=count)
+
+    z_lat = prepared["centers"][zone_idx, 0]
+    z_lon = prepared["centers"][zone_idx, 1]
+
+    # Convert meters to approximate degrees at the zone's latitude
+    lat_offset = dist_m / 111000
+    lon_offset = dist_m / (111000 * np.cos(np.radians(z_lat)))
+
+    # Origin on one side, destination on the opposite side
+    o_lat = z_lat + lat_offset * np.sin(angle)
+    o_lon = z_lon + lon_offset * np.cos(angle)
+    d_lat = z_lat - lat_offset * np.sin(angle)
+    d_lon = z_lon - lon_offset * np.cos(angle)
+
+    # Keep points within SF bounds
+    def in_bounds(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        return (
+            (SF_BOUNDS["min_lat"] <= lat) & (lat <= SF_BOUNDS["max_lat"])
+            & (SF_BOUNDS["min_lon"] <= lon) & (lon <= SF_BOUNDS["max_lon"])
+        )
+
+    candidates = np.flatnonzero(in_bounds(o_lat, o_lon) & in_bounds(d_lat, d_lon))
+    o_lat, o_lon = o_lat[candidates, None], o_lon[candidates, None]
+    d_lat, d_lon = d_lat[candidates, None], d_lon[candidates, None]
+
+    # Verify at least one zone is between origin and destination
+    # (detour through the zone under 1.5x the direct distance)
+    all_lat = prepared["centers"][None, :, 0]
+    all_lon = prepared["centers"][None, :, 1]
+    d_oz = np.sqrt(cheap_dist_sq(o_lat, o_lon, all_lat, all_lon))
+    d_zd = np.sqrt(cheap_dist_sq(all_lat, all_lon, d_lat, d_lon))
+    d_od = np.sqrt(cheap_dist_sq(o_lat, o_lon, d_lat, d_lon))
+    has_zone_between = (d_oz + d_zd < 1.5 * d_od).any(axis=1)
 
-        # Generate random angle for the origin-destination axis
-        angle = random.uniform(0, 2 * math.pi)
-
-        # Distance from zone center (800m to 2500m)
-        dist_m = random.uniform(800, 2500)
-
-        # Convert meters to approximate degrees at SF latitude
-        lat_offset = (dist_m / 111000)
-        lon_offset = (dist_m / (111000 * math.cos(math.radians(z_lat))))
-
-        # Origin on one side
-        o_lat = z_lat + lat_offset * math.sin(angle)
-        o_lon = z_lon + lon_offset * math.cos(angle)
+    pairs = []
+    for i in np.flatnonzero(has_zone_between)[:n]:
+        origin = {"latitude": round(float(o_lat[i, 0]), 6), "longitude": round(float(o_lon[i, 0]), 6)}
+        destination = {"latitude": round(float(d_lat[i, 0]), 6), "longitude": round(float(d_lon[i, 0]), 6)}
+        pairs.append((origin, destination))
 
-        # Destination on the opposite side
-        d_lat = z_lat - lat_offset * math.sin(angle)
-        d_lon = z_lon - lon_offset * math.cos(angle)
+    return pairs
 
-        # Validate points are within SF bounds
-        if not (SF_BOUNDS["min_lat"] <= o_lat <= SF_BOUNDS["max_lat"] and
-                SF_BOUNDS["min_lon"] <= o_lon <= SF_BOUNDS["max_lon"] and
-                SF_BOUNDS["min_lat"] <= d_lat <= SF_BOUNDS["max_lat"] and
-                SF_BOUNDS["min_lon"] <= d_lon <= SF_BOUNDS["max_lon"]):
-            continue
 
-        # Verify at least one zone is between origin and destination
-        zones_between = [
-            z for z in zones
-            if zone_is_between_points(o_lat, o_lon, d_lat, d_lon, z, margin=1.5)
-        ]
-        if not zones_between:
-            continue
+def load_cached_risk_zones() -> Optional[List[Dict]]:
+    """Return the cached risk zone response if it is younger than CACHE_TTL."""
+    try:
+        if time.time() - RISK_ZONES_CACHE.stat().st_mtime >= CACHE_TTL:
+            return None
+        return json.loads(RISK_ZONES_CACHE.read_bytes())
+    except (OSError, ValueError):
+        return None
 
-        origin = {"latitude": round(o_lat, 6), "longitude": round(o_lon, 6)}
-        destination = {"latitude": round(d_lat, 6), "longitude": round(d_lon, 6)}
-        pairs.append((origin, destination))
 
-    return pairs[:n]
+def save_cached_risk_zones(zones: List[Dict]):
+    """Write the risk zone response through to the local cache (best effort)."""
+    try:
+        RISK_ZONES_CACHE.parent.mkdir(parents=True, exist_ok=True)
+        RISK_ZONES_CACHE.write_text(json.dumps(zones))
+    except OSError as e:
+        print(f"  Could not write cache {RISK_ZONES_CACHE}: {e}")
 
 
 async def calculate_route_for_profile(
@@ -193,11 +259,14 @@ async def calculate_route_for_profile(
 
 
 def analyze_route_against_zones(
-    route_data: Dict, zones: List[Dict], profile: str
+    route_data: Dict, zones: List[Dict], profile: str,
+    prepared: Optional[Dict[str, Any]] = None,
 ) -> Dict[str, Any]:
     """
     Analyze a route to check which risk zones it passes through.
     Returns detailed violation info.
+
+    prepared is prepare_zones(zones); pass it in to reuse it across routes.
     """
     if "error" in route_data:
         return {"error": route_data["error"], "violations": [], "passes": 0}
@@ -207,45 +276,41 @@ def analyze_route_against_zones(
         return {"error": "No coordinates", "violations": [], "passes": 0}
 
     violations = []
-    zone_passes_detail = []
 
     # SAFEST avoids all zone cores (0.25x alert_radius)
     # BALANCED avoids HIGH/CRITICAL zone cores (0.2x alert_radius)
     safest_factor = 0.25
     balanced_factor = 0.2
 
-    for zone in zones:
-        z_class = classify_zone(zone)
-
-        if profile == "safest":
-            passes = route_passes_through_zone(coords, zone, radius_factor=safest_factor)
-        elif profile == "balanced":
-            # BALANCED only checks HIGH and CRITICAL zones
-            if z_class not in ("HIGH", "CRITICAL"):
-                passes = route_passes_through_zone(coords, zone, radius_factor=balanced_factor)
-            else:
-                passes = route_passes_through_zone(coords, zone, radius_factor=balanced_factor)
-        else:
-            passes = route_passes_through_zone(coords, zone, radius_factor=0.25)
-
-        if passes:
-            z_info = {
-                "zone_id": zone["id"],
-                "zone_name": zone.get("name", "Unknown"),
-                "reported_count": zone.get("reported_count", 0),
-                "severity_class": z_class,
-                "alert_radius_meters": zone.get("alert_radius_meters", 150),
-            }
-            zone_passes_detail.append(z_info)
+    if prepared is None:
+        prepared = prepare_zones(zones)
 
-            if profile == "safest":
-                violations.append({**z_info, "reason": "SAFEST must avoid ALL risk zone cores"})
-            elif profile == "balanced":
-                if z_class in ("HIGH", "CRITICAL"):
-                    violations.append({
-                        **z_info,
-                        "reason": f"BALANCED must avoid {z_class} zone cores (200+ crashes)"
-                    })
+    if profile == "safest":
+        radius_factor = safest_factor
+    elif profile == "balanced":
+        radius_factor = balanced_factor
+    else:
+        radius_factor = 0.25
+    passes_mask = zones_passed_mask(coords, prepared, radius_factor)
+
+    info = prepared["info"]
+    zone_passes_detail = [info[j] for j in np.flatnonzero(passes_mask)]
+
+    if profile == "safest":
+        violations = [
+            {**z_info, "reason": "SAFEST must avoid ALL risk zone cores"}
+            for z_info in zone_passes_detail
+        ]
+    elif profile == "balanced":
+        # HIGH and CRITICAL zones
+        high_mask = passes_mask & (prepared["class_id"] >= 2)
+        violations = [
+            {
+                **info[j],
+                "reason": f"BALANCED must avoid {info[j]['severity_class']} zone cores (200+ crashes)"
+            }
+            for j in np.flatnonzero(high_mask)
+        ]
 
     risk_analysis = route_data.get("risk_analysis", {})
     summary = route_data.get("summary", {})
@@ -263,38 +328,60 @@ def analyze_route_against_zones(
     }
 
 
-async def run_tests():
-    """Main test runner."""
+async def run_tests(refresh: bool = False):
+    """Main test runner.
+
+    Risk zones come from the local cache when it is fresh, unless refresh is set.
+    """
     print("=" * 80)
     print("MICROMOBILITY ROUTING - RISK ZONE PROFILE COMPLIANCE TEST")
     print("=" * 80)
     print()
 
-    async with httpx.AsyncClient() as client:
+    # One pooled client for every request.
+    # HTTP/2 applies when API_BASE is https (plain http stays on HTTP/1.1 keep-alive)
+    async with httpx.AsyncClient(
+        timeout=30.0,
+        http2=True,
+        limits=httpx.Limits(
+            max_connections=2 * MAX_CONCURRENT_ROUTES,
+            max_keepalive_connections=2 * MAX_CONCURRENT_ROUTES,
+        ),
+    ) as client:
         # Step 1: Fetch all risk zones
         print("[1/4] Fetching risk zones...")
-        response = await client.get(RISK_ZONES_URL)
-        zones = response.json()
+        zones = None if refresh else load_cached_risk_zones()
+        if zones is None:
+            response = await client.get(RISK_ZONES_URL)
+            zones = response.json()
+            save_cached_risk_zones(zones)
+        else:
+            print(f"  Using cached risk zones from {RISK_ZONES_CACHE}")
         print(f"  Found {len(zones)} risk zones")
 
-        # Classify zones
-        zone_classes = {}
-        for z in zones:
-            cls = classify_zone(z)
-            zone_classes.setdefault(cls, []).append(z)
-        for cls, zlist in sorted(zone_classes.items()):
-            print(f"  {cls}: {len(zlist)} zones")
+        # Per-zone arrays and classes, shared by every route below
+        prepared = prepare_zones(zones)
+        class_counts = np.bincount(prepared["class_id"], minlength=len(ZONE_CLASSES))
+        for cls, count in sorted(zip(ZONE_CLASSES, class_counts.tolist())):
+            if count:
+                print(f"  {cls}: {count} zones")
         print()
 
         # Step 2: Generate test points
         print("[2/4] Generating 100 random test point pairs with zones in between...")
-        pairs = generate_test_points_near_zones(zones, n=100)
+        pairs = generate_test_points_near_zones(zones, n=100, prepared=prepared)
         print(f"  Generated {len(pairs)} valid test pairs")
         print()
 
         # Step 3: Run tests for each profile
         profiles = ["safest", "balanced", "fastest"]
-        results = {p: [] for p in profiles}
+        results = {p: [None] * len(pairs) for p in profiles}
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_ROUTES)
+
+        async def run_one(i: int, origin: Dict, destination: Dict, profile: str) -> Tuple[int, Dict]:
+            async with semaphore:
+                route_data = await calculate_route_for_profile(client, origin, destination, profile)
+            return i, analyze_route_against_zones(route_data, zones, profile, prepared)
 
         for profile in profiles:
             print(f"[3/4] Testing '{profile.upper()}' profile ({len(pairs)} routes)...")
@@ -302,22 +389,24 @@ async def run_tests():
             success_count = 0
             error_count = 0
 
-            for i, (origin, destination) in enumerate(pairs):
-                route_data = await calculate_route_for_profile(client, origin, destination, profile)
-                analysis = analyze_route_against_zones(route_data, zones, profile)
+            # Requests run concurrently; results are stored back in pair order
+            pending = [run_one(i, o, d, profile) for i, (o, d) in enumerate(pairs)]
+            for done, finished in enumerate(asyncio.as_completed(pending), start=1):
+                i, analysis = await finished
+                origin, destination = pairs[i]
                 analysis["test_index"] = i
                 analysis["origin"] = origin
                 analysis["destination"] = destination
-                results[profile].append(analysis)
+                results[profile][i] = analysis
 
                 if "error" in analysis and analysis["error"]:
                     error_count += 1
                 else:
                     success_count += 1
 
-                if (i + 1) % 20 == 0:
+                if done % 20 == 0:
                     elapsed = time.time() - start_time
-                    print(f"    Progress: {i + 1}/{len(pairs)} ({elapsed:.1f}s)")
+                    print(f"    Progress: {done}/{len(pairs)} ({elapsed:.1f}s)")
 
             elapsed = time.time() - start_time
             print(f"  Completed: {success_count} success, {error_count} errors ({elapsed:.1f}s)")
@@ -332,13 +421,40 @@ async def run_tests():
         for profile in profiles:
             profile_results = results[profile]
             total = len(profile_results)
-            errors = sum(1 for r in profile_results if r.get("error"))
-            successful = total - errors
 
-            total_violations = sum(r.get("violation_count", 0) for r in profile_results)
-            routes_with_violations = sum(1 for r in profile_results if r.get("violation_count", 0) > 0)
-            total_zone_passes = sum(r.get("total_zones_passed", 0) for r in profile_results)
-            routes_with_zone_passes = sum(1 for r in profile_results if r.get("total_zones_passed", 0) > 0)
+            # Tally everything the summary needs in one pass over the results
+            errors = 0
+            total_violations = 0
+            routes_with_violations = 0
+            total_zone_passes = 0
+            routes_with_zone_passes = 0
+            class_passes = dict.fromkeys(ZONE_CLASSES, 0)
+            valid_count = 0
+            sum_dist = 0
+            sum_dur = 0
+            sum_risk = 0
+            for r in profile_results:
+                if r.get("error"):
+                    errors += 1
+                else:
+                    valid_count += 1
+                    sum_dist += r.get("distance_meters", 0)
+                    sum_dur += r.get("duration_seconds", 0)
+                    sum_risk += r.get("api_risk_score", 0)
+
+                violation_count = r.get("violation_count", 0)
+                total_violations += violation_count
+                if violation_count > 0:
+                    routes_with_violations += 1
+
+                zones_passed_count = r.get("total_zones_passed", 0)
+                total_zone_passes += zones_passed_count
+                if zones_passed_count > 0:
+                    routes_with_zone_passes += 1
+
+                for zp in r.get("zones_passed", []):
+                    class_passes[zp["severity_class"]] += 1
+            successful = total - errors
 
             print(f"\n{'=' * 40}")
             print(f"PROFILE: {profile.upper()}")
@@ -373,17 +489,9 @@ async def run_tests():
 
             elif profile == "balanced":
                 # Count different types of zone passes
-                yellow_passes = 0
-                high_passes = 0
-                critical_passes = 0
-                for r in profile_results:
-                    for zp in r.get("zones_passed", []):
-                        if zp["severity_class"] == "YELLOW_LIGHT_RED":
-                            yellow_passes += 1
-                        elif zp["severity_class"] == "HIGH":
-                            high_passes += 1
-                        elif zp["severity_class"] == "CRITICAL":
-                            critical_passes += 1
+                yellow_passes = class_passes["YELLOW_LIGHT_RED"]
+                high_passes = class_passes["HIGH"]
+                critical_passes = class_passes["CRITICAL"]
 
                 print(f"\n  Zone pass breakdown:")
                 print(f"    Yellow/Light-red (160-199): {yellow_passes} (ALLOWED)")
@@ -408,11 +516,10 @@ async def run_tests():
                 print(f"  PASS: No constraints to violate")
 
             # Average stats
-            valid_results = [r for r in profile_results if not r.get("error")]
-            if valid_results:
-                avg_dist = sum(r.get("distance_meters", 0) for r in valid_results) / len(valid_results)
-                avg_dur = sum(r.get("duration_seconds", 0) for r in valid_results) / len(valid_results)
-                avg_risk = sum(r.get("api_risk_score", 0) for r in valid_results) / len(valid_results)
+            if valid_count:
+                avg_dist = sum_dist / valid_count
+                avg_dur = sum_dur / valid_count
+                avg_risk = sum_risk / valid_count
                 print(f"\n  Average distance: {avg_dist:.0f}m")
                 print(f"  Average duration: {avg_dur:.0f}s")
                 print(f"  Average risk score: {avg_risk:.3f}")
@@ -427,12 +534,17 @@ async def run_tests():
 
         # Save detailed results to file
         output_file = "/Users/aryanshmohapatra/Personal Projects/Micromobility Navigation in SF/backend/tests/risk_zone_test_results.json"
-        with open(output_file, "w") as f:
-            json.dump(results, f, indent=2, default=str)
+        with open(output_file, "wb") as f:
+            f.write(orjson.dumps(results, default=str, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
         print(f"\nDetailed results saved to: {output_file}")
 
         return results, overall_pass
 
 
 if __name__ == "__main__":
-    results, passed = asyncio.run(run_tests())
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--refresh", action="store_true", help="re-fetch risk zones instead of using the local cache")
+    args = parser.parse_args()
+    if uvloop is not None:
+        uvloop.install()
+    results, passed = asyncio.run(run_tests(refresh=args.refresh))
@@ -0,0 +1,971 @@
+"""Unit tests for routing engine helpers that don't require Valhalla."""
+
+import pytest
+import numpy as np
+from unittest.mock import AsyncMock, MagicMock, patch
+
+
+@pytest.fixture
+def routing_engine():
+    """Create a routing engine instance."""
+    from app.services.routing.engine import RoutingEngine
+    return RoutingEngine()
+
+
+SAMPLE_ZONES = [
+    {"id": "a", "lat": 37.7749, "lon": -122.4194, "radius_meters": 150},
+    {"id": "b", "lat": 37.7849, "lon": -122.4094, "radius_meters": 200},
+    {"id": "c", "lat": 37.7650, "lon": -122.4300, "radius_meters": 100},
+]
+
+
+def _decode_polyline_py(encoded, precision=6):
+    """Pure-Python reference polyline decoder."""
+    coordinates = []
+    buf = encoded.encode("ascii")
+    n = len(buf)
+    factor = 10**precision
+    index = 0
+    lat = 0
+    lng = 0
+
+    while index < n:
+        deltas = []
+        for _ in range(2):
+            shift = 0
+            result = 0
+            while True:
+                if index >= n:
+                    raise ValueError("truncated polyline")
+                b = buf[index] - 63
+                index += 1
+                result |= (b & 0x1F) << shift
+                shift += 5
+                if b < 0x20:
+                    break
+            deltas.append((result >> 1) ^ -(result & 1))
+        lat += deltas[0]
+        lng += deltas[1]
+        coordinates.append([lng / factor, lat / factor])
+
+    return coordinates
+
+
+# =============================================================================
+# Waypoint Scoring Tests
+# =============================================================================
+
+class TestWaypointScoring:
+    """Tests for waypoint scoring against zone center arrays."""
+
+    def test_zone_arrays_split_lat_lon(self, routing_engine):
+        """Zone arrays should preserve zone order."""
+        zone_lats, zone_lons = routing_engine._zone_arrays(SAMPLE_ZONES)
+
+        assert zone_lats.tolist() == [z["lat"] for z in SAMPLE_ZONES]
+        assert zone_lons.tolist() == [z["lon"] for z in SAMPLE_ZONES]
+
+    def test_score_is_squared_distance_to_nearest_zone(self, routing_engine):
+        """Score should be the squared distance to the closest zone center."""
+        zone_lats, zone_lons = routing_engine._zone_arrays(SAMPLE_ZONES)
+        waypoint = (37.7760, -122.4180)
+
+        expected = min(
+            (z["lat"] - waypoint[0]) ** 2 + (z["lon"] - waypoint[1]) ** 2 for z in SAMPLE_ZONES
+        )
+        assert routing_engine._score_waypoint(waypoint, zone_lats, zone_lons) == pytest.approx(expected)
+
+    def test_score_without_zones(self, routing_engine):
+        """Waypoints score 1.0 when there are no zones to avoid."""
+        zone_lats, zone_lons = routing_engine._zone_arrays([])
+
+        assert routing_engine._score_waypoint((37.77, -122.42), zone_lats, zone_lons) == 1.0
+
+    def test_batch_scores_match_single_scores(self, routing_engine):
+        """Vectorized scoring should agree with per-waypoint scoring."""
+        zone_lats, zone_lons = routing_engine._zone_arrays(SAMPLE_ZONES)
+        waypoints = [(37.7760, -122.4180), (37.7900, -122.4000), (37.7600, -122.4400)]
+        wp_lats = np.array([wp[0] for wp in waypoints])
+        wp_lons = np.array([wp[1] for wp in waypoints])
+
+        scores = routing_engine._score_waypoints(wp_lats, wp_lons, zone_lats, zone_lons)
+
+        for wp, score in zip(waypoints, scores):
+            assert score == pytest.approx(routing_engine._score_waypoint(wp, zone_lats, zone_lons))
+
+    def test_avoidance_waypoints_put_safer_side_first(self, routing_engine):
+        """Each cluster offset pair should list the side farther from zones first."""
+        zone_lats, zone_lons = routing_engine._zone_arrays(SAMPLE_ZONES)
+
+        waypoints = routing_engine._generate_avoidance_waypoints(
+            (37.7700, -122.4250), (37.7800, -122.4150), 37.7749, -122.4194,
+            -0.7071, 0.7071, zone_lats, zone_lons,
+        )
+
+        assert len(waypoints) == 12
+        for i in range(0, 8, 2):
+            first = routing_engine._score_waypoint(waypoints[i], zone_lats, zone_lons)
+            second = routing_engine._score_waypoint(waypoints[i + 1], zone_lats, zone_lons)
+            assert first >= second
+
+    def test_offset_waypoints_split_sides(self, routing_engine):
+        """Offset waypoints should mirror each center and rank the farther side first."""
+        zone_lats, zone_lons = routing_engine._zone_arrays(SAMPLE_ZONES)
+        center_lats = np.array([37.7749, 37.7849])
+        center_lons = np.array([-122.4194, -122.4094])
+        offsets = np.array([0.01, 0.02])
+
+        best, other = routing_engine._offset_waypoints(
+            center_lats, center_lons, offsets, -0.7071, 0.7071, zone_lats, zone_lons,
+        )
+
+        assert best.shape == other.shape == (2, 2)
+        np.testing.assert_allclose((best + other) / 2, np.column_stack([center_lats, center_lons]))
+        best_scores = routing_engine._score_waypoints(best[:, 0], best[:, 1], zone_lats, zone_lons)
+        other_scores = routing_engine._score_waypoints(other[:, 0], other[:, 1], zone_lats, zone_lons)
+        assert (best_scores >= other_scores).all()
+
+    def test_single_zone_side_pick_matches_scores(self, routing_engine):
+        """With one zone the analytic side pick should agree with distance scoring."""
+        zone_lats, zone_lons = routing_engine._zone_arrays(SAMPLE_ZONES[:1])
+        center_lats = np.array([37.7700, 37.7800, 37.7749])
+        center_lons = np.array([-122.4250, -122.4150, -122.4300])
+        offsets = np.array([0.01, 0.02, 0.03])
+
+        best, other = routing_engine._offset_waypoints(
+            center_lats, center_lons, offsets, -0.7071, 0.7071, zone_lats, zone_lons,
+        )
+
+        best_scores = routing_engine._score_waypoints(best[:, 0], best[:, 1], zone_lats, zone_lons)
+        other_scores = routing_engine._score_waypoints(other[:, 0], other[:, 1], zone_lats, zone_lons)
+        assert (best_scores > other_scores).all()
+
+    def test_simple_distance_sq_matches_simple_distance(self, routing_engine):
+        """Squared distance should be the square of the Euclidean distance."""
+        d = routing_engine._simple_distance(37.77, -122.42, 37.78, -122.41)
+        d_sq = routing_engine._simple_distance_sq(37.77, -122.42, 37.78, -122.41)
+
+        assert d_sq == pytest.approx(d * d)
+
+
+# =============================================================================
+# Waypoint Avoidance Tests
+# =============================================================================
+
+class TestWaypointAvoidance:
+    """Tests for the waypoint-avoidance probing strategy."""
+
+    @pytest.fixture
+    def route_request(self):
+        """A short route request across the sample zones."""
+        from app.schemas.routing import RouteRequest, RoutePreferences
+        from app.schemas.common import Coordinate
+
+        return RouteRequest(
+            origin=Coordinate(latitude=37.7700, longitude=-122.4250),
+            destination=Coordinate(latitude=37.7800, longitude=-122.4150),
+            preferences=RoutePreferences(),
+        )
+
+    @pytest.mark.asyncio
+    async def test_single_zone_limits_probes_and_returns_clean_route(self, routing_engine, route_request):
+        """One zone on path should probe only 4 waypoints and return the clean one."""
+        clean_route = MagicMock()
+        clean_response = {"trip": {"legs": []}}
+        probed = []
+
+        async def fake_probe(request, wp, exclude_polygons, all_zones, min_severity):
+            probed.append(wp)
+            is_valid = len(probed) == 2
+            return wp, clean_response if is_valid else {}, is_valid, 0 if is_valid else 1
+
+        parse = AsyncMock(return_value=clean_route)
+        with patch.object(routing_engine, "_find_zones_on_path", return_value=SAMPLE_ZONES[:1]), \
+                patch.object(routing_engine, "_probe_waypoint_route", side_effect=fake_probe), \
+                patch.object(routing_engine, "_parse_valhalla_response", parse):
+            route = await routing_engine._try_waypoint_avoidance(
+                route_request, SAMPLE_ZONES, SAMPLE_ZONES, "LOW"
+            )
+
+        assert route is clean_route
+        assert len(probed) <= 4
+        # Only the winning candidate is fully parsed
+        parse.assert_awaited_once()
+        assert parse.await_args.args[0] is clean_response
+
+    @pytest.mark.asyncio
+    async def test_single_zone_on_path_picks_sides_analytically(self, routing_engine, route_request):
+        """With one zone on path the sides should be ranked by _pick_side, not distance scores."""
+
+        async def fake_probe(request, wp, exclude_polygons, all_zones, min_severity):
+            return wp, {}, False, 1
+
+        pick_side = MagicMock(side_effect=routing_engine._pick_side)
+        score = MagicMock(side_effect=routing_engine._score_waypoints)
+        with patch.object(routing_engine, "_find_zones_on_path", return_value=SAMPLE_ZONES[:1]), \
+                patch.object(routing_engine, "_probe_waypoint_route", side_effect=fake_probe), \
+                patch.object(routing_engine, "_pick_side", pick_side), \
+                patch.object(routing_engine, "_score_waypoints", score):
+            await routing_engine._try_waypoint_avoidance(
+                route_request, SAMPLE_ZONES, SAMPLE_ZONES, "LOW"
+            )
+
+        assert pick_side.called
+        assert pick_side.call_args.args[2:4] == (SAMPLE_ZONES[0]["lat"], SAMPLE_ZONES[0]["lon"])
+        score.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_lowest_index_clean_waypoint_wins_over_faster_one(self, routing_engine, route_request):
+        """The first clean candidate in waypoint order wins, not the first to finish."""
+        import asyncio
+
+        order = []
+
+        async def fake_probe(request, wp, exclude_polygons, all_zones, min_severity):
+            index = len(order)
+            order.append(wp)
+            # Candidate 1 is clean but slow; candidate 2 is clean and fast
+            if index == 1:
+                await asyncio.sleep(0.05)
+                return wp, {"candidate": 1}, True, 0
+            if index == 2:
+                return wp, {"candidate": 2}, True, 0
+            return wp, {}, False, 1
+
+        parse = AsyncMock(side_effect=lambda response, *args, **kwargs: response["candidate"])
+        with patch.object(routing_engine, "_find_zones_on_path", return_value=SAMPLE_ZONES[:1]), \
+                patch.object(routing_engine, "_probe_waypoint_route", side_effect=fake_probe), \
+                patch.object(routing_engine, "_parse_valhalla_response", parse):
+            route = await routing_engine._try_waypoint_avoidance(
+                route_request, SAMPLE_ZONES, SAMPLE_ZONES, "LOW"
+            )
+
+        assert route == 1
+        parse.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_chain_attempts_run_concurrently_and_cancel_on_clean(self, routing_engine, route_request):
+        """A clean chain should be returned without waiting on slower attempts."""
+        import asyncio
+
+        clean_route = MagicMock()
+        clean_response = {"trip": {"legs": []}}
+        started = []
+        cancelled = []
+
+        async def fake_waypoint_probe(request, wp, exclude_polygons, all_zones, min_severity):
+            return wp, {}, False, 2
+
+        async def fake_chain_probe(request, chain, exclude_polygons, all_zones, min_severity):
+            started.append(chain)
+            if len(started) == 1:
+                await asyncio.sleep(0)
+                return clean_response, True, 0
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(chain)
+                raise
+
+        parse = AsyncMock(return_value=clean_route)
+        with patch.object(routing_engine, "_find_zones_on_path", return_value=SAMPLE_ZONES[:2]), \
+                patch.object(routing_engine, "_probe_waypoint_route", side_effect=fake_waypoint_probe), \
+                patch.object(routing_engine, "_probe_chain_route", side_effect=fake_chain_probe), \
+                patch.object(routing_engine, "_parse_valhalla_response", parse):
+            route = await asyncio.wait_for(
+                routing_engine._try_waypoint_avoidance(route_request, SAMPLE_ZONES, SAMPLE_ZONES, "LOW"),
+                timeout=5,
+            )
+
+        assert route is clean_route
+        assert len(started) == 4
+        assert len(cancelled) == 3
+        assert parse.await_args.args[0] is clean_response
+
+    @pytest.mark.asyncio
+    async def test_lowest_index_clean_chain_wins_over_faster_one(self, routing_engine, route_request):
+        """The first clean chain in attempt order wins, not the first to finish."""
+        import asyncio
+
+        started = []
+
+        async def fake_waypoint_probe(request, wp, exclude_polygons, all_zones, min_severity):
+            return wp, {}, False, 2
+
+        async def fake_chain_probe(request, chain, exclude_polygons, all_zones, min_severity):
+            attempt = len(started)
+            started.append(chain)
+            # Attempt 0 is dirty, 1 is clean but slow, 2 is clean and fast
+            if attempt == 1:
+                await asyncio.sleep(0.05)
+            return {"attempt": attempt}, attempt > 0, 0 if attempt > 0 else 3
+
+        parse = AsyncMock(side_effect=lambda response, *args, **kwargs: response["attempt"])
+        with patch.object(routing_engine, "_find_zones_on_path", return_value=SAMPLE_ZONES[:2]), \
+                patch.object(routing_engine, "_probe_waypoint_route", side_effect=fake_waypoint_probe), \
+                patch.object(routing_engine, "_probe_chain_route", side_effect=fake_chain_probe), \
+                patch.object(routing_engine, "_parse_valhalla_response", parse):
+            route = await routing_engine._try_waypoint_avoidance(
+                route_request, SAMPLE_ZONES, SAMPLE_ZONES, "LOW"
+            )
+
+        assert route == 1
+        parse.assert_awaited_once()
+
+    def test_polyline_array_matches_python_decoder(self, routing_engine):
+        """The array decoder should agree exactly with the pure-Python decoder."""
+        shape = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+
+        expected = _decode_polyline_py(shape)
+        decoded = routing_engine._decode_polyline_array(shape)
+
+        assert decoded.shape == (len(expected), 2)
+        assert decoded.tolist() == expected
+        assert routing_engine._decode_polyline(shape) == expected
+        assert routing_engine._decode_polyline_array("").shape == (0, 2)
+
+    def test_decode_shape_array_concatenates_legs(self, routing_engine):
+        """Shape-only decoding should return the coordinates of every leg in order."""
+        leg_shape = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+        response = {"trip": {"legs": [{"shape": leg_shape}, {"shape": leg_shape}]}}
+
+        coords = routing_engine._decode_shape_array(response)
+
+        single = routing_engine._decode_polyline(leg_shape)
+        assert coords.tolist() == single + single
+        assert routing_engine._decode_shape_array({}).shape == (0, 2)
+
+    def test_array_validation_matches_list_validation(self, routing_engine):
+        """Validating a decoded array should agree with the list-based validator."""
+        from app.services.risk_zone_service import risk_zone_service
+
+        zones = [dict(z, reported_count=200) for z in SAMPLE_ZONES]
+        coords = np.column_stack([
+            np.linspace(-122.4250, -122.4050, 50), np.linspace(37.7700, 37.7860, 50),
+        ])
+
+        is_valid, count, violations = risk_zone_service.validate_route_against_zones(
+            coords.tolist(), zones, "LOW", radius_factor=1.0,
+        )
+
+        assert count > 0 and not is_valid
+        assert risk_zone_service.validate_route_against_zones_np(
+            coords, zones, "LOW", radius_factor=1.0,
+        ) == (is_valid, count)
+        assert risk_zone_service.validate_route_against_zones_np(
+            np.empty((0, 2)), zones, "LOW",
+        ) == (True, 0)
+
+
+# =============================================================================
+# Exclude Polygon Cache Tests
+# =============================================================================
+
+class TestPolygonCache:
+    """Tests for the cached exclude-polygon helper."""
+
+    def test_cached_polygon_matches_service_polygon(self):
+        """Cached polygons should match the risk zone service output."""
+        from app.services.routing.engine import _polygon_cached
+        from app.services.risk_zone_service import risk_zone_service
+
+        cached = _polygon_cached(-122.4194, 37.7749, 112.5)
+        expected = risk_zone_service.create_circular_polygon(-122.4194, 37.7749, 112.5, num_points=8)
+
+        assert [list(point) for point in cached] == expected
+        assert cached[0] == cached[-1]  # Closed ring
+
+    def test_repeat_lookups_hit_cache(self):
+        """The same zone and radius should be served from the cache."""
+        from app.services.routing.engine import _polygon_cached
+
+        first = _polygon_cached(-122.4094, 37.7849, 150.0)
+        second = _polygon_cached(-122.4094, 37.7849, 150.0)
+
+        assert first is second
+
+
+# =============================================================================
+# Zone Grid Tests
+# =============================================================================
+
+class TestZoneGrid:
+    """Tests for the bucket grid used to find zones near a route."""
+
+    def test_query_matches_linear_bbox_scan(self):
+        """Grid lookups should return the same zones, in order, as a full scan."""
+        from app.services.risk_zone_service import ZoneGrid
+
+        zones = [
+            {"lat": 37.70 + (i * 7 % 100) * 0.0012, "lon": -122.52 + (i * 13 % 100) * 0.0014}
+            for i in range(300)
+        ]
+        grid = ZoneGrid(zones)
+
+        for box in [(37.74, -122.47, 37.77, -122.44), (37.60, -122.60, 37.90, -122.30)]:
+            min_lat, min_lon, max_lat, max_lon = box
+            expected = [
+                z for z in zones
+                if min_lat <= z["lat"] <= max_lat and min_lon <= z["lon"] <= max_lon
+            ]
+            assert grid.query(*box) == expected
+
+    def test_zone_grid_reused_until_cache_cleared(self):
+        """The service should reuse the grid for a list until zones are reloaded."""
+        from app.services.risk_zone_service import RiskZoneService
+
+        service = RiskZoneService()
+        grid = service.zone_grid(SAMPLE_ZONES)
+
+        assert service.zone_grid(SAMPLE_ZONES) is grid
+        service.clear_cache()
+        assert service.zone_grid(SAMPLE_ZONES) is not grid
+
+    def test_severity_views_memoized_for_loaded_zones(self):
+        """Filtering the loaded zone set should return the same list each time."""
+        from app.services.risk_zone_service import RiskZoneService
+
+        service = RiskZoneService()
+        service._cached_zones = [dict(z, reported_count=150 + 40 * i) for i, z in enumerate(SAMPLE_ZONES)]
+        service._cache_loaded = True
+
+        high = service.filter_zones_by_severity(service._cached_zones, "HIGH")
+
+        assert [z["id"] for z in high] == ["b", "c"]
+        assert service.filter_zones_by_severity(service._cached_zones, "HIGH") is high
+        assert service.filter_zones_by_severity(list(service._cached_zones), "HIGH") is not high
+
+    @pytest.mark.asyncio
+    async def test_exclude_polygons_leave_severity_view_order(self):
+        """Building exclude polygons must not reorder the shared severity view."""
+        from app.services.risk_zone_service import RiskZoneService
+
+        service = RiskZoneService()
+        service._cached_zones = [
+            {"id": "small", "lat": 37.7749, "lon": -122.4194, "radius_meters": 100, "reported_count": 160},
+            {"id": "big", "lat": 37.7849, "lon": -122.4094, "radius_meters": 400, "reported_count": 260},
+        ]
+        service._cache_loaded = True
+        view = service.filter_zones_by_severity(service._cached_zones, "LOW")
+        # Index the view before the polygon builders run
+        service.zone_tree(view)
+
+        await service.get_exclude_polygons_for_safest()
+        await service.get_exclude_polygon_batches()
+
+        assert [z["id"] for z in view] == ["small", "big"]
+        route = [[-122.4194, 37.7749], [-122.4190, 37.7752]]
+        is_valid, count, violations = service.validate_route_against_zones(
+            route, service._cached_zones, radius_factor=1.0
+        )
+        assert not is_valid
+        assert count == 1
+        assert violations[0]["zone_id"] == "small"
+        assert violations[0]["zone_radius_m"] == 100
+
+    def test_zone_hits_use_tree_snapshot(self):
+        """Zone dicts and radii should stay aligned if the indexed list is reordered."""
+        from app.services.risk_zone_service import RiskZoneService
+
+        service = RiskZoneService()
+        zones = [
+            {"id": "small", "lat": 37.7749, "lon": -122.4194, "radius_meters": 100},
+            {"id": "big", "lat": 37.7849, "lon": -122.4094, "radius_meters": 400},
+        ]
+        coords = np.array([[-122.4194, 37.7749]])
+        service.zone_tree(zones)
+
+        zones.reverse()
+        candidates, _, inside = service._zone_hits(coords, zones, 1.0)
+
+        hits = [zone["id"] for zone, hit in zip(candidates, inside.any(axis=0)) if hit]
+        assert hits == ["small"]
+
+    def test_zone_tree_query_covers_every_hit(self):
+        """Tree candidates should include every zone a route point is inside, in order."""
+        from app.services.risk_zone_service import RiskZoneService
+
+        service = RiskZoneService()
+        zones = [
+            {"id": str(i), "lat": 37.70 + (i * 7 % 100) * 0.0012,
+             "lon": -122.52 + (i * 13 % 100) * 0.0014, "radius_meters": 100 + i % 5 * 100}
+            for i in range(300)
+        ]
+        coords = np.column_stack([np.linspace(-122.52, -122.38, 200), np.linspace(37.70, 37.82, 200)])
+
+        tree = service.zone_tree(zones)
+        candidates = tree.query_route(coords, 1.0)
+        _, _, inside = service._zone_hits(coords, zones, 1.0)
+
+        assert service.zone_tree(zones) is tree
+        assert candidates.tolist() == sorted(candidates.tolist())
+        assert len(candidates) < len(zones)
+        hit_ids = {zones[i]["id"] for i in candidates[inside.any(axis=0)]}
+        for zone in zones:
+            d = np.array([
+                service._haversine_distance(lat, lon, zone["lat"], zone["lon"]) for lon, lat in coords
+            ])
+            assert (zone["id"] in hit_ids) == bool((d < zone["radius_meters"]).any())
+
+
+# =============================================================================
+# Valhalla Transport Tests
+# =============================================================================
+
+class TestValhallaTransport:
+    """Tests for JSON encoding of Valhalla requests."""
+
+    def test_waypoint_probes_skip_elevation(self, routing_engine):
+        """Waypoint probe requests should not ask Valhalla for elevation by default."""
+        from app.schemas.routing import RouteRequest, RoutePreferences
+        from app.schemas.common import Coordinate
+
+        request = RouteRequest(
+            origin=Coordinate(latitude=37.7700, longitude=-122.4250),
+            destination=Coordinate(latitude=37.7800, longitude=-122.4150),
+            preferences=RoutePreferences(),
+        )
+
+        probe = routing_engine._build_waypoint_request(request, (37.775, -122.42))
+        chain = routing_engine._build_multi_waypoint_request(request, [(37.775, -122.42)])
+        chain_with_elevation = routing_engine._build_multi_waypoint_request(
+            request, [(37.775, -122.42)], include_elevation=True
+        )
+
+        assert "elevation_interval" not in probe
+        assert "elevation_interval" not in chain
+        assert chain_with_elevation["elevation_interval"] == 30
+
+    @pytest.mark.asyncio
+    async def test_post_json_serializes_body_with_orjson(self, routing_engine):
+        """Request bodies (including cached tuple polygons) should be sent as JSON bytes."""
+        import orjson
+
+        routing_engine.client = MagicMock()
+        routing_engine.client.post = AsyncMock()
+        body = {"locations": [{"lat": 37.77, "lon": -122.42}], "exclude_polygons": [((1.0, 2.0),)]}
+
+        await routing_engine._post_json("http://valhalla/route", body)
+
+        _, kwargs = routing_engine.client.post.call_args
+        assert orjson.loads(kwargs["content"]) == {
+            "locations": [{"lat": 37.77, "lon": -122.42}],
+            "exclude_polygons": [[[1.0, 2.0]]],
+        }
+        assert kwargs["headers"]["content-type"] == "application/json"
+
+
+# =============================================================================
+# Bike Lane Percentage Tests
+# =============================================================================
+
+class TestTraceAttributesBikeLanes:
+    """Tests for bike lane stats derived from Valhalla trace_attributes edges."""
+
+    @pytest.mark.asyncio
+    async def test_edges_categorized_by_cycle_lane_then_use(self, routing_engine):
+        """cycle_lane takes precedence over use; untagged paths count as protected."""
+        import orjson
+
+        edges = [
+            {"length": 0.1, "cycle_lane": "separated", "use": "road"},
+            {"length": 0.2, "cycle_lane": "dedicated", "use": "cycleway"},
+            {"length": 0.3, "cycle_lane": "shared", "use": "road"},
+            {"length": 0.4, "use": "path"},
+            {"length": 0.5, "cycle_lane": "none", "use": "road"},
+            {"length": 0.5},
+        ]
+        response = MagicMock()
+        response.content = orjson.dumps({"edges": edges})
+        routing_engine._post_json = AsyncMock(return_value=response)
+
+        pct, stats = await routing_engine._get_accurate_bike_lane_percentage(
+            [[-122.42, 37.77], [-122.41, 37.78]]
+        )
+
+        assert stats["total_distance_m"] == pytest.approx(2000)
+        assert stats["protected_distance_m"] == pytest.approx(500)
+        assert stats["dedicated_distance_m"] == pytest.approx(200)
+        assert stats["shared_distance_m"] == pytest.approx(300)
+        assert stats["road_distance_m"] == pytest.approx(1000)
+        assert pct == pytest.approx(50.0)
+
+    @pytest.mark.asyncio
+    async def test_repeated_shape_reuses_cached_result(self, routing_engine):
+        """The same route shape should hit trace_attributes only once."""
+        import orjson
+
+        response = MagicMock()
+        response.content = orjson.dumps({"edges": [{"length": 0.5, "use": "cycleway"}]})
+        routing_engine._post_json = AsyncMock(return_value=response)
+        coords = [[-122.42, 37.77], [-122.41, 37.78]]
+
+        first = await routing_engine._get_accurate_bike_lane_percentage(coords)
+        first[1]["total_distance_m"] = 0  # callers can't corrupt the cache
+        second = await routing_engine._get_accurate_bike_lane_percentage(coords)
+
+        assert routing_engine._post_json.await_count == 1
+        assert second[0] == pytest.approx(100.0)
+        assert second[1]["total_distance_m"] == pytest.approx(500)
+
+    def test_rdp_simplify_caps_points_and_keeps_corners(self, routing_engine):
+        """Simplification should keep endpoints and the sharp corner of an L-shaped route."""
+        leg1 = np.column_stack([np.linspace(-122.43, -122.42, 150), np.full(150, 37.77)])
+        leg2 = np.column_stack([np.full(150, -122.42), np.linspace(37.77, 37.78, 150)])
+        coords = np.vstack([leg1, leg2[1:]])
+
+        simplified = routing_engine._rdp_simplify(coords, 100)
+
+        assert len(simplified) <= 100
+        assert simplified[0].tolist() == coords[0].tolist()
+        assert simplified[-1].tolist() == coords[-1].tolist()
+        assert [-122.42, 37.77] in simplified.tolist()
+
+    def test_rdp_simplify_short_route_unchanged(self, routing_engine):
+        """Routes already under the cap are returned as-is."""
+        coords = np.array([[-122.42, 37.77], [-122.41, 37.78], [-122.40, 37.79]])
+
+        assert routing_engine._rdp_simplify(coords, 100) is coords
+
+
+# =============================================================================
+# Costing Options Tests
+# =============================================================================
+
+class TestCostingOptions:
+    """Tests for memoized costing options."""
+
+    def test_costing_options_are_independent_copies(self, routing_engine):
+        """Callers get a fresh dict, so mutating one can't corrupt the cache."""
+        from app.schemas.routing import RoutePreferences, RouteProfile, VehicleType
+
+        prefs = RoutePreferences(profile=RouteProfile.BALANCED, avoid_hills=True)
+        first = routing_engine._build_costing_options(prefs, VehicleType.BIKE)
+        first["use_roads"] = 0.99
+        second = routing_engine._build_costing_options(prefs, VehicleType.BIKE)
+
+        assert second["use_roads"] != 0.99
+        assert second["use_hills"] == 0.1
+
+
+# =============================================================================
+# Elevation Stats Tests
+# =============================================================================
+
+class TestElevationStats:
+    """Tests for elevation gain/loss/grade aggregation."""
+
+    def test_gain_loss_and_max_grade(self, routing_engine):
+        """Gain and loss sum the climbs and drops; grade uses the steepest step."""
+        gain, loss, max_grade = routing_engine._calculate_elevation_stats(
+            [10.0, 13.0, 12.0, 18.0, 18.0, 9.0], 30
+        )
+
+        assert gain == pytest.approx(9.0)
+        assert loss == pytest.approx(10.0)
+        assert max_grade == pytest.approx(30.0)
+
+    def test_short_or_zero_interval_profiles(self, routing_engine):
+        """Single points yield zeros, and a zero interval disables the grade."""
+        assert routing_engine._calculate_elevation_stats([12.0], 30) == (0, 0, 0)
+        assert routing_engine._calculate_elevation_stats([10.0, 14.0], 0) == (4.0, 0.0, 0)
+
+    def test_accepts_array_buffer(self, routing_engine):
+        """A concatenated numpy buffer gives the same stats as the list."""
+        elevations = [10.0, 13.0, 12.0, 18.0, 18.0, 9.0]
+        buffer = np.concatenate([np.asarray(elevations[:2]), np.asarray(elevations[2:])])
+
+        assert routing_engine._calculate_elevation_stats(buffer, 30) == (
+            routing_engine._calculate_elevation_stats(elevations, 30)
+        )
+        assert routing_engine._calculate_elevation_stats(np.empty(0), 30) == (0, 0, 0)
+
+
+# =============================================================================
+# Mock Route Tests
+# =============================================================================
+
+class TestMockRoute:
+    """Tests for the development mock route."""
+
+    def test_mock_route_interpolates_between_endpoints(self, routing_engine):
+        """The mock line should start at the origin, end at the destination, and be evenly spaced."""
+        from app.schemas.routing import RouteRequest, RoutePreferences
+        from app.schemas.common import Coordinate
+
+        request = RouteRequest(
+            origin=Coordinate(latitude=37.7700, longitude=-122.4250),
+            destination=Coordinate(latitude=37.7800, longitude=-122.4150),
+            preferences=RoutePreferences(),
+        )
+
+        coords = np.array(routing_engine._generate_mock_route(request).geometry.coordinates)
+
+        assert coords[0].tolist() == [-122.4250, 37.7700]
+        assert coords[-1].tolist() == pytest.approx([-122.4150, 37.7800])
+        steps = np.diff(coords, axis=0)
+        np.testing.assert_allclose(steps, np.broadcast_to(steps[0], steps.shape), atol=1e-12)
+
+    def test_mock_route_geometry_cached_per_pair(self, routing_engine):
+        """Repeated pairs reuse the cached geometry but get their own coordinate lists."""
+        from app.schemas.routing import RouteRequest, RoutePreferences
+        from app.schemas.common import Coordinate
+        from app.services.routing.engine import _mock_route_core
+
+        request = RouteRequest(
+            origin=Coordinate(latitude=37.7600, longitude=-122.4350),
+            destination=Coordinate(latitude=37.7900, longitude=-122.4050),
+            preferences=RoutePreferences(),
+        )
+
+        first = routing_engine._generate_mock_route(request)
+        hits = _mock_route_core.cache_info().hits
+        second = routing_engine._generate_mock_route(request)
+
+        assert _mock_route_core.cache_info().hits == hits + 1
+        assert second.geometry.coordinates == first.geometry.coordinates
+        assert second.geometry.coordinates is not first.geometry.coordinates
+
+
+# =============================================================================
+# Response Parsing Tests
+# =============================================================================
+
+class TestParseValhallaResponse:
+    """Tests for converting a Valhalla trip into a RouteResponse."""
+
+    @pytest.fixture
+    def route_request(self):
+        """A short route request."""
+        from app.schemas.routing import RouteRequest, RoutePreferences
+        from app.schemas.common import Coordinate
+
+        return RouteRequest(
+            origin=Coordinate(latitude=37.7700, longitude=-122.4250),
+            destination=Coordinate(latitude=37.7800, longitude=-122.4150),
+            preferences=RoutePreferences(),
+        )
+
+    @pytest.fixture
+    def valhalla_response(self):
+        """A one-leg Valhalla trip with elevation included."""
+        return {
+            "trip": {
+                "summary": {"length": 2.5, "time": 720},
+                "legs": [{
+                    "summary": {"length": 2.5, "time": 720},
+                    "shape": "_p~iF~ps|U_ulLnnqC_mqNvxq`@",
+                    "elevation": [10.0, 12.0, 11.0],
+                    "elevation_interval": 30,
+                    "maneuvers": [
+                        {"type": 1, "instruction": "Start", "length": 0.5,
+                         "street_names": ["Market Street", "Route 1"], "travel_type": "road"},
+                        {"type": 26, "instruction": "Arrive", "length": 2.0,
+                         "verbal_pre_transition_instruction": "You have arrived",
+                         "street_names": [], "travel_type": "cycleway"},
+                        {"type": 999, "length": 0.0},
+                    ],
+                }],
+            }
+        }
+
+    async def _parse(self, routing_engine, response, request, zones, risk, **kwargs):
+        """Parse with bike lane and risk zone services stubbed out."""
+        with patch("app.services.routing.engine.bike_lane_service.calculate_bike_lane_percentage",
+                   AsyncMock(return_value=(40.0, {}))), \
+                patch("app.services.routing.engine.risk_zone_service.get_risk_zones",
+                      AsyncMock(return_value=zones)), \
+                patch("app.services.routing.engine.risk_zone_service.calculate_route_risk_score",
+                      return_value=risk):
+            return await routing_engine._parse_valhalla_response(response, request, **kwargs)
+
+    @pytest.mark.asyncio
+    async def test_maneuvers_parsed(self, routing_engine, valhalla_response, route_request):
+        """Maneuver fields should map type, instructions, distance and first street name."""
+        from app.schemas.routing import ManeuverType
+
+        route = await self._parse(routing_engine, valhalla_response, route_request, [], (0.0, 0, []))
+
+        start, arrive, unknown = route.legs[0].maneuvers
+        assert start.street_name == "Market Street"
+        assert start.verbal_instruction == "Start"
+        assert start.distance_meters == 500
+        assert arrive.type == ManeuverType.ARRIVE
+        assert arrive.verbal_instruction == "You have arrived"
+        assert arrive.street_name is None
+        assert unknown.type == ManeuverType.STRAIGHT
+        assert unknown.instruction == ""
+        assert route.summary.elevation_gain_meters == 2
+
+    @pytest.mark.asyncio
+    async def test_risk_analysis_counts_high_severity_and_valid_ids(
+        self, routing_engine, valhalla_response, route_request
+    ):
+        """Only HIGH/CRITICAL passed zones are counted; non-UUID ids are dropped."""
+        import uuid
+
+        ids = [str(uuid.uuid4()) for _ in range(3)]
+        zones = [
+            {"id": ids[0], "severity": "HIGH"},
+            {"id": ids[1], "severity": "LOW"},
+            {"id": ids[2], "severity": "CRITICAL"},
+            {"id": "legacy-zone", "severity": "HIGH"},
+        ]
+        passed = [ids[0], ids[1], ids[2], "legacy-zone"]
+
+        route = await self._parse(
+            routing_engine, valhalla_response, route_request, zones, (0.5, len(passed), passed)
+        )
+
+        assert route.risk_analysis.total_risk_zones == 4
+        assert route.risk_analysis.high_severity_zones == 3
+        assert route.risk_analysis.risk_zone_ids == [uuid.UUID(zid) for zid in ids]
+
+    @pytest.mark.asyncio
+    async def test_missing_elevation_fetched_only_when_requested(
+        self, routing_engine, valhalla_response, route_request
+    ):
+        """Only probe responses (fetch_elevation=True) fall back to /height."""
+        del valhalla_response["trip"]["legs"][0]["elevation"]
+        fetch = AsyncMock(return_value=[10.0, 15.0])
+
+        with patch.object(routing_engine, "_fetch_elevations", fetch):
+            route = await self._parse(
+                routing_engine, valhalla_response, route_request, [], (0.0, 0, [])
+            )
+            fetch.assert_not_awaited()
+            assert route.summary.elevation_gain_meters == 0
+
+            route = await self._parse(
+                routing_engine, valhalla_response, route_request, [], (0.0, 0, []),
+                fetch_elevation=True,
+            )
+            fetch.assert_awaited_once()
+            assert route.summary.elevation_gain_meters == 5
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("body", [b"not json", b"{}", b"[]"])
+    async def test_fetch_elevations_tolerates_malformed_body(self, routing_engine, body):
+        """A malformed /height body should yield no elevation instead of raising."""
+        response = MagicMock(content=body)
+
+        with patch.object(routing_engine, "_post_json", AsyncMock(return_value=response)):
+            assert await routing_engine._fetch_elevations("_p~iF~ps|U") == []
+
+
+# =============================================================================
+# Route Risk Score Tests
+# =============================================================================
+
+class TestRouteRiskScore:
+    """Tests for scoring a route against nearby risk zones."""
+
+    def test_only_crossed_zones_counted_in_order(self):
+        """Zones the route crosses are reported in zone order with severity weighting."""
+        from app.services.risk_zone_service import RiskZoneService
+
+        zones = [
+            dict(SAMPLE_ZONES[0], severity="HIGH"),
+            {"id": "far", "lat": 37.9, "lon": -122.2, "radius_meters": 150, "severity": "CRITICAL"},
+            dict(SAMPLE_ZONES[1], severity="LOW"),
+        ]
+        # Straight through the centers of zones a and b
+        coords = [[-122.4194, 37.7749], [-122.4094, 37.7849]]
+
+        score, passes, passed = RiskZoneService().calculate_route_risk_score(coords, zones, 1.0)
+
+        assert passes == 2
+        assert passed == ["a", "b"]
+        # Both hits are at the zone center: closeness 1.0, weights 1.0 + 0.25
+        assert score == pytest.approx(min(1.0, 1.25 / (3 * 0.3)))
+
+
+# =============================================================================
+# Bike Lane Percentage Tests
+# =============================================================================
+
+class TestBikeLanePercentage:
+    """Tests for crediting Valhalla-tagged bike segments."""
+
+    @pytest.mark.asyncio
+    async def test_tagged_cycleway_segments_skip_geometry_check(self):
+        """Cycleway spans count as bike lane even when far from the SF lane geometry."""
+        from shapely.geometry import LineString
+        from app.services.bike_lanes import BikeLaneService
+
+        service = BikeLaneService()
+        service._ensure_cache = AsyncMock()
+        # A lane nowhere near the route
+        service._bike_lanes_geometry = LineString([(-122.0, 38.0), (-122.0, 38.1)])
+        coords = [[-122.42, 37.77], [-122.41, 37.77], [-122.40, 37.77]]
+
+        pct, stats = await service.calculate_bike_lane_percentage(coords)
+        assert pct == 0.0
+
+        pct, stats = await service.calculate_bike_lane_percentage(
+            coords, valhalla_segments=[(0, 1, "cycleway", 880.0), (1, 2, "road", 880.0)]
+        )
+        assert stats["segments_checked"] == 2
+        assert stats["segments_on_bike_lane"] == 1
+        assert pct == pytest.approx(50.0, abs=0.1)
+        await service.close()
+
+
+# =============================================================================
+# Polyline Decoding Tests
+# =============================================================================
+
+class TestPolylineDecoding:
+    """Tests for the vectorized polyline decoder."""
+
+    def test_numpy_decoder_matches_reference(self):
+        """The numpy decoder should match the pure-Python decoder exactly."""
+        from app.services.routing.engine import _decode_polyline_np
+
+        # Precision-5 sample from the polyline algorithm docs
+        encoded = "_p~iF~ps|U_ulLnnqC_mqNvxq`@"
+        buf = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8)
+
+        decoded = _decode_polyline_np(buf, 1e5)
+
+        assert decoded.tolist() == _decode_polyline_py(encoded, precision=5)
+        assert decoded.tolist() == [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+
+    def test_numpy_decoder_empty(self):
+        """An empty polyline decodes to an empty (0, 2) array."""
+        from app.services.routing.engine import _decode_polyline_np
+
+        assert _decode_polyline_np(np.empty(0, dtype=np.uint8), 1e6).shape == (0, 2)
+
+    @pytest.mark.parametrize("encoded", ["_p~iF", "~~~~", "???"])
+    def test_numba_decoder_rejects_truncated_polyline(self, encoded):
+        """The compiled decoder should raise instead of reading past the buffer."""
+        from app.services.routing.engine import _decode_polyline_nb
+
+        if _decode_polyline_nb is None:
+            pytest.skip("numba not installed")
+        buf = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8)
+
+        with pytest.raises(ValueError, match="truncated polyline"):
+            _decode_polyline_nb(buf, 1e5)
+
+    @pytest.mark.parametrize("encoded", ["_p~iF", "~~~~", "???"])
+    def test_numpy_decoder_rejects_truncated_polyline(self, encoded):
+        """The numpy fallback should raise like the compiled decoder, not drop the tail."""
+        from app.services.routing.engine import _decode_polyline_np
+
+        buf = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8)
+
+        with pytest.raises(ValueError, match="truncated polyline"):
+            _decode_polyline_np(buf, 1e5)
+        with pytest.raises(ValueError, match="truncated polyline"):
+            _decode_polyline_py(encoded, precision=5)
+
+    def test_warm_up_compiles_decoder(self):
+        """Warming up should leave the compiled decoder ready for uint8 input."""
+        from app.services.routing.engine import _decode_polyline_nb, warm_up_polyline_decoder
+
+        warm_up_polyline_decoder()
+
+        if _decode_polyline_nb is not None:
+            assert _decode_polyline_nb.signatures
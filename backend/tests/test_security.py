@@ -1,16 +1,32 @@
 """Security tests for Phase 1 hardening."""
 
 import pytest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from fastapi.testclient import TestClient
 
 from app.config import Settings, generate_api_key
 from app.core.security import (
     APIKeyValidator,
     mask_api_key,
-    verify_api_key,
 )
 
+# Distinct valid keys, generated once for the tests that just need "a key"
+API_KEYS = tuple(generate_api_key() for _ in range(2))
+
+
+@pytest.fixture(scope="module")
+def client():
+    """One TestClient for the app, shared by the HTTP-level tests in this module."""
+    # Import here to avoid circular imports
+    from app.main import app
+    return TestClient(app)
+
+
+@pytest.fixture(scope="module")
+def health_response(client):
+    """One GET /health, shared by the tests that only inspect its status and headers."""
+    return client.get("/health")
+
 
 # =============================================================================
 # Configuration Tests
@@ -58,8 +74,7 @@ class TestSecurityConfiguration:
 
     def test_api_key_parsing(self):
         """API keys should be parsed from comma-separated string."""
-        key1 = generate_api_key()
-        key2 = generate_api_key()
+        key1, key2 = API_KEYS
         settings = Settings(api_keys=f"{key1},{key2}")
 
         keys = settings.get_api_keys_list()
@@ -80,72 +95,60 @@ class TestSecurityConfiguration:
 class TestAPIKeyValidator:
     """Tests for API key validation."""
 
-    def test_valid_api_key_accepted(self):
-        """Valid API key should be accepted."""
-        key = generate_api_key()
+    @pytest.fixture
+    def mock_settings(self):
+        """Patched security settings: keys required, API_KEYS[0] configured, not production.
 
+        Tests adjust only the attributes they care about.
+        """
         with patch('app.core.security.settings') as mock_settings:
             mock_settings.api_key_required = True
-            mock_settings.get_api_keys_list.return_value = [key]
+            mock_settings.get_api_keys_list.return_value = [API_KEYS[0]]
             mock_settings.is_production.return_value = False
+            yield mock_settings
 
-            validator = APIKeyValidator()
-            is_valid, error = validator.validate(key)
+    def test_valid_api_key_accepted(self, mock_settings):
+        """Valid API key should be accepted."""
+        validator = APIKeyValidator()
+        is_valid, error = validator.validate(API_KEYS[0])
 
-            assert is_valid is True
-            assert error is None
+        assert is_valid is True
+        assert error is None
 
-    def test_invalid_api_key_rejected(self):
+    def test_invalid_api_key_rejected(self, mock_settings):
         """Invalid API key should be rejected."""
-        valid_key = generate_api_key()
-        invalid_key = generate_api_key()
-
-        with patch('app.core.security.settings') as mock_settings:
-            mock_settings.api_key_required = True
-            mock_settings.get_api_keys_list.return_value = [valid_key]
-            mock_settings.is_production.return_value = False
-
-            validator = APIKeyValidator()
-            is_valid, error = validator.validate(invalid_key)
+        validator = APIKeyValidator()
+        is_valid, error = validator.validate(API_KEYS[1])
 
-            assert is_valid is False
-            assert "Invalid API key" in error
+        assert is_valid is False
+        assert "Invalid API key" in error
 
-    def test_missing_key_rejected_when_required(self):
+    def test_missing_key_rejected_when_required(self, mock_settings):
         """Missing API key should be rejected when required."""
-        with patch('app.core.security.settings') as mock_settings:
-            mock_settings.api_key_required = True
-            mock_settings.get_api_keys_list.return_value = [generate_api_key()]
-
-            validator = APIKeyValidator()
-            is_valid, error = validator.validate(None)
+        validator = APIKeyValidator()
+        is_valid, error = validator.validate(None)
 
-            assert is_valid is False
-            assert "required" in error.lower()
+        assert is_valid is False
+        assert "required" in error.lower()
 
-    def test_missing_key_allowed_in_dev(self):
+    def test_missing_key_allowed_in_dev(self, mock_settings):
         """Missing API key allowed in development when not required."""
-        with patch('app.core.security.settings') as mock_settings:
-            mock_settings.api_key_required = False
-            mock_settings.get_api_keys_list.return_value = []
+        mock_settings.api_key_required = False
+        mock_settings.get_api_keys_list.return_value = []
 
-            validator = APIKeyValidator()
-            is_valid, error = validator.validate(None)
+        validator = APIKeyValidator()
+        is_valid, error = validator.validate(None)
 
-            assert is_valid is True
-            assert error is None
+        assert is_valid is True
+        assert error is None
 
-    def test_short_key_rejected(self):
+    def test_short_key_rejected(self, mock_settings):
         """Keys shorter than 32 chars should be rejected."""
-        with patch('app.core.security.settings') as mock_settings:
-            mock_settings.api_key_required = True
-            mock_settings.get_api_keys_list.return_value = [generate_api_key()]
+        validator = APIKeyValidator()
+        is_valid, error = validator.validate("short")
 
-            validator = APIKeyValidator()
-            is_valid, error = validator.validate("short")
-
-            assert is_valid is False
-            assert "format" in error.lower()
+        assert is_valid is False
+        assert "format" in error.lower()
 
 
 # =============================================================================
@@ -236,25 +239,18 @@ class TestRateLimiting:
 class TestSecurityHeaders:
     """Tests for security headers middleware."""
 
-    def test_security_headers_present(self):
+    def test_security_headers_present(self, health_response):
         """Security headers should be present in responses."""
-        # Import here to avoid circular imports
-        from app.main import app
-        client = TestClient(app)
-
-        response = client.get("/health")
+        response = health_response
 
         assert response.headers.get("X-Content-Type-Options") == "nosniff"
         assert response.headers.get("X-Frame-Options") == "DENY"
         assert response.headers.get("X-XSS-Protection") == "1; mode=block"
         assert "Referrer-Policy" in response.headers
 
-    def test_rate_limit_headers_present(self):
+    def test_rate_limit_headers_present(self, health_response):
         """Rate limit headers should be present in responses."""
-        from app.main import app
-        client = TestClient(app)
-
-        response = client.get("/health")
+        response = health_response
 
         assert "X-RateLimit-Limit" in response.headers
         assert "X-RateLimit-Remaining" in response.headers
@@ -268,28 +264,18 @@ class TestSecurityHeaders:
 class TestSecurityIntegration:
     """Integration tests for security features."""
 
-    def test_health_endpoint_no_auth_required(self):
+    def test_health_endpoint_no_auth_required(self, health_response):
         """Health endpoint should not require authentication."""
-        from app.main import app
-        client = TestClient(app)
+        assert health_response.status_code == 200
 
-        response = client.get("/health")
-        assert response.status_code == 200
-
-    def test_admin_endpoint_requires_auth(self):
+    def test_admin_endpoint_requires_auth(self, client):
         """Admin endpoints should require authentication."""
-        from app.main import app
-        client = TestClient(app)
-
         # Without API key
         response = client.get("/admin/config")
         assert response.status_code == 401
 
-    def test_request_id_in_response(self):
+    def test_request_id_in_response(self, client):
         """Request ID should be present in responses."""
-        from app.main import app
-        client = TestClient(app)
-
         response = client.get("/")
         assert "X-Request-ID" in response.headers
 